@@ -0,0 +1,252 @@
+"""
+Benchmarks of pycrop2ml_ui's back-end on synthetic Crop2ML packages.
+
+Every benchmark runs on packages written by pycrop2ml_ui.core.synthetic for each size
+(number of unit models x number of ports per model) and the timings are written as
+json, to be compared between revisions :
+
+    python benchmarks/bench_backend.py --sizes 5x5 20x10 80x20 --repeat 3 --output bench.json
+
+Benchmarks : parse (pycropml parser), parse_cached (shared parse cache, warm),
+write_unit (writeunitXML._write), write_composition (writecompositionXML.write),
+build_links (manageLink._buildEdit), zip (DownloadMenu zip export) and transpile
+(pycropml transpile_package, one result per --languages). A benchmark whose
+dependencies are missing is recorded with its error instead of timings.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from pycrop2ml_ui.core import synthetic
+
+
+def _timeit(fn, repeat, setup=None):
+    """
+    Returns the durations of repeat calls of fn, setup() being called untimed before each one
+    """
+
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _datas(pkg, name, modeltype):
+    """
+    Returns the model description dictionary the xml writers expect
+    """
+
+    return {'Path': os.path.join(pkg, 'crop2ml'), 'Model type': modeltype, 'Model name': name, 'Model ID': os.path.basename(pkg),
+            'Version': '1.0', 'Timestep': '1', 'Title': name, 'Authors': 'bench', 'Institution': 'bench',
+            'Reference': 'bench', 'Abstract': 'bench', 'Old name': name}
+
+
+def _composition(pkg):
+    """
+    Returns the (model filenames, links) of the top composition of the synthetic package pkg
+    """
+
+    from xml.etree import ElementTree
+
+    root = ElementTree.parse(os.path.join(pkg, 'crop2ml', 'composition.{}.xml'.format(os.path.basename(pkg)))).getroot()
+    listmodel = [m.get('filename') for m in root.iter('Model')]
+    listlink = [{'Link type': l.tag, 'Target': l.get('target'), 'Source': l.get('source')} for l in root.find('Composition').find('Links')]
+    return listmodel, listlink
+
+
+def bench_parse(pkg, args):
+    """
+    Parses the package with the pycropml parser
+    """
+
+    from pycropml import pparse
+    return _timeit(lambda: pparse.model_parser(pkg), args.repeat)
+
+
+def bench_parse_cached(pkg, args):
+    """
+    Parses the package through the warm shared parse cache
+    """
+
+    from pycrop2ml_ui.core import parsecache
+    parsecache.parse_package(pkg)
+    return _timeit(lambda: parsecache.parse_package(pkg), args.repeat)
+
+
+def bench_write_unit(pkg, args):
+    """
+    Writes a unit model of the package size with writeunitXML._write
+    """
+
+    import pandas as pd
+    from pycrop2ml_ui.menus.writeXML.writeunitxml import writeunitXML
+
+    variables, parameters, outputs = synthetic.unit_ports('Bench', args.ports)
+    rows = [(v, 'input', 'variable', 'state') for v in variables] + \
+           [(p, 'input', 'parameter', 'constant') for p in parameters] + \
+           [(o, 'output', 'variable', 'state') for o in outputs]
+    inputs = pd.DataFrame({'Name': [r[0] for r in rows], 'Type': [r[1] for r in rows], 'InputType': [r[2] for r in rows],
+                           'Category': [r[3] for r in rows], 'DataType': ['DOUBLE'] * len(rows), 'Len': [''] * len(rows),
+                           'Default': ['1.0'] * len(rows), 'Min': ['0.0'] * len(rows), 'Max': ['100.0'] * len(rows),
+                           'Unit': ['g'] * len(rows), 'Uri': [''] * len(rows), 'Description': ['bench'] * len(rows)})
+    paramsets = {'set{}'.format(k): [{p: 0.5 for p in parameters}, 'bench'] for k in range(args.paramsets)}
+    testsets = {'test{}'.format(t): [{'test{}_0'.format(t): {'inputs': {v: 1.0 for v in variables}, 'outputs': {o: [0.0, 2] for o in outputs}}}, 'bench', 'set0']
+                for t in range(args.testsets)}
+
+    def write():
+        writeunitXML(_datas(pkg, 'Bench', 'unit'), {'Inputs': inputs, 'Algorithms': [], 'Functions': {}}, paramsets, testsets)._write()
+
+    return _timeit(write, args.repeat)
+
+
+def bench_write_composition(pkg, args):
+    """
+    Writes the top composition of the package with writecompositionXML.write
+    """
+
+    from pycrop2ml_ui.menus.writeXML.writecompositionxml import writecompositionXML
+
+    listmodel, listlink = _composition(pkg)
+    return _timeit(lambda: writecompositionXML(_datas(pkg, 'Bench', 'composition'), listmodel, listlink).write(), args.repeat)
+
+
+def bench_build_links(pkg, args):
+    """
+    Builds the link grid of the top composition with manageLink._buildEdit, parse cache cleared
+    """
+
+    from pycrop2ml_ui.core import parsecache
+    from pycrop2ml_ui.menus.setsmanagement.managelink import manageLink
+
+    listmodel, listlink = _composition(pkg)
+    return _timeit(lambda: manageLink(_datas(pkg, os.path.basename(pkg), 'composition'), listmodel, listlink, [], iscreate=False)._buildEdit(),
+                   args.repeat, setup=lambda: parsecache.get_cache().invalidate())
+
+
+def bench_zip(pkg, args):
+    """
+    Builds the zip archive DownloadMenu exports
+    """
+
+    from pycrop2ml_ui.core import export
+    return _timeit(lambda: export.zip_bytes(pkg), args.repeat)
+
+
+def bench_transpile(pkg, args):
+    """
+    Transpiles the package into every language of args.languages, returns the durations of
+    each language
+    """
+
+    from pycropml.cyml import transpile_package
+
+    def clean():
+        for sub in ['src', 'test']:
+            shutil.rmtree(os.path.join(pkg, sub), ignore_errors=True)
+
+    return {language: _timeit(lambda: transpile_package(pkg, language), args.repeat, setup=clean) for language in args.languages}
+
+
+BENCHMARKS = {'parse': bench_parse,
+              'parse_cached': bench_parse_cached,
+              'write_unit': bench_write_unit,
+              'write_composition': bench_write_composition,
+              'build_links': bench_build_links,
+              'zip': bench_zip,
+              'transpile': bench_transpile}
+
+
+def _meta():
+    """
+    Returns the environment the benchmarks ran in
+    """
+
+    try:
+        from pycrop2ml_ui.core import parsecache
+        pycropml = parsecache.pycropml_version()
+    except Exception:
+        pycropml = None
+
+    return {'date': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(), 'pycropml': pycropml}
+
+
+def run(args):
+    """
+    Runs the selected benchmarks for every size and returns the report. A benchmark returning
+    {variant: durations}, such as transpile per language, gives one result per variant.
+    """
+
+    results = []
+    for size in args.sizes:
+        units, ports = [int(i) for i in size.split('x')]
+        args.ports = ports
+        for name in args.benchmarks:
+            entry = {'benchmark': name, 'size': size, 'units': units, 'ports': ports}
+            entries = [entry]
+            workdir = tempfile.mkdtemp(prefix='pycrop2ml-ui-bench-')
+            try:
+                pkg = synthetic.generate_package(workdir, 'Synthetic{}x{}'.format(units, ports), units=units, ports=ports,
+                                                 paramsets=args.paramsets, testsets=args.testsets, depth=args.depth, fanout=args.fanout)
+                durations = BENCHMARKS[name](pkg, args)
+                if isinstance(durations, dict):
+                    entries = [dict(entry, variant=variant, seconds=d) for variant, d in durations.items()]
+                else:
+                    entry['seconds'] = durations
+                for e in entries:
+                    e.update({'min': min(e['seconds']), 'median': statistics.median(e['seconds'])})
+            except Exception:
+                entries = [entry]
+                entry['error'] = traceback.format_exc(limit=3)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+            for e in entries:
+                results.append(e)
+                label = name + (' ' + e['variant'] if 'variant' in e else '')
+                print('{:<18} {:>8} {}'.format(label, size, '{:10.4f} s'.format(e['median']) if 'median' in e else 'error : ' + e['error'].strip().splitlines()[-1]))
+            sys.stdout.flush()
+
+    return {'meta': _meta(), 'parameters': {k: v for k, v in vars(args).items() if k not in ('output', 'ports')}, 'results': results}
+
+
+def main(argv=None):
+    """
+    Runs the benchmark command line and returns its exit status
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['5x5', '20x10', '80x20'], help='UNITSxPORTS package sizes (default: %(default)s)')
+    parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS), help='benchmarks to run (default: all)')
+    parser.add_argument('--paramsets', type=int, default=2, help='parameter sets per unit model (default: %(default)s)')
+    parser.add_argument('--testsets', type=int, default=2, help='test sets per unit model (default: %(default)s)')
+    parser.add_argument('--depth', type=int, default=2, help='levels of compositions (default: %(default)s)')
+    parser.add_argument('--fanout', type=int, default=4, help='models per composition (default: %(default)s)')
+    parser.add_argument('--languages', nargs='+', default=['py'], help='transpile benchmark languages (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (default: %(default)s)')
+    parser.add_argument('--output', default='bench_results.json', help='json report (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    with open(args.output, 'w', encoding='utf8') as f:
+        json.dump(report, f, indent=1)
+    print('Results written to {}'.format(args.output))
+    return int(any('error' in r for r in report['results']))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -62,6 +62,7 @@ setup_kwds = dict(
 # change setup_kwds below before the next pkglts tag
 
 #setup_kwds["entry_points"] = {"console_scripts": ["cyml = pycropml.main:main"]}
+setup_kwds["entry_points"] = {"console_scripts": ["pycrop2ml-ui = pycrop2ml_ui.cli:main"]}
 setup_kwds["url"] = "https://github.com/Pyroxyd/Pycrop2ml_ui"
 #setup_kwds["tests_require"] = ["pytest"]
 
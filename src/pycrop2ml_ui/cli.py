@@ -0,0 +1,206 @@
+"""
+Command line entry point of pycrop2ml_ui : transforms, exports, runs and validates model
+packages without a notebook, with the same code as the corresponding menus.
+
+    pycrop2ml-ui transform PKG [PKG ...] -l py java [-w 4] [--force] [--profile]
+    pycrop2ml-ui export PKG [PKG ...] [-o DIR]
+    pycrop2ml-ui run PKG [PKG ...] -d DATAFILE [-o DIR]
+    pycrop2ml-ui validate PKG [PKG ...]
+
+--all selects every package of the package directory (--root). The exit status is 1
+as soon as one package fails. This module must not import ipywidgets, qgrid or matplotlib.
+"""
+
+import os
+import sys
+import argparse
+import traceback
+
+from pycrop2ml_ui.core import catalog, simulation
+
+
+def _packages(args):
+    """
+    Returns the package paths selected by the command line arguments
+    """
+
+    paths = list(args.packages)
+    if args.all:
+        paths += catalog.get_catalog(args.root).packages()
+    if not paths:
+        raise SystemExit('pycrop2ml-ui: no package given, use PKG arguments or --all')
+
+    missing = [p for p in paths if not catalog.get_catalog(args.root).is_package(p)]
+    if missing:
+        raise SystemExit('pycrop2ml-ui: not a model package : {}'.format(', '.join(missing)))
+    return paths
+
+
+def _transform(args):
+    """
+    Handles the transform command
+    """
+
+    from pycrop2ml_ui.core import transpiler, timings, store
+
+    languages = transpiler.LANGUAGES if 'all' in args.languages else args.languages
+    unknown = [lg for lg in languages if lg not in transpiler.LANGUAGES]
+    if unknown:
+        raise SystemExit('pycrop2ml-ui: unknown language(s) {}, choose among {}'.format(', '.join(unknown), ', '.join(transpiler.LANGUAGES)))
+
+    def report(r):
+        print('{:<30} {:<9} {:<9} {:6.1f} s {:4d} files changed'.format(r['Package'], r['Language'], r['Status'], r['Duration'], r.get('Changed', 0)))
+        sys.stdout.flush()
+
+    results = transpiler.transpile_packages(_packages(args), languages, workers=args.workers, callback=report,
+                                            incremental=not args.force, profile=args.profile,
+                                            store=None if args.no_store else store.get_store(args.store))
+
+    for r in results:
+        if r['Status'] == 'failure':
+            sys.stderr.write('\nCritical error while transpiling the package {} into {} :\n{}'.format(r['Package'], r['Language'], r['Error']))
+    if args.profile:
+        for row in sorted(timings.rows(results), key=lambda row: row['Duration'], reverse=True)[:args.top]:
+            print('{Package:<30} {Language:<9} {Model:<30} {Duration:8.3f} s {Files:4d} files {Peak memory (MB):8.1f} MB'.format(**row))
+
+    return int(any(r['Status'] == 'failure' for r in results))
+
+
+def _export(args):
+    """
+    Handles the export command
+    """
+
+    from pycrop2ml_ui.core import export
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    for path in _packages(args):
+        print(export.export_package(path, args.output))
+    return 0
+
+
+def _run(args):
+    """
+    Handles the run command
+    """
+
+    status = 0
+    for path in _packages(args):
+        datafile = args.data if os.path.isabs(args.data) or os.path.isfile(args.data) else os.path.join(path, 'data', args.data)
+        settings = os.path.dirname(datafile) if args.settings is None else args.settings
+        try:
+            res = simulation.run_simulation(path, datafile, *simulation.read_settings(settings))
+        except Exception:
+            sys.stderr.write('\nSimulation of the package {} failed :\n{}'.format(path, traceback.format_exc()))
+            status = 1
+            continue
+
+        name = os.path.basename(os.path.normpath(path))
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+            target = os.path.join(args.output, name + '.csv')
+            res.to_csv(target, sep=';')
+            print('{} : {}'.format(path, target))
+        else:
+            print('{} :'.format(path))
+            print(res)
+    return status
+
+
+def validate_package(path):
+    """
+    Parses every model of the package path and returns the list of error messages
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    errors = []
+    try:
+        parsecache.parse_package(path)
+    except Exception as e:
+        errors.append('unit models : {}'.format(e))
+
+    parent = os.path.dirname(os.path.abspath(path))
+    units = catalog.get_catalog().models(path, types=('unit',))
+    for filename in catalog.get_catalog().models(path, types=('composition',)):
+        try:
+            model, = parsecache.parse_composition(os.path.join(path, 'crop2ml', filename))
+        except Exception as e:
+            errors.append('{} : {}'.format(filename, e))
+            continue
+        for m in model.model:
+            if m.package_name:
+                if not os.path.isfile(os.path.join(parent, m.package_name, 'crop2ml', m.file)):
+                    errors.append('{} : {} not found in the package {}'.format(filename, m.file, m.package_name))
+            elif m.file not in units and not os.path.isfile(os.path.join(path, 'crop2ml', m.file)):
+                errors.append('{} : {} not found'.format(filename, m.file))
+    return errors
+
+
+def _validate(args):
+    """
+    Handles the validate command
+    """
+
+    status = 0
+    for path in _packages(args):
+        errors = validate_package(path)
+        print('{} : {}'.format(path, 'ok' if not errors else '{} error(s)'.format(len(errors))))
+        for e in errors:
+            print('    {}'.format(e))
+        status = status or int(bool(errors))
+    return status
+
+
+def parser():
+    """
+    Returns the argument parser of the command line
+    """
+
+    main = argparse.ArgumentParser(prog='pycrop2ml-ui', description='Headless pycrop2ml_ui commands on crop2ml model packages.')
+    commands = main.add_subparsers(dest='command')
+    commands.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('packages', nargs='*', metavar='PKG', help='package paths')
+    common.add_argument('--all', action='store_true', help='select every package of the package directory')
+    common.add_argument('--root', default=catalog.PKG_DIRECTORY, help='package directory (default: %(default)s)')
+
+    transform = commands.add_parser('transform', parents=[common], help='transpile packages into target languages')
+    transform.add_argument('-l', '--languages', nargs='+', required=True, metavar='LANG', help='target languages, or all')
+    transform.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes (default: %(default)s)')
+    transform.add_argument('--force', action='store_true', help='transpile the languages the build manifest reports up to date')
+    transform.add_argument('--profile', action='store_true', help='record and print the per-model timing report')
+    transform.add_argument('--store', default=os.environ.get('PYCROP2ML_UI_STORE', '.crop2ml_store'), help='transpilation store directory (default: %(default)s)')
+    transform.add_argument('--no-store', action='store_true', help='neither reuse nor publish generated trees')
+    transform.add_argument('--top', type=int, default=20, help='number of timing rows printed (default: %(default)s)')
+    transform.set_defaults(func=_transform)
+
+    export = commands.add_parser('export', parents=[common], help='write packages as zip archives')
+    export.add_argument('-o', '--output', help='output directory (default: current directory)')
+    export.set_defaults(func=_export)
+
+    run = commands.add_parser('run', parents=[common], help='run the python simulation of packages')
+    run.add_argument('-d', '--data', required=True, help='data file, absolute or relative to the data directory of each package')
+    run.add_argument('-s', '--settings', help='directory of {}, {} and {} (default: directory of the data file)'.format(simulation.DATAMODEL, simulation.PARAMETERS, simulation.INITVALUES))
+    run.add_argument('-o', '--output', help='directory receiving <package>.csv results (default: print them)')
+    run.set_defaults(func=_run)
+
+    validate = commands.add_parser('validate', parents=[common], help='parse every model of packages and check the compositions')
+    validate.set_defaults(func=_validate)
+
+    return main
+
+
+def main(argv=None):
+    """
+    Runs the command line and returns its exit status
+    """
+
+    args = parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
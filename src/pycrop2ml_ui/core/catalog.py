@@ -0,0 +1,176 @@
+import os
+import threading
+
+
+PKG_DIRECTORY = "./packages"
+MODEL_TYPES = ('unit', 'composition')
+CACHE_DIRECTORY = '.crop2ml_cache'
+
+
+class PackageCatalog():
+    """
+    Class indexing the model packages of a workspace for pycrop2ml's user interface.
+
+    Every directory listing is kept in memory along with the directory mtime,
+    so a query only costs one stat of the listed directory as long as nothing
+    has been added or removed in it. Menus share one catalog per root through
+    get_catalog() instead of scanning the package directory by themselves.
+
+    Parameters : \n
+        - root : directory holding the packages (server mode)
+    """
+
+    def __init__(self, root=PKG_DIRECTORY):
+
+        self.root = root
+        self._lock = threading.RLock()
+        self._listings = dict() # {directory: (mtime_ns, [(name, isdir)])}
+
+
+    def _scan(self, directory):
+        """
+        Returns the cached listing of directory, scanning it again only if its mtime changed
+        """
+
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._listings.pop(directory, None)
+            return []
+
+        with self._lock:
+            cached = self._listings.get(directory)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+        entries = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                try:
+                    isdir = entry.is_dir()
+                except OSError:
+                    continue
+                entries.append((entry.name, isdir))
+        entries.sort()
+
+        with self._lock:
+            self._listings[directory] = (mtime, entries)
+        return entries
+
+
+    def listdir(self, directory):
+        """
+        Returns the entry names of directory
+        """
+
+        return [name for name, _ in self._scan(directory)]
+
+
+    def packages(self):
+        """
+        Returns the path of every package stored under the catalog root
+        """
+
+        return [os.path.join(self.root, name) for name, isdir in self._scan(self.root) if isdir]
+
+
+    def is_package(self, path):
+        """
+        Returns whether path is a model package, ie contains a crop2ml directory
+        """
+
+        return any(name == 'crop2ml' and isdir for name, isdir in self._scan(path))
+
+
+    def model_files(self, pkg, types=MODEL_TYPES):
+        """
+        Returns {filename: mtime_ns} for every model xml file of the package pkg
+        whose type is in types. The files are stat'ed on each call, since editing
+        a file in place does not change the mtime of its directory.
+        """
+
+        files = dict()
+        for name in self.models(pkg, types):
+            try:
+                files[name] = os.stat(os.path.join(pkg, 'crop2ml', name)).st_mtime_ns
+            except OSError:
+                continue
+        return files
+
+
+    def models(self, pkg, types=MODEL_TYPES):
+        """
+        Returns the sorted list of model xml filenames of the package pkg
+        """
+
+        models = []
+        for name, isdir in self._scan(os.path.join(pkg, 'crop2ml')):
+            split = name.split('.')
+            if not isdir and split[0] in types and split[-1] == 'xml':
+                models.append(name)
+        return models
+
+
+    def datafiles(self, pkg):
+        """
+        Returns the path of every file under the data directory of the package pkg, the
+        columnar caches of the data files (CACHE_DIRECTORY) excepted
+        """
+
+        files = []
+        stack = [os.path.join(pkg, 'data')]
+        while stack:
+            directory = stack.pop()
+            for name, isdir in self._scan(directory):
+                if isdir:
+                    if name != CACHE_DIRECTORY:
+                        stack.append(os.path.join(directory, name))
+                else:
+                    files.append(os.path.join(directory, name))
+        return files
+
+
+    def invalidate(self, path=None):
+        """
+        Drops the cached listings of path, of its subdirectories and of its parents, or every listing if path is None
+        """
+
+        with self._lock:
+            if path is None:
+                self._listings.clear()
+                return
+
+            path = os.path.normpath(path)
+            for directory in list(self._listings):
+                norm = os.path.normpath(directory)
+                if norm == path or norm.startswith(path + os.path.sep) or path.startswith(norm + os.path.sep):
+                    del self._listings[directory]
+
+
+
+_catalogs = dict()
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(root=PKG_DIRECTORY):
+    """
+    Returns the catalog shared by every menu for the given root directory
+    """
+
+    key = os.path.abspath(root)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = PackageCatalog(root)
+        return _catalogs[key]
+
+
+def invalidate(path=None):
+    """
+    Drops the cached listings related to path in every catalog
+    """
+
+    with _catalogs_lock:
+        catalogs = list(_catalogs.values())
+    for c in catalogs:
+        c.invalidate(path)
@@ -0,0 +1,285 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import contextlib
+import collections
+
+from pycrop2ml_ui.core import catalog, parsecache
+
+
+MAX_SCHEMAS = 64
+SAMPLE_ROWS = 100
+COLUMNS = 'columns.json'
+FORMAT = 3
+
+_schemas = parsecache.ParseCache(max_bytes=None, max_entries=MAX_SCHEMAS)
+
+
+def _probe(path, sep, sample):
+    """
+    Returns the schema of the data file path read from its header and first sample rows
+    """
+
+    import pandas as pd
+
+    head = pd.read_csv(path, sep=sep, nrows=sample)
+    return {'Columns': list(head.columns), 'Dtypes': {c: str(t) for c, t in head.dtypes.items()}, 'Sample': head}
+
+
+def schema(path, sep=';', sample=SAMPLE_ROWS):
+    """
+    Returns the schema of the data file path : its 'Columns', the 'Dtypes' inferred from the
+    first sample rows and these rows ('Sample').
+
+    Only the header and the sample are read. Schemas are cached until the file mtime or size
+    changes, they are shared by every caller and must not be modified.
+    """
+
+    key = ('schema', os.path.abspath(path), sep, sample)
+    return _schemas.get(key, [path], lambda: _probe(path, sep, sample))
+
+
+def columns(path, sep=';'):
+    """
+    Returns the column names of the data file path
+    """
+
+    return list(schema(path, sep)['Columns'])
+
+
+def cache_directory(path, sep=';'):
+    """
+    Returns the columnar cache directory of the data file path for its current mtime and size
+    and the cache FORMAT.
+
+    The cache of a file of a package data directory, or of any of its subdirectories, lives in
+    the package .crop2ml_cache directory, the cache of any other file in a .crop2ml_cache
+    directory next to it.
+    """
+
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    parent = directory
+    while os.path.basename(parent) != 'data' and os.path.dirname(parent) != parent:
+        parent = os.path.dirname(parent)
+    if os.path.basename(parent) == 'data':
+        directory = os.path.dirname(parent)
+    st = os.stat(path)
+    digest = hashlib.sha1(json.dumps([path, st.st_mtime_ns, st.st_size, sep, FORMAT]).encode('utf8')).hexdigest()[:16]
+    return os.path.join(directory, catalog.CACHE_DIRECTORY, 'data', '{}.{}'.format(_prefix(path), digest))
+
+
+def _prefix(path):
+    """
+    Returns the name prefix of the caches of the data file path, unique to its absolute path
+    """
+
+    return '{}.{}'.format(os.path.basename(path), hashlib.sha1(path.encode('utf8')).hexdigest()[:8])
+
+
+def _write_columns(path, sep, target):
+    """
+    Parses the data file path and writes one .npy file per column and their description into
+    the directory target. Text columns are stored as fixed width unicode arrays and boolean
+    columns with missing values as boolean arrays, with a <column>.missing.npy mask of their
+    missing values if they have some.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(path, sep=sep)
+    names = []
+    missing = []
+    for i, (name, column) in enumerate(df.items()):
+        values = column.to_numpy()
+        if values.dtype == object:
+            mask = column.isna().to_numpy()
+            if all(isinstance(v, (bool, np.bool_)) for v in values[~mask]) and not mask.all():
+                values = column.where(~mask, False).to_numpy(dtype=bool)
+            else:
+                values = column.where(~mask, '').astype(str).to_numpy(dtype=str)
+            if mask.any():
+                np.save(os.path.join(target, '{}.missing.npy'.format(i)), mask, allow_pickle=False)
+                missing.append(i)
+        np.save(os.path.join(target, '{}.npy'.format(i)), values, allow_pickle=False)
+        names.append(name)
+    with open(os.path.join(target, COLUMNS), 'w', encoding='utf8') as f:
+        json.dump({'columns': names, 'rows': len(df), 'missing': missing}, f)
+
+
+def cache(path, sep=';'):
+    """
+    Returns the columnar cache directory of the data file path, converting the file on first
+    use. Outdated caches of the file are removed.
+    """
+
+    target = cache_directory(path, sep)
+    if os.path.isfile(os.path.join(target, COLUMNS)):
+        return target
+
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+    prefix = _prefix(os.path.abspath(path)) + '.'
+    for name in os.listdir(parent):
+        if name.startswith(prefix) and len(name) == len(prefix) + 16 and name != os.path.basename(target):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    tmp = tempfile.mkdtemp(prefix='tmp-', dir=parent)
+    try:
+        _write_columns(path, sep, tmp)
+        os.rename(tmp, target)
+    except OSError:
+        if not os.path.isfile(os.path.join(target, COLUMNS)):
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def memmap_columns(path, sep=';'):
+    """
+    Returns the {column name: read-only numpy memmap} of the data file path. The pages of a
+    column are shared by every process reading it. A text or boolean column with missing
+    values is returned as an object array holding NaN for them instead.
+    """
+
+    return _load(cache(path, sep))
+
+
+def _load(target):
+    """
+    Returns the {column name: read-only numpy memmap} of the columnar cache directory target
+    """
+
+    import numpy as np
+
+    with open(os.path.join(target, COLUMNS), encoding='utf8') as f:
+        description = json.load(f)
+    values = dict()
+    for i, name in enumerate(description['columns']):
+        values[name] = np.load(os.path.join(target, '{}.npy'.format(i)), mmap_mode='r', allow_pickle=False)
+        if i in description.get('missing', []):
+            values[name] = values[name].astype(object)
+            values[name][np.load(os.path.join(target, '{}.missing.npy'.format(i)), allow_pickle=False)] = np.nan
+    return values
+
+
+def _frame(values, index_col=None):
+    """
+    Returns the DataFrame of the columns values {name: array} indexed by the column at the
+    position index_col if given
+    """
+
+    import pandas as pd
+
+    df = pd.DataFrame(values, columns=list(values))
+    if index_col is not None:
+        df = df.set_index(df.columns[index_col])
+    return df
+
+
+def read(path, sep=';', index_col=None):
+    """
+    Returns the data file path as a pandas DataFrame read from its columnar cache, like
+    pandas.read_csv(path, sep=sep, index_col=index_col) with an optional column position.
+    The file is parsed directly if the cache cannot be written, e.g. in a read-only package.
+    """
+
+    import pandas as pd
+
+    try:
+        return _frame(memmap_columns(path, sep), index_col)
+    except OSError:
+        return pd.read_csv(path, sep=sep, index_col=index_col)
+
+
+class _CachedPandas(object):
+    """
+    Stands for the pandas module in a module reading data files through cached_reads : its
+    read_csv serves the data files of files from their columnar cache, any other attribute is the
+    one of pandas.
+
+    Parameters : \n
+        - pandas : the pandas module
+        - files : {(absolute path, separator): cache directory} of the data files served
+    """
+
+    def __init__(self, pandas, files):
+
+        self._pandas = pandas
+        self._files = files
+
+    def read_csv(self, filepath_or_buffer, *args, **kwargs):
+        """
+        Returns pandas.read_csv(filepath_or_buffer, *args, **kwargs), from the columnar cache
+        for a served file read with sep, delimiter and an integer index_col only
+        """
+
+        separator = kwargs.get('delimiter', kwargs.get('sep', ','))
+        index_col = kwargs.get('index_col')
+        if (not args and isinstance(filepath_or_buffer, (str, os.PathLike))
+                and set(kwargs) <= {'sep', 'delimiter', 'index_col'} and (index_col is None or isinstance(index_col, int))):
+            directory = self._files.get((os.path.abspath(filepath_or_buffer), separator))
+            if directory is not None:
+                try:
+                    return _frame(_load(directory), index_col)
+                except OSError:
+                    pass
+        return self._pandas.read_csv(filepath_or_buffer, *args, **kwargs)
+
+    def __getattr__(self, name):
+
+        return getattr(self._pandas, name)
+
+
+_lock = threading.Lock()
+_patched = dict()
+
+
+@contextlib.contextmanager
+def cached_reads(path, module, sep=';'):
+    """
+    Context manager serving the pandas.read_csv calls of module for the data file path from
+    its columnar cache, for the simulation code pycropml generates, which takes a data file
+    path and parses it itself. Only the globals of module bound to pandas or pandas.read_csv
+    are replaced while active, pandas itself and the other modules are unchanged. Calls with
+    other files or other arguments than sep, delimiter and an integer index_col go to
+    pandas.read_csv, and nothing is replaced if the cache cannot be written.
+    """
+
+    import pandas as pd
+
+    try:
+        directory = cache(path, sep)
+    except OSError:
+        yield
+        return
+
+    key = (os.path.abspath(path), sep)
+    namespace = vars(module)
+    with _lock:
+        patched = _patched.get(id(namespace))
+        if patched is None:
+            files = dict()
+            proxy = _CachedPandas(pd, files)
+            saved = {name: value for name, value in namespace.items() if value is pd or value is pd.read_csv}
+            namespace.update({name: proxy if value is pd else proxy.read_csv for name, value in saved.items()})
+            patched = _patched[id(namespace)] = [saved, files, collections.Counter()]
+        saved, files, users = patched
+        files[key] = directory
+        users[key] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            users[key] -= 1
+            if not users[key]:
+                del users[key]
+                del files[key]
+            if not users:
+                namespace.update(saved)
+                del _patched[id(namespace)]
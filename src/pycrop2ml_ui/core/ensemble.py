@@ -0,0 +1,106 @@
+import os
+import traceback
+from concurrent.futures import as_completed
+
+from pycrop2ml_ui.core import simulation, datafiles
+
+
+def parameter_table(base, values):
+    """
+    Returns the name/value parameter table of one run : the table base with the values
+    {name: value} replaced
+    """
+
+    import pandas as pd
+
+    table = dict(zip(base['name'], base['value']))
+    table.update(values)
+    return pd.DataFrame({'name': list(table), 'value': list(table.values())})
+
+
+def _run(pkg, datafile, datamodel, base, runs, initvalues, reduce=None):
+    """
+    Worker process task : runs the simulations [(run id, {name: value})] of the package pkg
+    and returns the {run id: (result, error)} of the batch, result being reduced by reduce
+    if given
+    """
+
+    done = dict()
+    for run, values in runs:
+        try:
+            result = simulation.run_simulation(pkg, datafile, datamodel, parameter_table(base, values), initvalues)
+            done[run] = (result if reduce is None else reduce(result), None)
+        except Exception:
+            done[run] = (None, traceback.format_exc())
+    return done
+
+
+def run_ensemble(pkg, datafile, paramsets, base, datamodel=[], initvalues=[], workers=None, callback=None, reduce=None, chunksize=None):
+    """
+    Runs the simulation of the package pkg once per row of paramsets in the shared simulation
+    pool (see simulation.get_pool) and returns the (results, errors) of the ensemble.
+
+    results concatenates the result tables of the successful runs under a 'Run' index level
+    holding the run ids, the index of paramsets, which must be unique. errors maps the id of
+    every failed run to its traceback. The data file is converted to its columnar cache once
+    before the runs, which all read it from there.
+
+    Parameters : \n
+        - pkg : package path
+        - datafile : data file of the simulations
+        - paramsets : pandas.DataFrame, one row per run and one column per parameter to change
+        - base : name/value parameter table completed by every row, see ExecutionMenu.parameters
+        - datamodel : data-model mapping table
+        - initvalues : initial values table
+        - workers : minimum number of worker processes of the pool, os.cpu_count() by default
+        - callback : callback(run, done, total) called when a run ends
+        - reduce : picklable function applied to each result table in the worker, returning a
+                   pandas.Series ; results is then a table with one row per run
+        - chunksize : number of runs sent to a worker at once, chosen from the number of runs
+                      and workers by default
+    """
+
+    import pandas as pd
+
+    unknown = [c for c in paramsets.columns if c not in list(base['name'])]
+    if unknown:
+        raise Exception('Unknown parameters : {}.'.format(', '.join(str(c) for c in unknown)))
+    duplicates = paramsets.index[paramsets.index.duplicated()].unique()
+    if len(duplicates):
+        raise Exception('Duplicate run ids : {}.'.format(', '.join(str(r) for r in duplicates)))
+
+    runs = list(paramsets.index)
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or max(1, min(64, len(runs) // (workers * 8)))
+    rows = list(zip(runs, paramsets.to_dict('records')))
+    base = pd.DataFrame({'name': list(base['name']), 'value': list(base['value'])})
+    results = dict()
+    errors = dict()
+    try:
+        datafiles.cache(datafile)
+    except Exception:
+        pass
+
+    pool = simulation.get_pool()
+    pool.grow(workers)
+    futures = {pool.call(_run, pkg, datafile, datamodel, base, rows[i:i+chunksize], initvalues, reduce): rows[i:i+chunksize]
+               for i in range(0, len(rows), chunksize)}
+    for future in as_completed(futures):
+        try:
+            batch = future.result()
+        except Exception:
+            batch = {run: (None, traceback.format_exc()) for run, _ in futures[future]}
+        for run, (result, error) in batch.items():
+            if error is None:
+                results[run] = result
+            else:
+                errors[run] = error
+            if callback:
+                callback(run, len(results) + len(errors), len(runs))
+
+    done = [run for run in runs if run in results]
+    if reduce is not None:
+        return pd.DataFrame([results[run] for run in done], index=pd.Index(done, name='Run')), errors
+    if not done:
+        return pd.DataFrame(), errors
+    return pd.concat([results[run] for run in done], keys=done, names=['Run']), errors
@@ -0,0 +1,47 @@
+import os
+import zipfile
+from io import BytesIO
+
+from pycrop2ml_ui.core import catalog
+
+
+def write_zip(directory, fileobj):
+    """
+    Writes the package directory as a zip archive into fileobj, a path or a file object.
+
+    Entries are stored under the package name and the cache directory is left out.
+    """
+
+    directory = os.path.normpath(directory)
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if d != catalog.CACHE_DIRECTORY]
+            for file in files:
+                zf.write(os.path.join(root, file),
+                         os.path.relpath(os.path.join(root, file), os.path.join(directory, '..')))
+
+
+def zip_bytes(directory):
+    """
+    Returns the zip archive of the package directory as bytes
+    """
+
+    bytes_zip = BytesIO()
+    write_zip(directory, bytes_zip)
+    return bytes_zip.getvalue()
+
+
+def export_package(directory, target=None):
+    """
+    Writes the zip archive of the package directory to target, <package name>.zip
+    in the current directory by default, or into target if it is a directory.
+    Returns the path of the archive.
+    """
+
+    name = os.path.basename(os.path.normpath(directory)) + '.zip'
+    if target is None:
+        target = name
+    elif os.path.isdir(target):
+        target = os.path.join(target, name)
+    write_zip(directory, target)
+    return target
@@ -0,0 +1,199 @@
+import time
+import logging
+import weakref
+import asyncio
+import threading
+import traceback
+from concurrent.futures import Future
+
+from pycrop2ml_ui.core import transpiler
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+
+logger = logging.getLogger(__name__)
+
+
+
+class TranspileJob():
+    """
+    Class running the transpilation of packages in the background for pycrop2ml's user interface.
+
+    The (package, language) tasks are run by transpiler.transpile_packages() in a daemon
+    thread, so the kernel stays responsive while pycropml works. The state of every task
+    (pending, running, then the status of its result) is available at any time in
+    self.states, and the subscribers are called on every change.
+
+    The job is awaitable from a notebook cell (await job) and exposes a
+    concurrent.futures.Future in self.future resolving to the list of results.
+
+    Parameters : \n
+        - packages : package path, or list of package paths
+        - languages : list of target languages
+        - workers : size of the process pool shared by every task, see transpiler.transpile_packages
+        - incremental : skip the languages whose build manifest entry is up to date
+        - profile : record the per-model timing report, see transpiler.transpile_packages
+        - store : TranspileStore shared by the transpilations, see store.get_store()
+    """
+
+    def __init__(self, packages, languages, workers=1, incremental=False, profile=False, store=None):
+
+        self.packages = [packages] if isinstance(packages, str) else list(packages)
+        self.languages = list(languages)
+        self.workers = workers
+        self.incremental = incremental
+        self.profile = profile
+        self.store = store
+
+        self.tasks = [(path, lg) for path in self.packages for lg in self.languages]
+        self.states = {task: PENDING for task in self.tasks}
+        self.results = dict() # {(package, language): result}
+        self.started = None
+        self.finished = None
+        self.future = Future()
+
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._thread = None
+
+
+    def subscribe(self, callback):
+        """
+        Registers callback(job, task), called when the state of a (package, language) task
+        changes and once with task None when the job ends. Bound methods are weakly referenced.
+        """
+
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            self._subscribers.append(ref)
+        return callback
+
+
+    def _notify(self, task):
+        """
+        Calls every live subscriber
+        """
+
+        with self._lock:
+            callbacks = [ref() for ref in self._subscribers]
+
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(self, task)
+            except Exception:
+                logger.exception('Transpile job subscriber %r failed on %r', callback, task)
+
+
+    def _on_start(self, path, language):
+        """
+        Handles the start of a task
+        """
+
+        self.states[(path, language)] = RUNNING
+        self._notify((path, language))
+
+
+    def _on_result(self, result):
+        """
+        Handles the result of a task
+        """
+
+        task = (result['Package'], result['Language'])
+        self.results[task] = result
+        self.states[task] = result['Status']
+        self._notify(task)
+
+
+    def _run(self):
+        """
+        Job thread
+        """
+
+        try:
+            results = transpiler.transpile_packages(self.packages, self.languages, workers=self.workers,
+                                                    callback=self._on_result, incremental=self.incremental,
+                                                    on_start=self._on_start, cancel=self._cancel, profile=self.profile,
+                                                    store=self.store)
+        except Exception:
+            for path, lg in self.tasks:
+                if self.states[(path, lg)] in (PENDING, RUNNING):
+                    self._on_result({'Package': path, 'Language': lg, 'Status': 'failure',
+                                     'Duration': 0.0, 'Error': traceback.format_exc(), 'Changed': 0})
+            results = [self.results[task] for task in self.tasks]
+
+        self.finished = time.time()
+        self.future.set_result(results)
+        self._notify(None)
+
+
+    def start(self):
+        """
+        Starts the job thread and returns the job
+        """
+
+        if self._thread is None:
+            self.started = time.time()
+            self.future.set_running_or_notify_cancel()
+            self._thread = threading.Thread(target=self._run, name='pycrop2ml-ui-transpile', daemon=True)
+            self._thread.start()
+        return self
+
+
+    def cancel(self):
+        """
+        Requests the cancellation of the job : tasks not started yet are not run
+        and the outputs of the running ones are discarded
+        """
+
+        self._cancel.set()
+
+
+    def cancelled(self):
+        """
+        Returns whether the cancellation of the job was requested
+        """
+
+        return self._cancel.is_set()
+
+
+    def running(self):
+        """
+        Returns whether the job thread is running
+        """
+
+        return self._thread is not None and self.finished is None
+
+
+    def elapsed(self):
+        """
+        Returns the time elapsed since the job started, in seconds
+        """
+
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+    def progress(self):
+        """
+        Returns the (done, total) number of tasks
+        """
+
+        return len(self.results), len(self.tasks)
+
+
+    def wait(self, timeout=None):
+        """
+        Waits for the end of the job and returns the list of results
+        """
+
+        return self.future.result(timeout)
+
+
+    def __await__(self):
+
+        return asyncio.wrap_future(self.future).__await__()
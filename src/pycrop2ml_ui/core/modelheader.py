@@ -0,0 +1,116 @@
+import os
+import html
+import threading
+from collections import namedtuple
+from xml.etree import ElementTree
+
+
+ModelHeader = namedtuple('ModelHeader', ['filename', 'type', 'name', 'id', 'version', 'timestep',
+                                         'title', 'authors', 'institution', 'reference', 'abstract'])
+
+_FIELDS = {'Title': 'title', 'Authors': 'authors', 'Institution': 'institution', 'Reference': 'reference', 'Abstract': 'abstract'}
+
+_headers = dict() # {path: (mtime_ns, size, ModelHeader)}
+_lock = threading.Lock()
+
+
+def _scan(path):
+    """
+    Reads the root attributes and the Description of the model xml file path,
+    stopping as soon as the Description element is closed
+    """
+
+    filename = os.path.basename(path)
+    attrs = dict()
+    desc = dict()
+    depth = 0
+
+    try:
+        for event, elt in ElementTree.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if depth == 0:
+                    attrs = dict(elt.attrib)
+                depth += 1
+                continue
+
+            depth -= 1
+            if elt.tag in _FIELDS and depth == 2:
+                desc[_FIELDS[elt.tag]] = (elt.text or '').strip()
+            elif elt.tag == 'Description' and depth == 1:
+                break
+    except ElementTree.ParseError:
+        pass
+
+    return ModelHeader(filename=filename,
+                       type=filename.split('.')[0],
+                       name=attrs.get('name', filename.split('.')[1] if filename.count('.') > 1 else ''),
+                       id=attrs.get('modelid', attrs.get('id', '')),
+                       version=attrs.get('version', ''),
+                       timestep=attrs.get('timestep', ''),
+                       title=desc.get('title', ''),
+                       authors=desc.get('authors', ''),
+                       institution=desc.get('institution', ''),
+                       reference=desc.get('reference', ''),
+                       abstract=desc.get('abstract', ''))
+
+
+def read_header(path):
+    """
+    Returns the ModelHeader of the model xml file path without parsing the whole model.
+
+    Headers are cached until the mtime or the size of the file changes.
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _headers.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+
+    header = _scan(path)
+    with _lock:
+        _headers[path] = (st.st_mtime_ns, st.st_size, header)
+    return header
+
+
+def package_headers(pkg, filenames):
+    """
+    Returns the ModelHeader of every model xml file of filenames in the package pkg
+    """
+
+    return [read_header(os.path.join(pkg, 'crop2ml', f)) for f in filenames]
+
+
+def label(header, width=60):
+    """
+    Returns a one-line description of a model for selection widgets
+    """
+
+    title = header.title if len(header.title) <= width else header.title[:width-3] + '...'
+    infos = ' '.join(i for i in [header.id, 'v{}'.format(header.version) if header.version else ''] if i)
+    return '{}{}{}'.format(header.filename, ' [{}]'.format(infos) if infos else '', ' {}'.format(title) if title else '')
+
+
+def options(pkg, filenames):
+    """
+    Returns [(label, filename)] options describing the model files filenames of the package pkg
+    """
+
+    return [(label(h), f) if h is not None else (f, f) for h, f in zip(package_headers(pkg, filenames), filenames)]
+
+
+def html_rows(pkg, filenames, prefix=''):
+    """
+    Returns the html table rows (file, id, version, title) describing the model files filenames of the package pkg
+    """
+
+    rows = ''
+    for h in package_headers(pkg, filenames):
+        if h is None:
+            continue
+        rows += '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>'.format(*[html.escape(i) for i in [prefix + h.filename, h.id, h.version, h.title]])
+    return rows
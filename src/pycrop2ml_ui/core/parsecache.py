@@ -0,0 +1,353 @@
+import os
+import glob
+import pickle
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+from xml.etree import ElementTree
+
+from pycropml import pparse
+from pycropml import composition
+
+from pycrop2ml_ui.core.catalog import CACHE_DIRECTORY
+
+
+MAX_BYTES = 256 * 1024 * 1024
+EXPANSION = 10 # approximate memory footprint of a parsed model per byte of its source files
+DISK_CACHE = os.environ.get('PYCROP2ML_UI_DISK_CACHE', '') not in ('', '0')
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=None)
+def pycropml_version():
+    """
+    Returns the installed pycropml version
+    """
+
+    try:
+        from importlib.metadata import version
+        return version('pycropml')
+    except Exception:
+        import pycropml
+        return getattr(pycropml, '__version__', 'unknown')
+
+
+def signature(sources):
+    """
+    Returns the (path, mtime_ns, size) tuple of every existing file of sources
+    """
+
+    sig = []
+    for path in sources:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        sig.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+
+def _sizeof(value, sig):
+    """
+    Returns the approximate memory footprint of value in bytes, estimated from the
+    size of the source files it was built from so a miss does not pay a measure
+    """
+
+    return EXPANSION * sum(size for _, _, size in sig)
+
+
+def package_sources(pkg):
+    """
+    Returns every file of the crop2ml directory of the package pkg, algorithms included
+    """
+
+    sources = []
+    for root, dirs, files in os.walk(os.path.join(pkg, 'crop2ml')):
+        dirs.sort()
+        for f in sorted(files):
+            sources.append(os.path.join(root, f))
+    return sources
+
+
+
+def content_digest(key, sources):
+    """
+    Returns the content hash identifying the disk entry of key built from sources
+    """
+
+    h = hashlib.sha256()
+    h.update(repr((pycropml_version(), key)).encode('utf8'))
+    for path in sources:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            continue
+        h.update(os.path.basename(path).encode('utf8'))
+        h.update(hashlib.sha256(content).digest())
+    return h.hexdigest()
+
+
+def _disk_prefix(cachedir, key):
+    """
+    Returns the filename prefix shared by every disk entry of key
+    """
+
+    return os.path.join(cachedir, '{}.{}.'.format(key[0], hashlib.sha1(repr(key).encode('utf8')).hexdigest()[:16]))
+
+
+def _disk_load(cachedir, key, digest):
+    """
+    Returns the value stored on disk for key and digest, or _MISSING
+    """
+
+    try:
+        with open(_disk_prefix(cachedir, key) + digest + '.pickle', 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return _MISSING
+
+
+def _disk_store(cachedir, key, digest, value):
+    """
+    Writes value on disk for key and digest and removes the stale entries of key
+    """
+
+    prefix = _disk_prefix(cachedir, key)
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cachedir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, prefix + digest + '.pickle')
+    except Exception:
+        return
+
+    for stale in glob.glob(glob.escape(prefix) + '*.pickle'):
+        if stale != prefix + digest + '.pickle':
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def enable_disk_cache(enabled=True):
+    """
+    Enables or disables the persistent parse cache stored in the .crop2ml_cache directory of each package.
+
+    It can also be enabled by setting the environment variable PYCROP2ML_UI_DISK_CACHE=1.
+    """
+
+    global DISK_CACHE
+    DISK_CACHE = enabled
+
+
+def _references(filename):
+    """
+    Returns the files referenced by the filename attributes of the model xml file filename
+    """
+
+    directory = os.path.dirname(filename)
+    refs = []
+    for _, elt in ElementTree.iterparse(filename):
+        ref = elt.get('filename')
+        if ref:
+            refs.append(os.path.join(directory, ref))
+        elt.clear()
+    return refs
+
+
+
+class _ModelFileParser(pparse.ModelParser):
+    """
+    pycropml model parser restricted to one unit model xml file.
+
+    The dispatch of the file reads the algorithm, initialization and function
+    files it references, exactly as a whole package parse would.
+    """
+
+    def parse_file(self, pkg, filename):
+
+        self.models = []
+        self.crop2ml_dir = pkg
+        self.algorep = os.path.join(pkg, 'crop2ml')
+        self.dispatch(ElementTree.parse(filename).getroot())
+        return self.models
+
+
+
+class ParseCache():
+    """
+    Class memoizing pycropml parsing results for pycrop2ml's user interface.
+
+    Each entry is stored with the signature (path, mtime, size) of the files it
+    was built from and is rebuilt as soon as one of them changes. Entries are
+    evicted in least recently used order once their total size, estimated as
+    EXPANSION times the size of their sources, exceeds max_bytes.
+
+    Parsed objects are shared by every caller and must not be modified.
+
+    When the disk cache is enabled, missing entries are first looked up in the
+    cachedir given to get(), where they are stored pickled under a hash of the
+    source contents and of the pycropml version.
+
+    Parameters : \n
+        - max_bytes : memory cap of the cache, None to disable it
+        - max_entries : maximum number of entries, None to disable it
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=None):
+
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._lock = threading.RLock()
+        self._entries = OrderedDict() # {key: (signature, value, size)}
+
+
+    def get(self, key, sources, loader, cachedir=None):
+        """
+        Returns the cached value of key if sources did not change, else stores and returns loader()
+        """
+
+        sig = signature(sources)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if cachedir is None or not DISK_CACHE:
+            value = loader()
+        else:
+            digest = content_digest(key, [path for path, _, _ in sig])
+            value = _disk_load(cachedir, key, digest)
+            if value is _MISSING:
+                value = loader()
+                _disk_store(cachedir, key, digest, value)
+
+        self.put(key, sig, value)
+        return value
+
+
+    def put(self, key, sig, value):
+        """
+        Stores value under key with the source signature sig
+        """
+
+        size = _sizeof(value, sig) if self.max_bytes is not None else 0
+
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[2]
+            self._entries[key] = (sig, value, size)
+            self._size += size
+
+            while len(self._entries) > 1 and any([self.max_bytes is not None and self._size > self.max_bytes,
+                                                  self.max_entries is not None and len(self._entries) > self.max_entries]):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+
+
+    def invalidate(self, key=None):
+        """
+        Drops the entry of key, or every entry if key is None
+        """
+
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._size -= old[2]
+
+
+    def stats(self):
+        """
+        Returns a dict describing the cache usage
+        """
+
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+
+_cache = ParseCache()
+
+
+def get_cache():
+    """
+    Returns the parse cache shared by every menu of the kernel
+    """
+
+    return _cache
+
+
+def parse_package(pkg):
+    """
+    Returns the unit models of the package pkg, as pycropml.pparse.model_parser does
+    """
+
+    pkg = os.path.abspath(pkg)
+    return _cache.get(('package', pkg), package_sources(pkg), lambda: pparse.model_parser(pkg), os.path.join(pkg, CACHE_DIRECTORY))
+
+
+def model_sources(filename):
+    """
+    Returns the model xml file filename and the files it references
+    """
+
+    filename = os.path.abspath(filename)
+    refs = _cache.get(('references', filename), [filename], lambda: _references(filename))
+    return [filename] + refs
+
+
+def parse_model_file(pkg, filename):
+    """
+    Returns the unit models described by the xml file filename of the package pkg,
+    without parsing the other models of the package
+    """
+
+    pkg = os.path.abspath(pkg)
+    filename = os.path.abspath(filename)
+    return _cache.get(('model', filename), model_sources(filename), lambda: _ModelFileParser().parse_file(pkg, filename), os.path.join(pkg, CACHE_DIRECTORY))
+
+
+def parse_model(pkg, name):
+    """
+    Returns the unit model called name of the package pkg, or None if it does not exist.
+
+    Only unit.<name>.xml is parsed when it exists, the whole package otherwise.
+    """
+
+    filename = os.path.join(pkg, 'crop2ml', 'unit.{}.xml'.format(name))
+    if os.path.isfile(filename):
+        for model in parse_model_file(pkg, filename):
+            if model.name == name:
+                return model
+
+    for model in parse_package(pkg):
+        if model.name == name:
+            return model
+    return None
+
+
+def parse_composition(filename):
+    """
+    Returns the models of the composition file filename, as pycropml.composition.model_parser does
+    """
+
+    filename = os.path.abspath(filename)
+    cachedir = os.path.join(os.path.dirname(os.path.dirname(filename)), CACHE_DIRECTORY)
+    return _cache.get(('composition', filename), [filename], lambda: composition.model_parser(filename), cachedir)
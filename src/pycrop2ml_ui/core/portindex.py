@@ -0,0 +1,41 @@
+import os
+
+from pycrop2ml_ui.core import catalog, parsecache
+
+
+def _build(pkg):
+    """
+    Parses the package pkg and returns its port index
+    """
+
+    index = dict()
+
+    for model in parsecache.parse_package(pkg):
+        index['unit.{}.xml'.format(model.name)] = ([i.name for i in model.inputs], [o.name for o in model.outputs])
+
+    for filename in catalog.get_catalog().models(pkg, types=('composition',)):
+        model, = parsecache.parse_composition(os.path.join(pkg, 'crop2ml', filename))
+        index[filename] = (list(model.inputs), list(model.outputs))
+
+    return index
+
+
+def package_ports(pkg):
+    """
+    Returns the port index of the package pkg : {model filename: ([inputs], [outputs])}
+
+    Unit and composition models are both indexed. The index is built once and kept
+    in the shared parse cache until a file of the package changes.
+    """
+
+    pkg = os.path.abspath(pkg)
+    return parsecache.get_cache().get(('ports', pkg), parsecache.package_sources(pkg), lambda: _build(pkg),
+                                      os.path.join(pkg, catalog.CACHE_DIRECTORY))
+
+
+def model_ports(pkg, filename):
+    """
+    Returns the (inputs, outputs) names of the model xml file filename of the package pkg
+    """
+
+    return package_ports(pkg).get(filename, ([], []))
@@ -0,0 +1,351 @@
+import os
+import sys
+import queue
+import pickle
+import atexit
+import hashlib
+import itertools
+import importlib
+import importlib.util
+import importlib.machinery
+import threading
+import contextlib
+import traceback
+import multiprocessing
+from concurrent.futures import Future
+
+from pycrop2ml_ui.core import parsecache, datafiles
+
+
+DATAMODEL = 'datamodel.csv'
+PARAMETERS = 'parameters.csv'
+INITVALUES = 'initvalues.csv'
+WORKERS = int(os.environ.get('PYCROP2ML_UI_SIMULATION_WORKERS', '1'))
+
+_modules = dict() # {src/py directory: (source signature, simulation module)}
+
+
+def source_signature(pkg):
+    """
+    Returns the signature of the python sources generated in the package pkg (src/py)
+    """
+
+    files = []
+    for root, dirs, names in os.walk(os.path.join(pkg, 'src', 'py')):
+        dirs.sort()
+        files += [os.path.join(root, name) for name in sorted(names) if name.endswith('.py')]
+    return parsecache.signature(files)
+
+
+def namespace(pkg):
+    """
+    Returns the unique module name the generated python package of the package pkg is
+    imported under
+    """
+
+    source = os.path.abspath(os.path.join(pkg, 'src', 'py'))
+    return '_crop2ml_simulation_' + hashlib.sha1(source.encode('utf8')).hexdigest()[:16]
+
+
+@contextlib.contextmanager
+def _aliased(model, package):
+    """
+    Context manager making the absolute imports of model, and of its modules, resolve to the
+    module package. The modules of that name the process had before are put back afterwards.
+    """
+
+    def owned():
+        return {n: m for n, m in sys.modules.items() if n == model or n.startswith(model + '.')}
+
+    saved = owned()
+    for name in saved:
+        del sys.modules[name]
+    sys.modules[model] = package
+    try:
+        yield
+    finally:
+        for name in owned():
+            del sys.modules[name]
+        sys.modules.update(saved)
+
+
+def simulation_module(pkg):
+    """
+    Returns the simulation module generated in the python sources (src/py) of the package pkg.
+
+    The generated package is imported under a name unique to its path (see namespace), so
+    packages of the same name do not clash and neither sys.path nor the modules of the
+    process are changed. It is imported once per process and imported again when its
+    sources change.
+    """
+
+    source = os.path.abspath(os.path.join(pkg, 'src', 'py'))
+    model = os.path.basename(os.path.normpath(pkg))
+    directory = os.path.join(source, model)
+    sig = source_signature(pkg)
+
+    loaded = _modules.get(source)
+    if loaded is not None and loaded[0] == sig:
+        return loaded[1]
+
+    name = namespace(pkg)
+    for n in [n for n in sys.modules if n == name or n.startswith(name + '.')]:
+        del sys.modules[n]
+    importlib.invalidate_caches()
+
+    init = os.path.join(directory, '__init__.py')
+    if os.path.isfile(init):
+        spec = importlib.util.spec_from_file_location(name, init, submodule_search_locations=[directory])
+    else:
+        spec = importlib.machinery.ModuleSpec(name, None, is_package=True)
+        spec.submodule_search_locations = [directory]
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[name] = package
+    try:
+        with _aliased(model, package):
+            if spec.loader is not None:
+                spec.loader.exec_module(package)
+            module = importlib.import_module('.simulation', name)
+    except BaseException:
+        del sys.modules[name]
+        raise
+
+    _modules[source] = (sig, module)
+    return module
+
+
+def read_settings(directory):
+    """
+    Returns the (data-model mapping, parameters, initial values) saved by the execution menu
+    in directory as pandas DataFrames, an empty list standing for a missing file
+    """
+
+    import pandas as pd
+
+    settings = []
+    for name in [DATAMODEL, PARAMETERS, INITVALUES]:
+        path = os.path.join(directory, name)
+        settings.append(pd.read_csv(path, sep=";") if os.path.isfile(path) else [])
+    return tuple(settings)
+
+
+def run_simulation(pkg, datafile, datamodel, params, initvalues):
+    """
+    Runs the simulation of the package pkg on the data file datafile and returns its results,
+    the data file being read from its columnar cache (see datafiles.cached_reads)
+    """
+
+    module = simulation_module(pkg)
+    with datafiles.cached_reads(datafile, module):
+        return module.simulation(datafile, datamodel, params, initvalues)
+
+
+
+def _import(pkg):
+    """
+    Imports the simulation module of the package pkg
+    """
+
+    simulation_module(pkg)
+
+
+def _serve(requests, responses):
+    """
+    Worker process loop of SimulationPool : runs the requests (id, function, args) until it
+    gets None and answers (id, pickled function(*args), error)
+    """
+
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        id, function, args = request
+        try:
+            responses.put((id, pickle.dumps(function(*args)), None))
+        except Exception:
+            responses.put((id, None, traceback.format_exc()))
+
+
+
+class SimulationPool():
+    """
+    Class running simulations in persistent worker processes for pycrop2ml's user interface.
+
+    Each worker imports the generated simulation module of a package once and keeps it
+    until its sources change (see simulation_module), so a run neither pays the import
+    again nor leaves the package in the sys.path and sys.modules of the kernel. Requests
+    go to the worker with the fewest pending runs through its queue ; a worker that stops
+    is replaced and its pending runs fail. Ensembles and sweeps send batches of runs
+    through call(), after growing the pool to their number of workers.
+
+    Parameters : \n
+        - workers : number of worker processes
+    """
+
+    def __init__(self, workers=WORKERS):
+
+        self._context = multiprocessing.get_context('spawn')
+        self._responses = self._context.Queue()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._workers = [self._spawn() for _ in range(max(workers, 1))] # [[process, requests, {id: future}]]
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+
+    def _spawn(self):
+        """
+        Starts a worker process and returns its [process, request queue, pending futures]
+        """
+
+        requests = self._context.Queue()
+        process = self._context.Process(target=_serve, args=(requests, self._responses), daemon=True)
+        process.start()
+        return [process, requests, dict()]
+
+
+    def _send(self, worker, function, args):
+        """
+        Queues the call function(*args) to worker and returns its future, the lock being held
+        """
+
+        if self._closed:
+            raise Exception('The simulation pool is closed.')
+        future = Future()
+        id = next(self._ids)
+        worker[2][id] = future
+        worker[1].put((id, function, args))
+        return future
+
+
+    def grow(self, workers):
+        """
+        Starts worker processes until the pool has at least workers of them
+        """
+
+        with self._lock:
+            if self._closed:
+                raise Exception('The simulation pool is closed.')
+            while len(self._workers) < workers:
+                self._workers.append(self._spawn())
+
+
+    def call(self, function, *args):
+        """
+        Queues function(*args) to the least busy worker and returns a concurrent.futures.Future
+        of its result. function and args must be picklable, function being importable by a
+        spawned process.
+        """
+
+        with self._lock:
+            worker = min(self._workers, key=lambda w: len(w[2]))
+            return self._send(worker, function, args)
+
+
+    def submit(self, pkg, datafile, datamodel=[], params=[], initvalues=[]):
+        """
+        Queues the simulation of the package pkg and returns a concurrent.futures.Future of
+        its results
+        """
+
+        return self.call(run_simulation, pkg, datafile, datamodel, params, initvalues)
+
+
+    def run(self, pkg, datafile, datamodel=[], params=[], initvalues=[]):
+        """
+        Runs the simulation of the package pkg in a worker and returns its results
+        """
+
+        return self.submit(pkg, datafile, datamodel, params, initvalues).result()
+
+
+    def warm(self, pkg):
+        """
+        Imports the simulation module of the package pkg in every worker and returns the futures
+        """
+
+        with self._lock:
+            return [self._send(worker, _import, (pkg,)) for worker in self._workers]
+
+
+    def _read(self):
+        """
+        Reader thread : resolves the futures of the worker responses and replaces the stopped workers
+        """
+
+        while True:
+            try:
+                id, result, error = self._responses.get(timeout=0.5)
+            except queue.Empty:
+                if self._check():
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+
+            with self._lock:
+                future = next((w[2].pop(id) for w in self._workers if id in w[2]), None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(Exception(error))
+                continue
+            try:
+                future.set_result(pickle.loads(result))
+            except Exception as e:
+                future.set_exception(e)
+
+
+    def _check(self):
+        """
+        Fails the pending runs of the stopped workers and replaces them, returns True once
+        the pool is closed and idle
+        """
+
+        with self._lock:
+            for index, (process, _, pending) in enumerate(self._workers):
+                if process.is_alive():
+                    continue
+                for future in pending.values():
+                    future.set_exception(Exception('The simulation worker stopped (exit code {}).'.format(process.exitcode)))
+                pending.clear()
+                if not self._closed:
+                    self._workers[index] = self._spawn()
+            return self._closed and not any(w[2] for w in self._workers)
+
+
+    def close(self, timeout=5):
+        """
+        Stops the worker processes once their pending runs are done
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for _, requests, _ in self._workers:
+                requests.put(None)
+        for process, _, _ in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the simulation pool shared by every menu, started on first use, i.e. the first
+    run, with WORKERS worker processes (PYCROP2ML_UI_SIMULATION_WORKERS)
+    """
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SimulationPool()
+            atexit.register(_pool.close)
+        return _pool
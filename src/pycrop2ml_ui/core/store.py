@@ -0,0 +1,324 @@
+import os
+import sys
+import json
+import stat
+import shutil
+import logging
+import hashlib
+import tempfile
+import threading
+
+from pycrop2ml_ui.core import transpiler
+
+
+STORE_DIRECTORY = os.environ.get('PYCROP2ML_UI_STORE', '.crop2ml_store')
+MAX_BYTES = int(os.environ.get('PYCROP2ML_UI_STORE_MB', '2048')) * 1024 * 1024
+LINK = os.environ.get('PYCROP2ML_UI_STORE_LINK', '') not in ('', '0')
+TRUSTED = [int(uid) for uid in os.environ.get('PYCROP2ML_UI_STORE_TRUSTED', '').split(',') if uid.strip()]
+ENTRY = 'entry.json'
+FORMAT = 2
+FILE_MODE = stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH
+DIRECTORY_MODE = stat.S_IRWXU | stat.S_IRGRP | stat.S_IXGRP | stat.S_IROTH | stat.S_IXOTH
+
+
+logger = logging.getLogger(__name__)
+
+
+def _remove_readonly(func, path, exc):
+    """
+    shutil.rmtree error handler making the read-only files of an entry removable
+    """
+
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+def _rmtree(path):
+    """
+    Removes the directory path, read-only files included
+    """
+
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=_remove_readonly)
+    else:
+        shutil.rmtree(path, onerror=_remove_readonly)
+
+
+def _file_hash(path):
+    """
+    Returns the sha256 of the file path
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+
+class TranspileStore():
+    """
+    Class storing generated trees by content for pycrop2ml's user interface.
+
+    An entry maps (package content hash, language, pycropml version) to the src and test
+    trees pycropml generated, so a package imported by several users, or transpiled
+    again after being restored, is not generated twice. The package content hash covers
+    the package name, every crop2ml source and the sources of the external packages its
+    compositions refer to.
+
+    Entries are copies of the rendered trees, readable by every user, published with an
+    atomic rename along with the sha256 of every file. They are copied into the packages,
+    or hard linked with link, which shares the files between the packages of a single
+    user. Since the simulation pool imports the restored python code, an entry is only
+    restored if every file of it belongs to a trusted user (see trusted_uids), is not
+    writable by the group or others and still has its recorded hash. The least recently
+    used entries are evicted once the store outgrows max_bytes.
+
+    Parameters : \n
+        - directory : store directory, shared by the users of a workspace
+        - max_bytes : size limit of the store
+        - link : hard link the restored files instead of copying them
+    """
+
+    def __init__(self, directory=STORE_DIRECTORY, max_bytes=MAX_BYTES, link=LINK):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        self._lock = threading.Lock()
+
+
+    def key(self, path, language, hashes=None):
+        """
+        Returns the store key of the package path transpiled into language.
+        hashes are the build hashes of the package, see transpiler.build_hashes, if they
+        are already known.
+        """
+
+        from pycrop2ml_ui.core import parsecache
+
+        if hashes is None:
+            hashes = transpiler.build_hashes(path)
+        content = {'package': os.path.basename(os.path.normpath(path)),
+                   'sources': hashes['sources'],
+                   'externals': hashes['externals'],
+                   'language': language,
+                   'pycropml': parsecache.pycropml_version(),
+                   'format': FORMAT}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf8')).hexdigest()
+
+
+    def _entry(self, key):
+        """
+        Returns the directory of the entry key
+        """
+
+        return os.path.join(self.directory, key[:2], key)
+
+
+    def get(self, key):
+        """
+        Returns the directory of the entry key, or None if it is not stored. The last use
+        of the entry is updated when the caller owns it.
+        """
+
+        entry = self._entry(key)
+        description = os.path.join(entry, ENTRY)
+        if not os.path.isfile(description):
+            return None
+        try:
+            if not hasattr(os, 'getuid') or os.stat(description).st_uid == os.getuid():
+                os.utime(description)
+        except OSError:
+            pass
+        return entry
+
+
+    def put(self, key, tree):
+        """
+        Copies the generated trees of tree, a rendered package copy, into the entry key
+        and returns the entry directory, or None if it could not be stored. tree is left
+        untouched. An entry stored meanwhile by another process is returned as it is.
+        """
+
+        entry = self._entry(key)
+        if self.get(key) is not None:
+            return entry
+
+        files = transpiler.output_files(tree)
+        try:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            tmp = tempfile.mkdtemp(prefix='tmp-', dir=os.path.dirname(entry))
+        except OSError:
+            return None
+
+        size = 0
+        hashes = dict()
+        try:
+            for sub in transpiler.OUTPUT_DIRECTORIES:
+                if os.path.isdir(os.path.join(tree, sub)):
+                    shutil.copytree(os.path.join(tree, sub), os.path.join(tmp, sub))
+            for root, dirs, _ in os.walk(tmp):
+                for d in dirs:
+                    os.chmod(os.path.join(root, d), DIRECTORY_MODE)
+            for rel in files:
+                full = os.path.join(tmp, rel)
+                size += os.path.getsize(full)
+                hashes[rel] = _file_hash(full)
+                os.chmod(full, FILE_MODE)
+            with open(os.path.join(tmp, ENTRY), 'w', encoding='utf8') as f:
+                json.dump({'outputs': sorted(files), 'size': size, 'hashes': hashes}, f)
+            os.chmod(os.path.join(tmp, ENTRY), FILE_MODE)
+            os.chmod(tmp, DIRECTORY_MODE)
+            os.rename(tmp, entry)
+        except OSError:
+            _rmtree(tmp)
+            return entry if self.get(key) is not None else None
+        return entry
+
+
+    def outputs(self, key):
+        """
+        Returns the relative paths of the generated files of the entry key
+        """
+
+        try:
+            with open(os.path.join(self._entry(key), ENTRY), encoding='utf8') as f:
+                return json.load(f)['outputs']
+        except (OSError, ValueError, KeyError):
+            return []
+
+
+    def trusted_uids(self):
+        """
+        Returns the ids of the users whose entries are restored : the caller, the owner of
+        the store directory and the users of PYCROP2ML_UI_STORE_TRUSTED (comma separated
+        uids), or None where files have no owner
+        """
+
+        if not hasattr(os, 'getuid'):
+            return None
+        uids = {os.getuid()} | set(TRUSTED)
+        try:
+            uids.add(os.stat(self.directory).st_uid)
+        except OSError:
+            pass
+        return uids
+
+
+    def verify(self, key):
+        """
+        Returns whether the entry key can be restored : every file and directory of it belongs
+        to a trusted user, is not writable by the group or others nor a symbolic link, and
+        its generated files are the ones stored, with their recorded sha256
+        """
+
+        entry = self._entry(key)
+        uids = self.trusted_uids()
+        try:
+            with open(os.path.join(entry, ENTRY), encoding='utf8') as f:
+                hashes = json.load(f)['hashes']
+            found = []
+            for root, dirs, files in os.walk(entry):
+                for full in [root] + [os.path.join(root, name) for name in dirs + files]:
+                    st = os.lstat(full)
+                    if stat.S_ISLNK(st.st_mode) or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+                        return False
+                    if uids is not None and st.st_uid not in uids:
+                        return False
+                found += [os.path.relpath(os.path.join(root, name), entry).replace(os.path.sep, '/') for name in files]
+            if sorted(found) != sorted(list(hashes) + [ENTRY]):
+                return False
+            return all(_file_hash(os.path.join(entry, *rel.split('/'))) == digest for rel, digest in hashes.items())
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+
+
+    def restore(self, key, path, previous=()):
+        """
+        Copies, or links with link, the generated trees of the entry key into the package
+        path and returns the (written, removed) relative paths, or None if the entry is not
+        stored or fails verify. previous are the outputs of the last build, see
+        transpiler.sync_outputs.
+        """
+
+        entry = self.get(key)
+        if entry is None:
+            return None
+        if not self.verify(key):
+            logger.warning('Transpile store entry %s is not trusted or was modified, it is not restored', entry)
+            return None
+        return transpiler.sync_outputs(entry, path, link=self.link, previous=previous)
+
+
+    def _entries(self):
+        """
+        Returns the [(last use, size, directory)] of every entry
+        """
+
+        entries = []
+        for prefix in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            for name in os.listdir(os.path.join(self.directory, prefix)) if os.path.isdir(os.path.join(self.directory, prefix)) else []:
+                entry = os.path.join(self.directory, prefix, name)
+                try:
+                    with open(os.path.join(entry, ENTRY), encoding='utf8') as f:
+                        size = json.load(f)['size']
+                    entries.append((os.stat(os.path.join(entry, ENTRY)).st_mtime_ns, size, entry))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return entries
+
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the store fits in max_bytes
+        and returns the number of entries removed. The entries another process removed
+        meanwhile, or the caller is not allowed to remove, are skipped.
+        """
+
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    _rmtree(entry)
+                    removed += 1
+                except OSError:
+                    if os.path.isdir(entry):
+                        continue
+                total -= size
+            return removed
+
+
+    def stats(self):
+        """
+        Returns the number of entries and the size of the store
+        """
+
+        entries = self._entries()
+        return {'Entries': len(entries), 'Bytes': sum(size for _, size, _ in entries), 'Max bytes': self.max_bytes}
+
+
+
+_stores = dict()
+_stores_lock = threading.Lock()
+
+
+def get_store(directory=STORE_DIRECTORY):
+    """
+    Returns the store shared by every transpilation for the given directory, or None
+    if the store is disabled (PYCROP2ML_UI_STORE=0)
+    """
+
+    if directory in ('', '0'):
+        return None
+
+    key = os.path.abspath(directory)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = TranspileStore(directory)
+        return _stores[key]
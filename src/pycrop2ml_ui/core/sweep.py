@@ -0,0 +1,287 @@
+import os
+import functools
+
+from pycrop2ml_ui.core import ensemble
+
+
+METHODS = ['Grid', 'Latin hypercube', 'Morris']
+AGGREGATES = ['last', 'mean', 'min', 'max', 'sum']
+MAX_RUNS = int(os.environ.get('PYCROP2ML_UI_SWEEP_MAX_RUNS', '100000'))
+
+
+def _float(value, default=None):
+    """
+    Returns value as a float, or default if it is not a number
+    """
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parameter_bounds(inputs):
+    """
+    Returns the sweep table of the parameter inputs of a model, see Topology.model.inputs :
+    one row per parameter with its name, default, min and max and a Sweep column set to False.
+
+    A missing min or max falls back to half and twice the default, or to [0, 1] for a null default.
+    """
+
+    import pandas as pd
+
+    rows = []
+    for inp in inputs:
+        if 'parametercategory' not in dir(inp):
+            continue
+        default = _float(getattr(inp, 'default', None), 0.0)
+        low, high = sorted([default * 0.5, default * 2.0]) if default else [0.0, 1.0]
+        low = _float(getattr(inp, 'min', None), low)
+        high = _float(getattr(inp, 'max', None), high)
+        rows.append({'name': inp.name, 'default': default, 'min': low, 'max': high, 'Sweep': False})
+    return pd.DataFrame(rows, columns=['name', 'default', 'min', 'max', 'Sweep'])
+
+
+def grid(k, levels):
+    """
+    Returns the full factorial design of k factors on levels values in [0, 1], an array of
+    shape (levels**k, k)
+    """
+
+    import numpy as np
+
+    axis = np.linspace(0.0, 1.0, levels) if levels > 1 else np.array([0.5])
+    return axis[np.indices((levels,) * k).reshape(k, -1).T]
+
+
+def latin_hypercube(k, n, seed=None):
+    """
+    Returns a Latin hypercube sample of n points of k factors in [0, 1], an array of shape (n, k)
+    """
+
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    strata = np.argsort(rng.random((n, k)), axis=0)
+    return (strata + rng.random((n, k))) / n
+
+
+def morris(k, trajectories, levels=4, seed=None):
+    """
+    Returns the Morris elementary effects design of k factors in [0, 1] : trajectories
+    one-at-a-time trajectories of k + 1 points on a levels grid, an array of shape
+    (trajectories * (k + 1), k)
+    """
+
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    delta = levels / (2.0 * (levels - 1))
+    steps = 2 * np.tril(np.ones((k + 1, k)), -1) - 1
+    directions = rng.choice([-1.0, 1.0], size=(trajectories, 1, k))
+    start = rng.integers(0, levels // 2, size=(trajectories, 1, k)) / (levels - 1.0)
+    points = start + delta / 2.0 * (steps[None] * directions + 1)
+    order = np.argsort(rng.random((trajectories, 1, k)), axis=2)
+    return np.take_along_axis(points, np.broadcast_to(order, points.shape), axis=2).reshape(-1, k)
+
+
+def runs(method, k, size):
+    """
+    Returns the number of runs of the design of method for k factors and size, see sample
+    """
+
+    if method == 'Grid':
+        return size ** k
+    if method == 'Latin hypercube':
+        return size
+    if method == 'Morris':
+        return size * (k + 1)
+    raise Exception('Unknown sampling method : {}.'.format(method))
+
+
+def sample(method, k, size, seed=None, max_runs=MAX_RUNS):
+    """
+    Returns the design of method in [0, 1] for k factors. size is the number of levels of
+    the grid, of points of the Latin hypercube or of Morris trajectories. Designs of more
+    than max_runs runs (PYCROP2ML_UI_SWEEP_MAX_RUNS) are refused before being built.
+    """
+
+    if size < 1:
+        raise Exception('The sample size must be at least 1.')
+    total = runs(method, k, size)
+    if max_runs is not None and total > max_runs:
+        raise Exception('{} design of {} runs, more than the maximum of {} runs.'.format(method, total, max_runs))
+    if method == 'Grid':
+        return grid(k, size)
+    if method == 'Latin hypercube':
+        return latin_hypercube(k, size, seed)
+    return morris(k, size, seed=seed)
+
+
+def scale(unit, bounds):
+    """
+    Returns the parameter sets table of the design unit scaled to the min and max columns of
+    bounds, one column per parameter and one row per run
+    """
+
+    import pandas as pd
+
+    low = bounds['min'].to_numpy(dtype=float)
+    high = bounds['max'].to_numpy(dtype=float)
+    return pd.DataFrame(low + unit * (high - low), columns=list(bounds['name']), index=pd.RangeIndex(len(unit), name='Run'))
+
+
+def aggregate(result, outputs, how='last'):
+    """
+    Returns the outputs of a simulation result table reduced to one value each by how
+    """
+
+    result = result[outputs]
+    return result.iloc[-1] if how == 'last' else result.agg(how)
+
+
+def morris_indices(unit, y, names):
+    """
+    Returns the Morris mu, mu* and sigma of every output of y (runs x outputs) for the
+    design unit, indexed by (Output, Parameter). The elementary effects are measured in the
+    [0, 1] design space.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    k = unit.shape[1]
+    r = unit.shape[0] // (k + 1)
+    x = unit[:r * (k + 1)].reshape(r, k + 1, k)
+    values = np.asarray(y, dtype=float)[:r * (k + 1)].reshape(r, k + 1, -1)
+
+    dx = np.diff(x, axis=1)
+    factor = np.abs(dx).argmax(axis=2)
+    step = np.take_along_axis(dx, factor[..., None], axis=2)
+    effects = np.diff(values, axis=1) / step
+    effects = np.take_along_axis(effects, np.argsort(factor, axis=1)[..., None], axis=1)
+
+    valid = ~np.isnan(effects).any(axis=2, keepdims=True)
+    count = valid.sum(axis=0)
+    effects = np.where(valid, effects, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mu = effects.sum(axis=0) / count
+        mu_star = np.abs(effects).sum(axis=0) / count
+        sigma = np.sqrt((np.where(valid, effects - mu, 0.0) ** 2).sum(axis=0) / np.maximum(count - 1, 1))
+
+    outputs = list(y.columns)
+    index = pd.MultiIndex.from_product([outputs, names], names=['Output', 'Parameter'])
+    return pd.DataFrame({'mu': mu.T.ravel(), 'mu_star': mu_star.T.ravel(), 'sigma': sigma.T.ravel()}, index=index)
+
+
+def _ranks(a):
+    """
+    Returns the ranks of every column of a, tied values sharing their average rank like
+    scipy.stats.rankdata (minus one)
+    """
+
+    import numpy as np
+
+    order = a.argsort(axis=0, kind='stable')
+    values = np.take_along_axis(a, order, axis=0)
+    position = np.arange(a.shape[0])[:, None]
+    first = np.ones(a.shape, dtype=bool)
+    first[1:] = values[1:] != values[:-1]
+    last = np.ones(a.shape, dtype=bool)
+    last[:-1] = first[1:]
+    start = np.maximum.accumulate(np.where(first, position, 0), axis=0)
+    end = np.minimum.accumulate(np.where(last, position, a.shape[0] - 1)[::-1], axis=0)[::-1]
+
+    ranks = np.empty(a.shape, dtype=float)
+    np.put_along_axis(ranks, order, (start + end) / 2.0, axis=0)
+    return ranks
+
+
+def _standardize(a):
+    """
+    Returns the columns of a centered and scaled, constant columns being set to 0
+    """
+
+    import numpy as np
+
+    std = a.std(axis=0)
+    return (a - a.mean(axis=0)) / np.where(std > 0, std, 1.0)
+
+
+def regression_indices(x, y, names):
+    """
+    Returns the standardized regression coefficients (SRC), the Pearson and Spearman
+    correlation coefficients of every parameter and the R2 of the linear model, for every
+    output of y (runs x outputs) and the parameter sets x (runs x parameters), indexed by
+    (Output, Parameter)
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    x = np.asarray(x, dtype=float)
+    values = np.asarray(y, dtype=float)
+    keep = ~np.isnan(values).any(axis=1)
+    x, values = x[keep], values[keep]
+    n = max(len(x), 1)
+
+    xs, ys = _standardize(x), _standardize(values)
+    src = np.linalg.lstsq(xs, ys, rcond=None)[0]
+    r2 = 1.0 - ((ys - xs @ src) ** 2).sum(axis=0) / np.maximum((ys ** 2).sum(axis=0), 1e-300)
+    pearson = xs.T @ ys / n
+    spearman = _standardize(_ranks(x)).T @ _standardize(_ranks(values)) / n
+
+    outputs = list(y.columns)
+    index = pd.MultiIndex.from_product([outputs, names], names=['Output', 'Parameter'])
+    return pd.DataFrame({'SRC': src.T.ravel(), 'Pearson': pearson.T.ravel(), 'Spearman': spearman.T.ravel(),
+                         'R2': np.repeat(r2, len(names))}, index=index)
+
+
+def indices(method, unit, x, y, names):
+    """
+    Returns the sensitivity indices of the outputs y : the Morris indices for a Morris design,
+    plus the regression and correlation indices for every design
+    """
+
+    import pandas as pd
+
+    table = regression_indices(x, y, names)
+    if method == 'Morris':
+        table = pd.concat([morris_indices(unit, y, names), table], axis=1)
+    return table
+
+
+def run_sweep(pkg, datafile, bounds, base, outputs, method='Latin hypercube', size=100, how='last', seed=None,
+              datamodel=[], initvalues=[], workers=None, callback=None):
+    """
+    Samples the parameters of bounds, runs the simulation of the package pkg for every sample
+    and returns a dictionary with the parameter sets ('Samples'), the aggregated outputs of
+    every run ('Outputs'), the sensitivity indices ('Indices') and the failed runs ('Errors').
+
+    Parameters : \n
+        - pkg : package path
+        - datafile : data file of the simulations
+        - bounds : name/min/max table of the swept parameters, see parameter_bounds
+        - base : name/value parameter table of the other parameters
+        - outputs : names of the model outputs analysed
+        - method : sampling method, one of METHODS
+        - size : grid levels, Latin hypercube points or Morris trajectories
+        - how : aggregation of each output over the simulation, one of AGGREGATES
+        - seed : random seed of the sample
+        - datamodel, initvalues, workers, callback : see ensemble.run_ensemble
+    """
+
+    names = list(bounds['name'])
+    if not names:
+        raise Exception('No parameter to sweep.')
+    if not outputs:
+        raise Exception('No output to analyse.')
+
+    unit = sample(method, len(names), size, seed)
+    samples = scale(unit, bounds)
+    results, errors = ensemble.run_ensemble(pkg, datafile, samples, base, datamodel, initvalues, workers=workers, callback=callback,
+                                            reduce=functools.partial(aggregate, outputs=list(outputs), how=how))
+    results = results.reindex(index=samples.index, columns=list(outputs))
+
+    return {'Samples': samples, 'Outputs': results, 'Errors': errors,
+            'Indices': indices(method, unit, samples.to_numpy(dtype=float), results, names) if len(results.dropna()) > 1 else None}
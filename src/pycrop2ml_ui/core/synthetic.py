@@ -0,0 +1,201 @@
+import os
+import random
+from xml.sax.saxutils import quoteattr
+
+
+_UNIT = '''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE Model PUBLIC " " "https://raw.githubusercontent.com/AgriculturalModelExchangeInitiative/crop2ml/master/ModelUnit.dtd">
+<ModelUnit modelid="{pkg}.{name}" name="{name}" timestep="1" version="1.0">
+	<Description>
+		<Title>{name} synthetic model</Title>
+		<Authors>pycrop2ml_ui</Authors>
+		<Institution>pycrop2ml_ui</Institution>
+		<Reference>synthetic</Reference>
+		<Abstract>Synthetic unit model generated for benchmarks</Abstract>
+	</Description>
+
+	<Inputs>{inputs}
+	</Inputs>
+
+	<Outputs>{outputs}
+	</Outputs>
+
+	<Algorithm language="Cyml" platform="" filename="algo/pyx/{lower}.pyx" />
+
+	<Parametersets>{paramsets}
+	</Parametersets>
+
+	<Testsets>{testsets}
+	</Testsets>
+
+</ModelUnit>'''
+
+_COMPOSITION = '''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE ModelComposition PUBLIC " " "https://raw.githubusercontent.com/AgriculturalModelExchangeInitiative/crop2ml/master/ModelComposition.dtd">
+<ModelComposition name="{name}" id="{pkg}.{name}" version="1.0" timestep ="1">
+	<Description>
+		<Title>{name} synthetic composition</Title>
+		<Authors>pycrop2ml_ui</Authors>
+		<Institution>pycrop2ml_ui</Institution>
+		<Reference>synthetic</Reference>
+		<Abstract>Synthetic composition generated for benchmarks</Abstract>
+	</Description>
+
+	<Composition>{models}
+
+		<Links>{links}
+		</Links>
+	</Composition>
+</ModelComposition>'''
+
+
+def unit_ports(name, ports):
+    """
+    Returns the (variables, parameters, outputs) names of the synthetic unit model name
+    """
+
+    lower = name.lower()
+    return (['{}_in{}'.format(lower, i) for i in range(ports)],
+            ['{}_p{}'.format(lower, i) for i in range(ports)],
+            ['{}_out{}'.format(lower, i) for i in range(ports)])
+
+
+def unit_xml(pkg, name, ports, paramsets, testsets, rng):
+    """
+    Returns the xml of a synthetic unit model with ports variables, parameters and outputs
+    """
+
+    variables, parameters, outputs = unit_ports(name, ports)
+
+    inputs = ''
+    for v in variables:
+        inputs += '\n\t\t<Input name={} description="variable" inputtype="variable" variablecategory="state" datatype="DOUBLE" default="1.0" min="0.0" max="1000.0" unit="g" uri=""/>'.format(quoteattr(v))
+    for p in parameters:
+        inputs += '\n\t\t<Input name={} description="parameter" inputtype="parameter" parametercategory="constant" datatype="DOUBLE" default="0.5" min="0.0" max="10.0" unit="dimensionless" uri=""/>'.format(quoteattr(p))
+
+    outs = ''
+    for o in outputs:
+        outs += '\n\t\t<Output name={} description="output" variablecategory="state" datatype="DOUBLE" min="0.0" max="10000.0" unit="g" uri=""/>'.format(quoteattr(o))
+
+    psets = ''
+    for k in range(paramsets):
+        psets += '\n\t\t<Parameterset name="set{}" description="synthetic parameter set" >'.format(k)
+        for p in parameters:
+            psets += '\n\t\t\t<Param name="{}">{}</Param>'.format(p, round(rng.uniform(0.0, 10.0), 3))
+        psets += '\n\t\t</Parameterset>'
+
+    tsets = ''
+    for t in range(testsets):
+        tsets += '\n\n\t\t<Testset name="test{}" parameterset="set{}" description="synthetic test set" >'.format(t, t % max(paramsets, 1))
+        tsets += '\n\t\t\t<Test name="test{}_0" >'.format(t)
+        values = [round(rng.uniform(0.0, 100.0), 3) for _ in variables]
+        for v, value in zip(variables, values):
+            tsets += '\n\t\t\t\t<InputValue name="{}">{}</InputValue>'.format(v, value)
+        for o in outputs:
+            tsets += '\n\t\t\t\t<OutputValue name="{}" precision="2">0.0</OutputValue>'.format(o)
+        tsets += '\n\t\t\t</Test>'
+        tsets += '\n\t\t</Testset>'
+
+    return _UNIT.format(pkg=pkg, name=name, lower=name.lower(), inputs=inputs, outputs=outs, paramsets=psets, testsets=tsets)
+
+
+def unit_algorithm(name, ports):
+    """
+    Returns the Cyml algorithm of a synthetic unit model : out_i = in_i * p_i + out_(i-1)
+    """
+
+    variables, parameters, outputs = unit_ports(name, ports)
+
+    algo = ''
+    for o in outputs:
+        algo += '    cdef double {}\n'.format(o)
+    for i, (v, p, o) in enumerate(zip(variables, parameters, outputs)):
+        algo += '    {} = {} * {}{}\n'.format(o, v, p, ' + {}'.format(outputs[i-1]) if i else '')
+    return algo
+
+
+def composition_xml(pkg, name, children):
+    """
+    Returns the xml of a synthetic composition of children [(filename, model name, (variables, parameters, outputs))].
+
+    The outputs of a child feed the variables of the same rank of the next child, the
+    remaining variables and the parameters come from the composition inputs and every
+    output is exposed.
+    """
+
+    models = ''
+    links = ''
+    for index, (filename, child, (variables, parameters, outputs)) in enumerate(children):
+        models += '\n\t\t<Model name="{0}" id="{1}.{0}" filename="{2}" />'.format(child, pkg, filename)
+        previous = children[index-1][2][2] if index else []
+        for rank, i in enumerate(variables):
+            if rank < len(previous):
+                links += '\n\t\t\t<InternalLink target="{}.{}" source="{}.{}" />'.format(child, i, children[index-1][1], previous[rank])
+            else:
+                links += '\n\t\t\t<InputLink target="{}.{}" source="{}" />'.format(child, i, i)
+        for p in parameters:
+            links += '\n\t\t\t<InputLink target="{}.{}" source="{}" />'.format(child, p, p)
+        for o in outputs:
+            links += '\n\t\t\t<OutputLink target="{}" source="{}.{}" />'.format(o, child, o)
+
+    return _COMPOSITION.format(pkg=pkg, name=name, models=models, links=links)
+
+
+def generate_package(root, name='Synthetic', units=10, ports=5, paramsets=1, testsets=1, depth=1, fanout=4, seed=0):
+    """
+    Writes a synthetic model package under root and returns its path.
+
+    Parameters : \n
+        - root : directory receiving the package
+        - name : package name
+        - units : number of unit models
+        - ports : number of variables, parameters and outputs of each unit model
+        - paramsets : number of parameter sets of each unit model
+        - testsets : number of test sets of each unit model
+        - depth : levels of compositions, each one grouping fanout models of the level below,
+                  the last level being one composition of everything left (0 for none)
+        - fanout : number of models of each composition below the top level
+        - seed : random seed of the parameter and test values
+    """
+
+    rng = random.Random(seed)
+    path = os.path.join(root, name)
+    crop2ml = os.path.join(path, 'crop2ml')
+    os.makedirs(os.path.join(crop2ml, 'algo', 'pyx'), exist_ok=True)
+    os.makedirs(os.path.join(path, 'data'), exist_ok=True)
+
+    level = []
+    for u in range(units):
+        model = 'Unit{}'.format(u)
+        with open(os.path.join(crop2ml, 'unit.{}.xml'.format(model)), 'w', encoding='utf8') as f:
+            f.write(unit_xml(name, model, ports, paramsets, testsets, rng))
+        with open(os.path.join(crop2ml, 'algo', 'pyx', '{}.pyx'.format(model.lower())), 'w', encoding='utf8') as f:
+            f.write(unit_algorithm(model, ports))
+        level.append(('unit.{}.xml'.format(model), model, unit_ports(model, ports)))
+
+    for d in range(depth):
+        top = d == depth - 1 or len(level) <= fanout
+        groups = [level] if top else [level[i:i+fanout] for i in range(0, len(level), fanout)]
+        following = []
+        for g, children in enumerate(groups):
+            model = name if top else 'Composition{}_{}'.format(d, g)
+            with open(os.path.join(crop2ml, 'composition.{}.xml'.format(model)), 'w', encoding='utf8') as f:
+                f.write(composition_xml(name, model, children))
+            previous = []
+            variables = []
+            for filename, child, (vs, ps, outs) in children:
+                variables += vs[len(previous):]
+                previous = outs
+            following.append(('composition.{}.xml'.format(model), model,
+                              (variables, [p for c in children for p in c[2][1]], [o for c in children for o in c[2][2]])))
+        level = following
+        if top:
+            break
+
+    with open(os.path.join(path, 'data', '{}.csv'.format(name.lower())), 'w', encoding='utf8') as f:
+        variables = [v for u in range(units) for v in unit_ports('Unit{}'.format(u), ports)[0]]
+        f.write(';'.join(['day'] + variables) + '\n')
+        for day in range(365):
+            f.write(';'.join([str(day)] + [str(round(rng.uniform(0.0, 100.0), 3)) for _ in variables]) + '\n')
+
+    return path
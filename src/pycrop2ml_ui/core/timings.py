@@ -0,0 +1,118 @@
+import os
+import json
+import time
+
+from pycrop2ml_ui.core import catalog
+
+
+TIMINGS = 'timings.json'
+PACKAGE = '(package)'
+
+
+def model_names(path):
+    """
+    Returns the names of the unit and composition models of the package path
+    """
+
+    try:
+        filenames = os.listdir(os.path.join(path, 'crop2ml'))
+    except OSError:
+        return []
+    return sorted({f.split('.')[1] for f in filenames if f.count('.') >= 2 and f.split('.')[0] in catalog.MODEL_TYPES})
+
+
+def model_timings(files, names, start, end):
+    """
+    Returns [{'Model', 'Duration', 'Files'}] for a transpile run of a package which started at
+    start and ended at end (time.time()) and generated files {relative path: mtime_ns}.
+
+    pycropml generates the models one after another, so a generated file belongs to the
+    model whose name its filename contains, and the time of a model is the time between
+    the last write of the previous model and its own last write. Files matching no model
+    and the time spent after the last model (compositions, packaging) go to PACKAGE.
+    """
+
+    candidates = sorted(names, key=len, reverse=True)
+    owners = {name: [] for name in names}
+    owners[PACKAGE] = []
+
+    for rel, mtime in files.items():
+        stem = os.path.splitext(os.path.basename(rel))[0].lower()
+        owner = next((n for n in candidates if n.lower() in stem), PACKAGE)
+        owners[owner].append(mtime / 1e9)
+
+    rows = []
+    last = start
+    for stamp, name in sorted((max(stamps), name) for name, stamps in owners.items() if stamps and name != PACKAGE):
+        rows.append({'Model': name, 'Duration': max(0.0, stamp - last), 'Files': len(owners[name])})
+        last = max(last, stamp)
+
+    rows.extend({'Model': name, 'Duration': 0.0, 'Files': 0} for name in names if not owners[name])
+    rows.append({'Model': PACKAGE, 'Duration': max(0.0, end - last), 'Files': len(owners[PACKAGE])})
+    return rows
+
+
+def rows(results):
+    """
+    Returns one row per package, language and model from the results of a profiled transpilation
+    """
+
+    table = []
+    for r in results:
+        for m in r.get('Models', []):
+            table.append({'Package': r['Package'], 'Language': r['Language'], 'Model': m['Model'],
+                          'Duration': round(m['Duration'], 3), 'Files': m['Files'],
+                          'Peak memory (MB)': round(r.get('Peak', 0) / 2**20, 1)})
+    return table
+
+
+def table(results):
+    """
+    Returns the rows of results as a pandas DataFrame, slowest first
+    """
+
+    import pandas as pd
+
+    df = pd.DataFrame(rows(results), columns=['Package', 'Language', 'Model', 'Duration', 'Files', 'Peak memory (MB)'])
+    return df.sort_values('Duration', ascending=False).reset_index(drop=True)
+
+
+def read_timings(path):
+    """
+    Returns the timing report of the package path :
+    {'languages': {language: {'pycropml', 'date', 'duration', 'peak', 'models': [{'Model', 'Duration', 'Files'}]}}}
+    """
+
+    try:
+        with open(os.path.join(path, catalog.CACHE_DIRECTORY, TIMINGS), encoding='utf8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return {'languages': dict()}
+    report.setdefault('languages', dict())
+    return report
+
+
+def write_timings(path, results):
+    """
+    Records the profiled results of the package path in its timing report, replacing
+    the previous entries of the same languages
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    report = read_timings(path)
+    for r in results:
+        if 'Models' not in r:
+            continue
+        report['languages'][r['Language']] = {'pycropml': parsecache.pycropml_version(),
+                                              'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                              'duration': r['Duration'],
+                                              'peak': r.get('Peak', 0),
+                                              'models': r['Models']}
+
+    cachedir = os.path.join(path, catalog.CACHE_DIRECTORY)
+    os.makedirs(cachedir, exist_ok=True)
+    tmp = os.path.join(cachedir, TIMINGS + '.tmp')
+    with open(tmp, 'w', encoding='utf8') as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(cachedir, TIMINGS))
@@ -0,0 +1,112 @@
+import os
+
+from pycropml.topology import Topology
+
+from pycrop2ml_ui.core import catalog, parsecache
+
+
+MAX_TOPOLOGIES = 16
+
+_topologies = parsecache.ParseCache(max_bytes=None, max_entries=MAX_TOPOLOGIES)
+
+
+def topology_sources(pkg):
+    """
+    Returns every crop2ml file a topology of the package pkg depends on,
+    including the ones of the external packages its compositions refer to
+    """
+
+    sources = parsecache.package_sources(pkg)
+    seen = {os.path.abspath(pkg)}
+    stack = [pkg]
+
+    while stack:
+        current = stack.pop()
+        for filename in catalog.get_catalog().models(current, types=('composition',)):
+            model, = parsecache.parse_composition(os.path.join(current, 'crop2ml', filename))
+            for m in model.model:
+                if not m.package_name:
+                    continue
+                extpkg = os.path.join(os.path.dirname(os.path.abspath(current)), m.package_name)
+                if os.path.isdir(extpkg) and os.path.abspath(extpkg) not in seen:
+                    seen.add(os.path.abspath(extpkg))
+                    sources += parsecache.package_sources(extpkg)
+                    stack.append(extpkg)
+
+    return sources
+
+
+def get_topology(pkg, name=None):
+    """
+    Returns the pycropml Topology of the package pkg.
+
+    Topologies are kept in a least recently used cache and rebuilt only when one
+    of the files returned by topology_sources(pkg) changes. They are shared by
+    every menu and must not be modified.
+    """
+
+    if name is None:
+        name = os.path.basename(os.path.normpath(pkg))
+    key = (os.path.abspath(pkg), name)
+    return _topologies.get(key, topology_sources(pkg), lambda: Topology(name, pkg=pkg))
+
+
+
+def workflow(pkg, name=None):
+    """
+    Returns the (workflow svg, captured output) of the package pkg. The svg is None if
+    pycropml did not render one, the captured output (IPython CapturedIO) of the rendering
+    is None if the svg comes from the cache.
+
+    The svg is stored in the .crop2ml_cache directory of the package under the content
+    hash of topology_sources(pkg), so the graph layout only runs again once the package
+    compositions or models change.
+    """
+
+    if name is None:
+        name = os.path.basename(os.path.normpath(pkg))
+
+    sources = topology_sources(pkg)
+    key = ('svg', os.path.abspath(pkg), name)
+    digest = parsecache.get_cache().get(key, sources, lambda: parsecache.content_digest(key, sources))
+
+    cachedir = os.path.join(pkg, catalog.CACHE_DIRECTORY)
+    filename = os.path.join(cachedir, 'workflow.{}.{}.svg'.format(name, digest))
+    if os.path.isfile(filename):
+        with open(filename, encoding='utf8') as f:
+            return f.read(), None
+
+    from IPython.utils.capture import capture_output
+
+    with capture_output() as captured:
+        get_topology(pkg, name).display_wf_svg()
+
+    svg = None
+    for output in captured.outputs:
+        if 'image/svg+xml' in output.data:
+            svg = output.data['image/svg+xml']
+            break
+    if svg is None:
+        return None, captured
+
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        for stale in os.listdir(cachedir):
+            if stale.startswith('workflow.{}.'.format(name)) and stale.endswith('.svg'):
+                os.remove(os.path.join(cachedir, stale))
+        tmp = filename + '.tmp'
+        with open(tmp, 'w', encoding='utf8') as f:
+            f.write(svg)
+        os.replace(tmp, filename)
+    except OSError:
+        pass
+
+    return svg, captured
+
+
+def workflow_svg(pkg, name=None):
+    """
+    Returns the workflow svg of the package pkg, or None if pycropml did not render one, see workflow
+    """
+
+    return workflow(pkg, name)[0]
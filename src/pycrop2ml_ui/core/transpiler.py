@@ -0,0 +1,634 @@
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import filecmp
+import hashlib
+import pathlib
+import tempfile
+import traceback
+import multiprocessing
+from copy import deepcopy
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from pycrop2ml_ui.core import catalog
+
+
+LANGUAGES = ['java', 'cs', 'f90', 'py', 'r', 'cpp', 'simplace', 'bioma', 'dssat', 'openalea', 'record', 'stics', 'apsim']
+OUTPUT_DIRECTORIES = ['src', 'test']
+LINKED_DIRECTORIES = ['data']
+MANIFEST = 'manifest.json'
+
+
+def _external_packages(path):
+    """
+    Returns the sibling packages the compositions of the package path refer to
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    parent = os.path.dirname(os.path.abspath(path))
+    found = set()
+    for filename in catalog.get_catalog().models(path, types=('composition',)):
+        model, = parsecache.parse_composition(os.path.join(path, 'crop2ml', filename))
+        for m in model.model:
+            if m.package_name and os.path.isdir(os.path.join(parent, m.package_name)):
+                found.add(os.path.join(parent, m.package_name))
+    return sorted(found)
+
+
+def make_shadow(path):
+    """
+    Copies the package path into a new temporary directory, without its generated
+    trees, and returns the path of the copy.
+
+    Only the crop2ml sources and the small package files are copied : the data
+    directory, that pycropml does not read and can hold large weather files, is
+    symbolic linked, or left out where links are not available. The copy keeps the
+    package name, and the external packages its compositions refer to are linked
+    next to it, so pycropml resolves them as in the workspace.
+    """
+
+    path = os.path.abspath(path)
+    name = os.path.basename(path)
+    tmp = tempfile.mkdtemp(prefix='pycrop2ml-ui-')
+    shadow = os.path.join(tmp, name)
+
+    skipped = [catalog.CACHE_DIRECTORY] + OUTPUT_DIRECTORIES + LINKED_DIRECTORIES
+    ignore = shutil.ignore_patterns(*skipped)
+    shutil.copytree(path, shadow, ignore=lambda d, names: ignore(d, names) if d == path else set())
+
+    for sub in LINKED_DIRECTORIES:
+        if os.path.isdir(os.path.join(path, sub)):
+            try:
+                os.symlink(os.path.join(path, sub), os.path.join(shadow, sub), target_is_directory=True)
+            except OSError:
+                pass
+
+    for extpkg in _external_packages(path):
+        link = os.path.join(tmp, os.path.basename(extpkg))
+        if not os.path.exists(link):
+            try:
+                os.symlink(extpkg, link, target_is_directory=True)
+            except OSError:
+                shutil.copytree(extpkg, link)
+
+    return shadow
+
+
+def remove_shadow(shadow):
+    """
+    Removes the temporary directory created by make_shadow
+    """
+
+    shutil.rmtree(os.path.dirname(shadow), ignore_errors=True)
+
+
+def _write_if_changed(source, target, link=False):
+    """
+    Replaces target by source, or by a hard link to source, if their contents differ and returns whether it did
+    """
+
+    if os.path.isfile(target) and (os.path.samefile(source, target) or filecmp.cmp(source, target, shallow=False)):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = target + '.crop2ml-tmp'
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        if not link:
+            raise OSError
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+    return True
+
+
+def sync_outputs(shadow, path, link=False, previous=()):
+    """
+    Brings the generated trees of the package path in line with the ones rendered in shadow
+    and returns the (written, removed) lists of relative paths.
+
+    Only the files whose content changed are written, so unchanged outputs keep their mtime.
+    With link they are hard linked instead of copied when the file system allows it.
+    previous are the files generated by the last build of the language, see the manifest
+    outputs : the ones the render did not produce again, left by deleted models, are
+    removed. Any other file of the generated trees, written by hand, is kept.
+    """
+
+    written = []
+    removed = []
+    rendered = output_files(shadow)
+
+    for rel in sorted(rendered):
+        if _write_if_changed(os.path.join(shadow, rel), os.path.join(path, rel), link):
+            written.append(rel)
+
+    for rel in sorted(set(previous) - set(rendered)):
+        if rel.split('/')[0] in OUTPUT_DIRECTORIES and '..' not in rel.split('/') and os.path.isfile(os.path.join(path, rel)):
+            os.remove(os.path.join(path, rel))
+            removed.append(rel)
+
+    return written, removed
+
+
+def source_hashes(path):
+    """
+    Returns {relative path: sha256} for every file of the crop2ml directory of the package path,
+    model xml files and their algo/pyx sources included
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    hashes = dict()
+    for f in parsecache.package_sources(path):
+        try:
+            with open(f, 'rb') as fd:
+                hashes[os.path.relpath(f, path).replace(os.path.sep, '/')] = hashlib.sha256(fd.read()).hexdigest()
+        except OSError:
+            continue
+    return hashes
+
+
+def external_hashes(path):
+    """
+    Returns {package name: source_hashes} for every external package the compositions of
+    the package path refer to, or None if its compositions can not be parsed
+    """
+
+    try:
+        externals = _external_packages(path)
+    except Exception:
+        return None
+    return {os.path.basename(ext): source_hashes(ext) for ext in externals}
+
+
+def build_hashes(path):
+    """
+    Returns the hashes a build of the package path depends on :
+    {'sources': source_hashes(path), 'externals': external_hashes(path)}
+    """
+
+    return {'sources': source_hashes(path), 'externals': external_hashes(path)}
+
+
+def output_files(path):
+    """
+    Returns {relative path: mtime_ns} for every file of the generated trees of the package path
+    """
+
+    files = dict()
+    for sub in OUTPUT_DIRECTORIES:
+        for root, dirs, names in os.walk(os.path.join(path, sub)):
+            for name in names:
+                full = os.path.join(root, name)
+                try:
+                    files[os.path.relpath(full, path).replace(os.path.sep, '/')] = os.stat(full).st_mtime_ns
+                except OSError:
+                    continue
+    return files
+
+
+def read_manifest(path):
+    """
+    Returns the build manifest of the package path :
+    {'languages': {language: {'pycropml': version, 'sources': {file: hash},
+                              'externals': {package: {file: hash}}, 'outputs': [file]}}}
+    """
+
+    try:
+        with open(os.path.join(path, catalog.CACHE_DIRECTORY, MANIFEST), encoding='utf8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'languages': dict()}
+    manifest.setdefault('languages', dict())
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """
+    Writes the build manifest of the package path
+    """
+
+    cachedir = os.path.join(path, catalog.CACHE_DIRECTORY)
+    os.makedirs(cachedir, exist_ok=True)
+    tmp = os.path.join(cachedir, MANIFEST + '.tmp')
+    with open(tmp, 'w', encoding='utf8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(cachedir, MANIFEST))
+
+
+def is_up_to_date(path, language, hashes, manifest):
+    """
+    Returns whether language was generated with the current pycropml from the sources and
+    external packages of hashes, see build_hashes, and its generated files are all still there
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    entry = manifest['languages'].get(language)
+    if entry is None or hashes['externals'] is None:
+        return False
+    return all([entry.get('pycropml') == parsecache.pycropml_version(),
+                entry.get('sources') == hashes['sources'],
+                entry.get('externals', dict()) == hashes['externals'],
+                all(os.path.isfile(os.path.join(path, f)) for f in entry.get('outputs', []))])
+
+
+def _relocate(value, source, target, seen=None):
+    """
+    Returns value with every path into the package source, string or pathlib path, rewritten
+    to point into the package target, at any depth of its attributes, lists, dicts and
+    tuples. Objects, lists and dicts are changed in place.
+    """
+
+    if isinstance(value, (str, pathlib.PurePath)):
+        text = str(value)
+        if text == source or text.startswith(source + os.path.sep):
+            return type(value)(target + text[len(source):])
+        return value
+
+    if seen is None:
+        seen = dict()
+    if id(value) in seen:
+        return seen[id(value)]
+
+    if isinstance(value, list):
+        seen[id(value)] = value
+        value[:] = [_relocate(v, source, target, seen) for v in value]
+    elif isinstance(value, dict):
+        seen[id(value)] = value
+        for k in list(value):
+            value[k] = _relocate(value[k], source, target, seen)
+    elif isinstance(value, tuple):
+        items = [_relocate(v, source, target, seen) for v in value]
+        seen[id(value)] = type(value)(*items) if hasattr(value, '_fields') else type(value)(items)
+    elif hasattr(value, '__dict__') and not isinstance(value, type) and not callable(value):
+        seen[id(value)] = value
+        attributes = vars(value)
+        for k in list(attributes):
+            attributes[k] = _relocate(attributes[k], source, target, seen)
+    return seen.get(id(value), value)
+
+
+@contextmanager
+def shared_models(source, target, models):
+    """
+    Makes pycropml.cyml reuse models, the parsed unit models of the package source, when
+    it parses the package target, its shadow, instead of parsing the package xml files
+    again for every language.
+
+    The parser is only replaced in worker processes, never in the kernel, and only for the
+    exact path target. Each parse gets its own copy of models, relocated in target, since
+    the generators annotate the models they walk through.
+    """
+
+    from pycropml import cyml
+
+    original = getattr(cyml, 'model_parser', None)
+    if models is None or original is None or multiprocessing.parent_process() is None:
+        yield
+        return
+
+    source = os.path.abspath(source)
+    target = os.path.abspath(target)
+
+    def model_parser(pkg):
+        if os.path.abspath(str(pkg)) != target:
+            return original(pkg)
+        return _relocate(deepcopy(models), source, target)
+
+    cyml.model_parser = model_parser
+    try:
+        yield
+    finally:
+        cyml.model_parser = original
+
+
+def parse_models(path):
+    """
+    Returns the unit models of the package path, from the shared parse cache, or None
+    if the package can not be parsed, in which case pycropml reports the error itself
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    try:
+        return parsecache.parse_package(path)
+    except Exception:
+        return None
+
+
+def transpile_language(path, language):
+    """
+    Transpiles the package path into language and returns its result :
+    {'Package', 'Language', 'Status', 'Duration', 'Error', 'Changed'}
+    """
+
+    from pycropml.cyml import transpile_package
+
+    result = {'Package': path, 'Language': language, 'Status': 'success', 'Duration': 0.0, 'Error': '', 'Changed': 0}
+    start = time.perf_counter()
+    try:
+        transpile_package(path, language)
+    except Exception:
+        result['Status'] = 'failure'
+        result['Error'] = traceback.format_exc()
+    result['Duration'] = time.perf_counter() - start
+    return result
+
+
+def _peak_memory():
+    """
+    Returns the peak resident memory of the process in bytes, 0 where the resource module is not available
+    """
+
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+_started = None # queue the worker processes report the start of their tasks to
+
+
+def _init_worker(started):
+    """
+    Initializer of the worker processes, started is the queue of the started tasks
+    """
+
+    global _started
+    _started = started
+
+
+def _transpile_shadow(path, language, models=None, profile=False):
+    """
+    Transpiles a private copy of the package path into language, in a worker process or in the caller.
+    models are the parsed unit models of the package, used in worker processes only, see
+    shared_models. With profile the result
+    also holds the peak resident memory of the process that ran it ('Peak', bytes) and its
+    per-model timings ('Models').
+    """
+
+    from pycrop2ml_ui.core import timings
+
+    if _started is not None:
+        _started.put((path, language))
+    shadow = make_shadow(path)
+    start = time.time()
+    with shared_models(path, shadow, models):
+        result = transpile_language(shadow, language)
+    end = time.time()
+    if profile:
+        result['Peak'] = _peak_memory()
+
+    files = output_files(shadow)
+    result['Package'] = path
+    result['Shadow'] = shadow
+    result['Outputs'] = sorted(files)
+    if profile:
+        result['Models'] = timings.model_timings(files, timings.model_names(shadow), start, end)
+    return result
+
+
+def _collect(result, discard=False, store=None, key=None, previous=()):
+    """
+    Syncs the outputs of a _transpile_shadow result into its package unless discard
+    is set or the language failed, then removes the shadow. With a store, the outputs
+    are first copied into its entry key. previous are the outputs of the last build of
+    the language, see sync_outputs.
+    """
+
+    shadow = result.pop('Shadow', None)
+    if shadow is None:
+        return result
+    if result['Status'] == 'success' and not discard:
+        if store is not None and key is not None:
+            store.put(key, shadow)
+        written, removed = sync_outputs(shadow, result['Package'], previous=previous)
+        result['Changed'] = len(written) + len(removed)
+    remove_shadow(shadow)
+    return result
+
+
+def _status(path, language, status):
+    """
+    Returns the result of a language that did not run
+    """
+
+    return {'Package': path, 'Language': language, 'Status': status, 'Duration': 0.0, 'Error': '', 'Changed': 0}
+
+
+def _finish(paths, results, profile, store):
+    """
+    Writes the timing reports of a profiled run, evicts the old store entries and
+    invalidates the catalog listings of paths
+    """
+
+    from pycrop2ml_ui.core import timings
+
+    for path in paths:
+        if profile:
+            timings.write_timings(path, [r for r in results if r['Package'] == path])
+        catalog.invalidate(path)
+    if store is not None:
+        try:
+            store.evict()
+        except Exception:
+            pass
+
+
+def transpile_packages(paths, languages, workers=1, callback=None, incremental=False, on_start=None, cancel=None, profile=False, store=None):
+    """
+    Transpiles every package of paths into every language of languages and returns the list of results.
+
+    Each (package, language) pair is one task, rendered on a private copy of its package.
+    Once the language succeeded the generated trees are synced back with sync_outputs :
+    unchanged files are not rewritten and the outputs of deleted models are removed.
+    With workers=1 the tasks run one after another, otherwise they share one pool of
+    workers spawned processes, which is the global concurrency limit. A failing task never
+    stops the others. The 'Changed' entry of a result counts the files written or removed.
+
+    In parallel mode every package is parsed once, through the shared parse cache, and the
+    parsed models are pickled to the workers, which hand them to each language generator.
+    Tasks run in the caller parse their package themselves, pycropml being left untouched
+    in the kernel.
+
+    Parameters : \n
+        - paths : list of package paths
+        - languages : list of target languages, see LANGUAGES
+        - workers : size of the process pool
+        - callback : callback(result) called when a task is done
+        - incremental : skip the languages whose build manifest entry is up to date
+        - on_start : on_start(path, language) called when a task starts to run
+        - cancel : threading.Event, once set the remaining tasks are reported as
+                   cancelled and the outputs of the running ones are discarded
+        - profile : record the wall time, generated files and peak memory of every model and
+                    language in the results and in the package timing report, see timings.
+                    Profiled tasks always run in worker processes, a new one per task
+                    from Python 3.11, so the kernel memory is not reported.
+        - store : TranspileStore the generated trees are restored from, with the status 'cached',
+                  and published to, see store.get_store()
+
+    The build manifest (.crop2ml_cache/manifest.json) of a package records for each language
+    the hash of every crop2ml source, its own and the ones of the external packages its
+    compositions refer to, and the generated files of its last successful run.
+    """
+
+    from pycrop2ml_ui.core import parsecache
+
+    results = []
+    builds = {path: (build_hashes(path), read_manifest(path)) for path in paths}
+
+    def previous(path, lg):
+        return builds[path][1]['languages'].get(lg, dict()).get('outputs', [])
+
+    def done(result):
+        outputs = result.pop('Outputs', None)
+        if result['Status'] in ('success', 'cached') and outputs is not None:
+            hashes, manifest = builds[result['Package']]
+            manifest['languages'][result['Language']] = {'pycropml': parsecache.pycropml_version(), 'sources': hashes['sources'],
+                                                         'externals': hashes['externals'], 'outputs': outputs}
+            write_manifest(result['Package'], manifest)
+        results.append(result)
+        if callback:
+            callback(result)
+
+    tasks = []
+    for path in paths:
+        for lg in languages:
+            if incremental and is_up_to_date(path, lg, *builds[path]):
+                done(_status(path, lg, 'skipped'))
+            else:
+                tasks.append((path, lg))
+
+    keys = dict()
+    if store is not None:
+        for path, lg in list(tasks):
+            try:
+                keys[(path, lg)] = store.key(path, lg, builds[path][0])
+                start = time.perf_counter()
+                restored = store.restore(keys[(path, lg)], path, previous(path, lg))
+            except Exception:
+                continue
+            if restored is not None:
+                result = _status(path, lg, 'cached')
+                result['Duration'] = time.perf_counter() - start
+                result['Changed'] = len(restored[0]) + len(restored[1])
+                result['Outputs'] = store.outputs(keys[(path, lg)])
+                done(result)
+                tasks.remove((path, lg))
+
+    if (workers == 1 or len(tasks) <= 1) and not profile:
+        for path, lg in tasks:
+            if cancel is not None and cancel.is_set():
+                done(_status(path, lg, 'cancelled'))
+                continue
+            if on_start:
+                on_start(path, lg)
+            try:
+                result = _transpile_shadow(path, lg, None, profile)
+            except Exception:
+                result = _status(path, lg, 'failure')
+                result['Error'] = traceback.format_exc()
+            if cancel is not None and cancel.is_set():
+                _collect(result, discard=True)
+                done(_status(path, lg, 'cancelled'))
+                continue
+            done(_collect(result, store=store, key=keys.get((path, lg)), previous=previous(path, lg)))
+        _finish(paths, results, profile, store)
+        return results
+
+    models = dict()
+    for path in sorted({path for path, lg in tasks}):
+        models[path] = parse_models(path)
+
+    # a profiled task runs in a fresh worker process, so its peak memory is its own
+    isolated = {'max_tasks_per_child': 1} if profile and sys.version_info >= (3, 11) else dict()
+    context = multiprocessing.get_context('spawn')
+    started = context.Queue()
+    running = set()
+
+    def start(task):
+        if task not in running:
+            running.add(task)
+            if on_start:
+                on_start(*task)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(started,), **isolated) as pool:
+        futures = {pool.submit(_transpile_shadow, path, lg, models[path], profile): (path, lg) for path, lg in tasks}
+
+        pending = set(futures)
+        reported = set()
+        while pending:
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            cancelled = cancel is not None and cancel.is_set()
+            while True:
+                try:
+                    task = started.get_nowait()
+                except queue.Empty:
+                    break
+                if task not in reported:
+                    start(task)
+
+            for future in finished:
+                if future.cancelled():
+                    continue
+                if futures[future] not in reported:
+                    start(futures[future])
+                try:
+                    result = future.result()
+                except Exception:
+                    result = _status(*futures[future], 'failure')
+                    result['Error'] = traceback.format_exc()
+
+                if cancelled and futures[future] not in reported:
+                    reported.add(futures[future])
+                    done(_status(*futures[future], 'cancelled'))
+                _collect(result, discard=futures[future] in reported, store=store, key=keys.get(futures[future]), previous=previous(*futures[future]))
+                if futures[future] not in reported:
+                    done(result)
+
+            if cancelled:
+                for future in pending:
+                    future.cancel()
+                    if futures[future] not in reported:
+                        reported.add(futures[future])
+                        done(_status(*futures[future], 'cancelled'))
+                pending = {future for future in pending if not future.cancelled()}
+    started.close()
+
+    _finish(paths, results, profile, store)
+    return results
+
+
+def transpile(path, languages, workers=1, callback=None, incremental=False, on_start=None, cancel=None, profile=False, store=None):
+    """
+    Transpiles the package path into every language of languages and returns the list of results,
+    see transpile_packages. on_start is called as on_start(language).
+    """
+
+    return transpile_packages([path], languages, workers=workers, callback=callback, incremental=incremental,
+                              on_start=(lambda p, lg: on_start(lg)) if on_start else None, cancel=cancel, profile=profile, store=store)
+
+
+def summary(results):
+    """
+    Returns a pandas DataFrame summarizing results : one row per package with the status
+    of every language, the total duration, the number of files changed and the number of failures
+    """
+
+    import pandas as pd
+
+    df = pd.DataFrame(results, columns=['Package', 'Language', 'Status', 'Duration', 'Error', 'Changed'])
+    table = df.pivot(index='Package', columns='Language', values='Status')
+    table['Duration'] = df.groupby('Package')['Duration'].sum().round(1)
+    table['Changed'] = df.groupby('Package')['Changed'].sum()
+    table['Failures'] = df.groupby('Package')['Status'].apply(lambda s: (s == 'failure').sum())
+    return table.fillna('').sort_values(['Failures', 'Duration'], ascending=False)
@@ -0,0 +1,182 @@
+import os
+import logging
+import weakref
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pycrop2ml_ui.core import catalog, parsecache, portindex
+
+
+logger = logging.getLogger(__name__)
+
+def _warm(pkg, disk):
+    """
+    Parses the package pkg in a worker process and returns its cache entries
+    """
+
+    parsecache.DISK_CACHE = disk
+    entries = [(('package', pkg), parsecache.package_sources(pkg), parsecache.parse_package(pkg))]
+    for filename in catalog.get_catalog().models(pkg, types=('composition',)):
+        path = os.path.join(pkg, 'crop2ml', filename)
+        entries.append((('composition', path), [path], parsecache.parse_composition(path)))
+    entries.append((('ports', pkg), parsecache.package_sources(pkg), portindex.package_ports(pkg)))
+    return entries
+
+
+
+class WarmUp():
+    """
+    Class parsing every package of a workspace in a background pool of spawned processes for pycrop2ml's user interface.
+
+    Each parsed package is sent back to the kernel and stored in the shared parse
+    cache, so the menus opened afterwards find it warm. The entries are stored with
+    the source signature taken before the parse: a file changed meanwhile makes
+    them stale instead of wrong.
+
+    Parameters : \n
+        - root : directory holding the packages
+        - workers : maximum number of worker processes, os.cpu_count() if None
+        - callback : callback(done, total, package, error) called after each package
+    """
+
+    def __init__(self, root=catalog.PKG_DIRECTORY, workers=None, callback=None):
+
+        self.root = root
+        self.workers = workers
+        self._callbacks = []
+        self.done = 0
+        self.total = 0
+        self.errors = dict() # {package: error message}
+        self._thread = None
+        self._cancel = threading.Event()
+        if callback:
+            self.subscribe(callback)
+
+
+    def subscribe(self, callback):
+        """
+        Registers callback(done, total, package, error). Bound methods are weakly referenced.
+        """
+
+        self._callbacks.append(weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback))
+        return callback
+
+
+    def _signatures(self, pkg):
+        """
+        Returns the {cache key: source signature} of the entries _warm builds for the package pkg,
+        taken before the parse. An entry missing here, a composition added meanwhile, is not stored.
+        """
+
+        sig = parsecache.signature(parsecache.package_sources(pkg))
+        signatures = {('package', pkg): sig, ('ports', pkg): sig}
+        for filename in catalog.get_catalog().models(pkg, types=('composition',)):
+            path = os.path.join(pkg, 'crop2ml', filename)
+            signatures[('composition', path)] = parsecache.signature([path])
+        return signatures
+
+
+    def _run(self):
+        """
+        Warm-up thread
+        """
+
+        packages = [os.path.abspath(p) for p in catalog.get_catalog(self.root).packages() if catalog.get_catalog(self.root).is_package(p)]
+        self.total = len(packages)
+        if not packages:
+            return
+
+        signatures = {pkg: self._signatures(pkg) for pkg in packages}
+
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(_warm, pkg, parsecache.DISK_CACHE): pkg for pkg in packages}
+
+            for future in as_completed(futures):
+                pkg = futures[future]
+                error = None
+
+                if self._cancel.is_set():
+                    for f in futures:
+                        f.cancel()
+                    break
+
+                try:
+                    for key, sources, value in future.result():
+                        if key in signatures[pkg]:
+                            parsecache.get_cache().put(key, signatures[pkg][key], value)
+                except Exception as e:
+                    error = str(e)
+                    self.errors[pkg] = error
+
+                self.done += 1
+                for ref in list(self._callbacks):
+                    callback = ref()
+                    if callback is None:
+                        self._callbacks.remove(ref)
+                        continue
+                    try:
+                        callback(self.done, self.total, pkg, error)
+                    except Exception:
+                        logger.exception('Warm-up callback %r failed on %s', callback, pkg)
+
+
+    def start(self):
+        """
+        Starts the warm-up in a background thread
+        """
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pycrop2ml-ui-warmup', daemon=True)
+            self._thread.start()
+
+
+    def running(self):
+        """
+        Returns whether the warm-up is still running
+        """
+
+        return self._thread is not None and self._thread.is_alive()
+
+
+    def wait(self, timeout=None):
+        """
+        Waits for the end of the warm-up
+        """
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+    def cancel(self):
+        """
+        Stops submitting packages, the ones already parsing still complete
+        """
+
+        self._cancel.set()
+
+
+
+_warmup = None
+
+
+def start_warmup(root=catalog.PKG_DIRECTORY, workers=None, callback=None):
+    """
+    Starts the warm-up of the packages of root once per kernel and returns it
+    """
+
+    global _warmup
+    if _warmup is None:
+        _warmup = WarmUp(root, workers, callback)
+        _warmup.start()
+    elif callback:
+        _warmup.subscribe(callback)
+    return _warmup
+
+
+def get_warmup():
+    """
+    Returns the warm-up started in this kernel, or None
+    """
+
+    return _warmup
@@ -0,0 +1,418 @@
+import os
+import time
+import asyncio
+import logging
+import weakref
+import threading
+from collections import namedtuple
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+from pycrop2ml_ui.core import catalog
+
+
+INTERVAL = float(os.environ.get('PYCROP2ML_UI_WATCH_INTERVAL', '2.0'))
+
+PACKAGE_ADDED = 'package_added'
+PACKAGE_REMOVED = 'package_removed'
+MODEL_CHANGED = 'model_changed'
+DATA_CHANGED = 'data_changed'
+
+Event = namedtuple('Event', ['kind', 'package', 'path'])
+
+logger = logging.getLogger(__name__)
+
+
+def _list_dir(directory):
+    """
+    Returns the ({path: (mtime_ns, size)}, [subdirectories]) of directory, the cache
+    directories (catalog.CACHE_DIRECTORY) excepted
+    """
+
+    files = dict()
+    subdirs = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    if entry.name != catalog.CACHE_DIRECTORY:
+                        subdirs.append(entry.path)
+                    continue
+                st = entry.stat()
+            except OSError:
+                continue
+            files[entry.path] = (st.st_mtime_ns, st.st_size)
+    return files, subdirs
+
+
+def _snapshot_dir(directory, recursive, listings=None, stat_top=True):
+    """
+    Returns {path: (mtime_ns, size)} for the files of directory.
+
+    listings {directory: (mtime_ns, files, subdirectories)} keeps the previous listings :
+    a directory whose mtime did not change is not listed again and its subdirectories
+    are reused, so a scan costs one stat per directory. The files directly under
+    directory are stat'ed again anyway with stat_top, to notice the files edited in place.
+    """
+
+    if listings is None:
+        listings = dict()
+
+    files = dict()
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            mtime = os.stat(current).st_mtime_ns
+        except OSError:
+            listings.pop(current, None)
+            continue
+
+        cached = listings.get(current)
+        if cached is None or cached[0] != mtime:
+            try:
+                found, subdirs = _list_dir(current)
+            except OSError:
+                continue
+            listings[current] = (mtime, found, subdirs)
+        else:
+            found, subdirs = cached[1], cached[2]
+            if stat_top and current == directory:
+                found = dict()
+                for path in cached[1]:
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found[path] = (st.st_mtime_ns, st.st_size)
+                listings[current] = (mtime, found, subdirs)
+
+        files.update(found)
+        if recursive:
+            stack += subdirs
+    return files
+
+
+def _snapshot_package(pkg, listings=None):
+    """
+    Returns the (model files, data files) snapshots of the package pkg. The model files
+    of the crop2ml directory are stat'ed on every call, the other directories are only
+    listed again when their mtime changes.
+    """
+
+    return (_snapshot_dir(os.path.join(pkg, 'crop2ml'), True, listings, stat_top=True),
+            _snapshot_dir(os.path.join(pkg, 'data'), True, listings, stat_top=False))
+
+
+def _kernel_scheduler():
+    """
+    Returns a function scheduling fn(*args) on the event loop of the calling thread, which
+    is the kernel loop when called from a notebook cell or a widget callback, or None if
+    there is no such loop
+    """
+
+    try:
+        return asyncio.get_running_loop().call_soon_threadsafe
+    except RuntimeError:
+        pass
+    try:
+        from IPython import get_ipython
+        return get_ipython().kernel.io_loop.add_callback
+    except Exception:
+        return None
+
+
+def refresh_options(widget, options):
+    """
+    Updates the options of a selection widget, keeping its current value when it is still available.
+
+    Options are values or (label, value) pairs. A value still available is never changed, so
+    the value observers of the widget are only called when it is gone : ipywidgets selects the
+    first option whenever the options change, unless the widget is initializing.
+    """
+
+    options = list(options)
+    if list(widget.options) == options:
+        return
+    values = [o[1] if isinstance(o, tuple) else o for o in options]
+    if widget.value not in values:
+        widget.options = options
+        return
+
+    index = values.index(widget.value)
+    widget._initializing_traits_ = True
+    try:
+        widget.options = options
+    finally:
+        widget._initializing_traits_ = False
+    widget.index = index
+    if widget.label != widget._options_labels[index]:
+        widget.label = widget._options_labels[index]
+
+
+
+def _deliver(callback, events):
+    """
+    Calls callback for each event, logging its errors
+    """
+
+    for event in events:
+        try:
+            callback(event)
+        except Exception:
+            logger.exception('Package watcher subscriber %r failed on %r', callback, event)
+
+
+
+class PackageWatcher():
+    """
+    Class watching the packages of a workspace for pycrop2ml's user interface.
+
+    A background thread compares stat snapshots of every package and publishes
+    an Event(kind, package, path) to the subscribers for each package added or
+    removed, model file (crop2ml directory) changed and data file added, removed
+    or changed. When the optional inotify_simple module is available the thread
+    sleeps on inotify and only rescans the packages reported by the kernel,
+    otherwise it polls every interval seconds. A poll only lists again the directories
+    whose mtime changed and stats the model files of the crop2ml directories, while the
+    packages reported by inotify are scanned in full.
+
+    The catalog listings of the changed paths are invalidated before publishing. Subscribers
+    are called on the event loop of the thread that subscribed them, the kernel loop for
+    the menus, so widgets are not updated from the watcher thread.
+
+    Parameters : \n
+        - root : directory holding the packages
+        - interval : polling period in seconds
+    """
+
+    def __init__(self, root=catalog.PKG_DIRECTORY, interval=INTERVAL):
+
+        self.root = root
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = [] # [(callback reference, scheduler or None)]
+        self._snapshots = dict() # {package: (models, datas)}
+        self._listings = dict() # {directory: (mtime_ns, files, subdirectories)}
+        self._thread = None
+        self._stop = threading.Event()
+        self._inotify = None
+        self._wds = dict() # {watch descriptor: package or None for root}
+
+
+    def subscribe(self, callback):
+        """
+        Registers callback(event), called on the event loop of the calling thread if it
+        runs one (see _kernel_scheduler). Bound methods are weakly referenced, so a menu does
+        not stay alive only because it listens to the watcher, menus still unsubscribe when
+        they close.
+        """
+
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            self._subscribers.append((ref, _kernel_scheduler()))
+        self.start()
+        return callback
+
+
+    def unsubscribe(self, callback):
+        """
+        Removes callback from the subscribers
+        """
+
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0]() not in (None, callback)]
+
+
+    def _publish(self, events):
+        """
+        Invalidates the catalog and delivers the events to every live subscriber
+        """
+
+        for event in events:
+            catalog.invalidate(event.path)
+
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0]() is not None]
+            subscribers = [(ref(), schedule) for ref, schedule in self._subscribers]
+
+        for callback, schedule in subscribers:
+            if callback is None:
+                continue
+            if schedule is None:
+                _deliver(callback, events)
+                continue
+            try:
+                schedule(_deliver, callback, events)
+            except RuntimeError:
+                logger.warning('Package watcher subscriber %r dropped, its event loop is closed', callback)
+                self.unsubscribe(callback)
+
+
+    def _packages(self):
+        """
+        Returns the set of package directories under the root
+        """
+
+        try:
+            with os.scandir(self.root) as it:
+                return {entry.path for entry in it if entry.is_dir()}
+        except OSError:
+            return set()
+
+
+    def scan(self, packages=None):
+        """
+        Compares the current state of packages (every package if None) with the
+        last snapshot and returns the list of change events
+        """
+
+        events = []
+        current = self._packages()
+
+        explicit = packages is not None
+
+        if not explicit:
+            for pkg in sorted(set(self._snapshots) - current):
+                del self._snapshots[pkg]
+                self._forget(pkg)
+                events.append(Event(PACKAGE_REMOVED, pkg, pkg))
+            packages = current
+        else:
+            packages = set(packages)
+            for pkg in sorted(packages - current):
+                if self._snapshots.pop(pkg, None) is not None:
+                    self._forget(pkg)
+                    events.append(Event(PACKAGE_REMOVED, pkg, pkg))
+            packages &= current
+
+        for pkg in sorted(packages):
+            models, datas = _snapshot_package(pkg, None if explicit else self._listings)
+            old = self._snapshots.get(pkg)
+            self._snapshots[pkg] = (models, datas)
+
+            if old is None or explicit:
+                self._watch(pkg)
+            if old is None:
+                events.append(Event(PACKAGE_ADDED, pkg, pkg))
+                continue
+
+            for path in sorted(set(models) ^ set(old[0]) | {p for p in models if p in old[0] and models[p] != old[0][p]}):
+                events.append(Event(MODEL_CHANGED, pkg, path))
+            for path in sorted(set(datas) ^ set(old[1]) | {p for p in datas if p in old[1] and datas[p] != old[1][p]}):
+                events.append(Event(DATA_CHANGED, pkg, path))
+
+        return events
+
+
+    def _forget(self, pkg):
+        """
+        Drops the directory listings of the removed package pkg
+        """
+
+        for directory in [d for d in self._listings if d == pkg or d.startswith(pkg + os.path.sep)]:
+            del self._listings[directory]
+
+
+    def _watch(self, pkg):
+        """
+        Adds inotify watches on the crop2ml and data directories of pkg
+        """
+
+        if self._inotify is None:
+            return
+
+        flags = inotify_simple.flags
+        mask = flags.CREATE | flags.DELETE | flags.MODIFY | flags.MOVED_FROM | flags.MOVED_TO | flags.CLOSE_WRITE
+        for sub in ['', 'crop2ml', os.path.join('crop2ml', 'algo', 'pyx'), 'data']:
+            directory = os.path.join(pkg, sub)
+            if os.path.isdir(directory):
+                try:
+                    self._wds[self._inotify.add_watch(directory, mask)] = pkg
+                except OSError:
+                    pass
+
+
+    def _run(self):
+        """
+        Watcher thread loop
+        """
+
+        self.scan()
+
+        if inotify_simple is not None:
+            try:
+                self._inotify = inotify_simple.INotify()
+                flags = inotify_simple.flags
+                self._wds[self._inotify.add_watch(self.root, flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO)] = None
+                for pkg in self._snapshots:
+                    self._watch(pkg)
+            except OSError:
+                self._inotify = None
+
+        while not self._stop.is_set():
+            if self._inotify is None:
+                self._stop.wait(self.interval)
+                events = self.scan()
+            else:
+                notified = self._inotify.read(timeout=int(self.interval * 1000))
+                if not notified:
+                    continue
+                time.sleep(0.05) # let the writer finish before the rescan
+                packages = {self._wds.get(n.wd) for n in notified}
+                events = self.scan(None if None in packages else packages)
+
+            if events:
+                self._publish(events)
+
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._wds.clear()
+
+
+    def start(self):
+        """
+        Starts the watcher thread if it is not running
+        """
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='pycrop2ml-ui-watcher', daemon=True)
+            self._thread.start()
+
+
+    def stop(self):
+        """
+        Stops the watcher thread
+        """
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+
+_watchers = dict()
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(root=catalog.PKG_DIRECTORY, interval=None):
+    """
+    Returns the watcher shared by every menu for the given root directory. interval
+    sets its polling period in seconds, INTERVAL (PYCROP2ML_UI_WATCH_INTERVAL) by default.
+    """
+
+    key = os.path.abspath(root)
+    with _watchers_lock:
+        if key not in _watchers:
+            _watchers[key] = PackageWatcher(root)
+        if interval is not None:
+            _watchers[key].interval = interval
+        return _watchers[key]
@@ -6,6 +6,7 @@ from cookiecutter.main import cookiecutter
 
 from pycrop2ml_ui.browser.TkinterPath import getPath
 from pycrop2ml_ui.model import MainMenu
+from pycrop2ml_ui.core import catalog
 
 
 
@@ -74,6 +75,7 @@ class createPackage():
                     except:
                         raise Exception("Could not create the package.")   
                     finally:
+                        catalog.invalidate(self.dirpath)
                         self._out.clear_output()
                         self._out2.clear_output()
 
@@ -5,6 +5,7 @@ import qgrid
 import pandas
 
 from pycrop2ml_ui.menus.setsmanagement.managelink import manageLink
+from pycrop2ml_ui.core import catalog, modelheader
 
 from IPython.display import display
 
@@ -53,17 +54,18 @@ class createComposition():
 
         liste = ['']
 
-        for buffer in os.listdir(self._datas['Path']):
-            split = buffer.split('.')
-            if split[0] in ['unit','composition'] and split[-1] == 'xml':
-                liste.append(buffer)
+        pkg = os.path.split(self._datas['Path'])[0]
+        liste += catalog.get_catalog().models(pkg)
+        rows = modelheader.html_rows(pkg, liste[1:])
         
         if self._externalpkglist:
             for extpkg in self._externalpkglist:
-                for name in os.listdir(extpkg+os.path.sep+'crop2ml'):
-                    split = name.split('.')
-                    if split[0] in ['unit', 'composition'] and split[-1] == 'xml':
-                        liste.append(os.path.split(extpkg)[1]+':'+name)
+                names = catalog.get_catalog().models(extpkg)
+                for name in names:
+                    liste.append(os.path.split(extpkg)[1]+':'+name)
+                rows += modelheader.html_rows(extpkg, names, prefix=os.path.split(extpkg)[1]+':')
+
+        self._modelinfo = wg.HTML(value='<table><tr><th>Model</th><th>ID</th><th>Version</th><th>Title</th></tr>{}</table>'.format(rows))
 
 
         self._dataFrame = pandas.DataFrame(data={'Model name': pandas.Categorical([''], categories=liste)})
@@ -172,7 +174,7 @@ class createComposition():
         self._listdirs()
         
         with self._out:
-            display(wg.VBox([wg.HTML(value='<font size="5"><b> Model creation : composition.{}.xml<br>-> Model composition</b></font>'.format(self._datas['Model name'])), self._dataFrameqgrid, wg.HBox([self._apply, self._exit])]))
+            display(wg.VBox([wg.HTML(value='<font size="5"><b> Model creation : composition.{}.xml<br>-> Model composition</b></font>'.format(self._datas['Model name'])), self._dataFrameqgrid, self._modelinfo, wg.HBox([self._apply, self._exit])]))
 
         self._apply.on_click(self._eventApply)
         self._exit.on_click(self._eventExit)
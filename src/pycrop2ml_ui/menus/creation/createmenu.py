@@ -9,6 +9,7 @@ from pycrop2ml_ui.menus.creation import createcomposition
 from pycrop2ml_ui.model import MainMenu
 from pycrop2ml_ui.browser.TkinterPath import getPath
 from pycrop2ml_ui.menus.creation.externalpackage import externalPackageMenu
+from pycrop2ml_ui.core import catalog, watcher
 
 
 class createMenu():
@@ -50,11 +51,10 @@ class createMenu():
             self._header = wg.VBox([self._toggle,  self._outextpkg, wg.HBox([self._path, self._browse]), self._modelName, self._modelID, self._version, self._timestep, self._title, self._authors, self._institution, self._reference, self._abstract])
         else:
             self._path = wg.Dropdown(options=['None'],value='None',description='Package:',disabled=False,layout=wg.Layout(width='400px',height='35px'))
-            self.tmp = []
             self.pkg_directory = "./packages"
-            for f in os.listdir(self.pkg_directory):
-                self.tmp.append(os.path.join(self.pkg_directory,f))
+            self.tmp = catalog.get_catalog(self.pkg_directory).packages()
             self._path.options = self.tmp 
+            watcher.get_watcher(self.pkg_directory).subscribe(self._on_package_event)
             self._path.disabled = False
             self._header = wg.VBox([self._toggle,  self._outextpkg, self._path, self._modelName, self._modelID, self._version, self._timestep, self._title, self._authors, self._institution, self._reference, self._abstract])
 
@@ -110,6 +110,7 @@ class createMenu():
             self._out.clear_output()
                 
             if self._checkFile():
+                self._unsubscribe()
                 with self._out:
                     if self._datas['Model type'] == 'unit':
                         try:   
@@ -159,11 +160,30 @@ class createMenu():
 
 
                   
+    def _on_package_event(self, event):
+        """
+        Handles package additions and removals published by the package watcher
+        """
+
+        if event.kind in [watcher.PACKAGE_ADDED, watcher.PACKAGE_REMOVED]:
+            watcher.refresh_options(self._path, catalog.get_catalog(self.pkg_directory).packages())
+
+
+
+    def _unsubscribe(self):
+        """
+        Stops listening to the package watcher, the menu being closed
+        """
+
+        if not self.local:
+            watcher.get_watcher(self.pkg_directory).unsubscribe(self._on_package_event)
+
     def _eventCancel(self, b):
         """
         Handles cancel button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
 
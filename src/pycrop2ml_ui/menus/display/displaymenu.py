@@ -1,11 +1,11 @@
 import ipywidgets as wg
 import os
 
-from IPython.display import display
+from IPython.display import display, SVG
 
 from pycrop2ml_ui.model import MainMenu
 from pycrop2ml_ui.browser.TkinterPath import getPath
-from pycropml.topology import Topology
+from pycrop2ml_ui.core import catalog, topocache, watcher
 
 
 class displayMenu():
@@ -29,11 +29,10 @@ class displayMenu():
         
         else:
             self._modelPath = wg.Dropdown(options=['None'],value='None',description='Model path:',disabled=False,layout=wg.Layout(width='400px',height='35px'))
-            self.tmp = [""]
             self.pkg_directory = "./packages"
-            for f in os.listdir(self.pkg_directory):
-                self.tmp.append(os.path.join(self.pkg_directory,f))
+            self.tmp = [""] + catalog.get_catalog(self.pkg_directory).packages()
             self._modelPath.options = self.tmp 
+            watcher.get_watcher(self.pkg_directory).subscribe(self._on_package_event)
             self._modelPath.disabled = False 
             self._pathing = self._modelPath   
         #buttons
@@ -62,11 +61,30 @@ class displayMenu():
 
 
 
+    def _on_package_event(self, event):
+        """
+        Handles package additions and removals published by the package watcher
+        """
+
+        if event.kind in [watcher.PACKAGE_ADDED, watcher.PACKAGE_REMOVED]:
+            watcher.refresh_options(self._modelPath, [""] + catalog.get_catalog(self.pkg_directory).packages())
+
+
+
+    def _unsubscribe(self):
+        """
+        Stops listening to the package watcher, the menu being closed
+        """
+
+        if not self.local:
+            watcher.get_watcher(self.pkg_directory).unsubscribe(self._on_package_event)
+
     def _eventCancel(self, b):
         """
         Handles cancel button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
         
@@ -89,11 +107,15 @@ class displayMenu():
         self._out2.clear_output()
 
         if change['new']:
-            topo = Topology(self._modelPath.value.split(os.path.sep)[-1], pkg=self._modelPath.value)
+            name = self._modelPath.value.split(os.path.sep)[-1]
+            svg, captured = topocache.workflow(self._modelPath.value, name)
 
             with self._out2:
-                display(wg.HTML('<font size="5"><b>Package {}</b></font>'.format(self._modelPath.value.split(os.path.sep)[-1])))
-                topo.display_wf_svg()
+                display(wg.HTML('<font size="5"><b>Package {}</b></font>'.format(name)))
+                if svg is not None:
+                    display(SVG(svg))
+                elif captured is not None:
+                    captured.show()
 
 
 
@@ -1,14 +1,13 @@
 import ipywidgets as wg
 import os
-import zipfile
 import base64
 
-from io import BytesIO
 from pathlib import Path
 from IPython.display import display
 
 from pycrop2ml_ui.browser.TkinterPath import getPath
 from pycrop2ml_ui.model import MainMenu
+from pycrop2ml_ui.core import catalog, watcher, export
 
 
 class DownloadMenu:
@@ -30,11 +29,10 @@ class DownloadMenu:
         else:
             self._modelPath = wg.Dropdown(options=['None'], value='None', description='Model path:', disabled=False,
                                           layout=wg.Layout(width='400px', height='35px'))
-            self.tmp = [""]
             self.pkg_directory = "./packages"
-            for f in os.listdir(self.pkg_directory):
-                self.tmp.append(os.path.join(self.pkg_directory, f))
+            self.tmp = [""] + catalog.get_catalog(self.pkg_directory).packages()
             self._modelPath.options = self.tmp
+            watcher.get_watcher(self.pkg_directory).subscribe(self._on_package_event)
             self._modelPath.disabled = False
             self._pathing = self._modelPath
 
@@ -71,11 +69,28 @@ class DownloadMenu:
             with self._out2:
                 print('This repository is not a model package.')
 
+    def _on_package_event(self, event):
+        """
+        Handles package additions and removals published by the package watcher
+        """
+
+        if event.kind in [watcher.PACKAGE_ADDED, watcher.PACKAGE_REMOVED]:
+            watcher.refresh_options(self._modelPath, [""] + catalog.get_catalog(self.pkg_directory).packages())
+
+    def _unsubscribe(self):
+        """
+        Stops listening to the package watcher, the menu being closed
+        """
+
+        if not self.local:
+            watcher.get_watcher(self.pkg_directory).unsubscribe(self._on_package_event)
+
     def _eventCancel(self, b):
         """
         Handles cancel button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
         
@@ -98,18 +113,8 @@ class DownloadMenu:
                                                                 ))
             return
 
-        # Open StringIO to grab in-memory ZIP contents
-        bytes_zip = BytesIO()
-
-        # The zip compressor
-        with zipfile.ZipFile(bytes_zip, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    zf.write(os.path.join(root, file),
-                             os.path.relpath(os.path.join(root, file), os.path.join(directory, '..')))
-
         # Build download button on fly
-        b64 = base64.b64encode(bytes_zip.getvalue())
+        b64 = base64.b64encode(export.zip_bytes(directory))
         self._download.value = self._html_download.format(payload=b64.decode(),
                                                           filename=f"{directory.name}.zip",
                                                           disabled="",
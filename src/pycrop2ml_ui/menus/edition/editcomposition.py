@@ -9,7 +9,7 @@ from IPython.display import display
 from pycrop2ml_ui.menus.edition import editmenu
 from pycrop2ml_ui.menus.setsmanagement.managelink import manageLink
 from pycrop2ml_ui.browser.TkinterPath import getPath
-from pycropml.composition import model_parser
+from pycrop2ml_ui.core import catalog, parsecache, modelheader
 
 
 class editComposition():
@@ -61,7 +61,7 @@ class editComposition():
         Parses the xml file to gather the data set
         """
         
-        self._xmlfile, = model_parser(self._datas['Path']+os.path.sep+'composition.{}.xml'.format(self._datas['Model name']))
+        self._xmlfile, = parsecache.parse_composition(self._datas['Path']+os.path.sep+'composition.{}.xml'.format(self._datas['Model name']))
 
         self._modelname.value = self._xmlfile.name
         self._version.value = self._xmlfile.version
@@ -225,17 +225,18 @@ class editComposition():
         """
         
         liste = ['']
-        for buffer in os.listdir(self._datas['Path']):
-            split = buffer.split('.')
-            if split[0] in ['unit','composition'] and split[-1] == 'xml':
-                liste.append(buffer)
+        pkg = os.path.split(self._datas['Path'])[0]
+        liste += catalog.get_catalog().models(pkg)
+        rows = modelheader.html_rows(pkg, liste[1:])
         
         if self._listextpkg:
             for extpkg in self._listextpkg:
-                for name in os.listdir(extpkg+os.path.sep+'crop2ml'):
-                    split = name.split('.')
-                    if split[0] in ['unit', 'composition'] and split[-1] == 'xml':
-                        liste.append(os.path.split(extpkg)[1]+':'+name)
+                names = catalog.get_catalog().models(extpkg)
+                for name in names:
+                    liste.append(os.path.split(extpkg)[1]+':'+name)
+                rows += modelheader.html_rows(extpkg, names, prefix=os.path.split(extpkg)[1]+':')
+
+        self._modelinfo = wg.HTML(value='<table><tr><th>Model</th><th>ID</th><th>Version</th><th>Title</th></tr>{}</table>'.format(rows))
 
       
         if self._listmodel:
@@ -249,7 +250,7 @@ class editComposition():
 
         self._datamodeltab = qgrid.show_grid(self._dataframe, grid_options={'forceFitColumns': False, 'defaultColumnWidth': 200},show_toolbar=True)
 
-        self._tab = wg.Tab([self._informations, self._datamodeltab])
+        self._tab = wg.Tab([self._informations, wg.VBox([self._datamodeltab, self._modelinfo])])
         self._tab.set_title(0, 'Header')
         self._tab.set_title(1, 'Model composition')
 
@@ -6,6 +6,7 @@ from IPython.display import display
 from pycrop2ml_ui.browser.TkinterPath import getPath
 from pycrop2ml_ui.menus.edition import editunit, editcomposition
 from pycrop2ml_ui.model import MainMenu
+from pycrop2ml_ui.core import catalog, watcher, modelheader
 
 
 class editMenu():
@@ -31,11 +32,10 @@ class editMenu():
         
         else:
             self._modelPath = wg.Dropdown(options=['None'],value='None',description='Model path:',disabled=False,layout=wg.Layout(width='400px',height='35px'))
-            self.tmp = [""]
             self.pkg_directory = "./packages"
-            for f in os.listdir(self.pkg_directory):
-                self.tmp.append(os.path.join(self.pkg_directory,f))
+            self.tmp = [""] + catalog.get_catalog(self.pkg_directory).packages()
             self._modelPath.options = self.tmp 
+            watcher.get_watcher(self.pkg_directory).subscribe(self._on_package_event)
             self._modelPath.disabled = False 
             self._pathing = wg.VBox([self._modelPath, self._selecter])  
         #buttons
@@ -55,6 +55,7 @@ class editMenu():
         Handles edit button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
         
@@ -92,11 +93,37 @@ class editMenu():
 
 
 
+    def _on_package_event(self, event):
+        """
+        Handles package and model changes published by the package watcher
+        """
+
+        if event.kind in [watcher.PACKAGE_ADDED, watcher.PACKAGE_REMOVED]:
+            watcher.refresh_options(self._modelPath, [""] + catalog.get_catalog(self.pkg_directory).packages())
+
+        elif event.kind == watcher.MODEL_CHANGED and self._modelPath.value and os.path.normpath(event.package) == os.path.normpath(self._modelPath.value):
+            models = catalog.get_catalog().models(self._modelPath.value)
+            self._paths.clear()
+            for f in models:
+                self._paths[f] = os.path.join(self._modelPath.value, 'crop2ml', f)
+            watcher.refresh_options(self._selecter, modelheader.options(self._modelPath.value, models))
+
+
+
+    def _unsubscribe(self):
+        """
+        Stops listening to the package watcher, the menu being closed
+        """
+
+        if not self.local:
+            watcher.get_watcher(self.pkg_directory).unsubscribe(self._on_package_event)
+
     def _eventCancel(self, b):
         """
         Handles cancel button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
         
@@ -118,13 +145,11 @@ class editMenu():
 
         self._paths.clear()
         tmp = []
-        for f in os.listdir(os.path.join(self._modelPath.value, 'crop2ml')):
-            split = f.split('.')
-            if all([split[-1] == 'xml', split[0] in ['unit','composition']]):
-                self._paths[f] = os.path.join(self._modelPath.value, 'crop2ml', f)
-                tmp.append(f)
+        for f in catalog.get_catalog().models(self._modelPath.value):
+            self._paths[f] = os.path.join(self._modelPath.value, 'crop2ml', f)
+            tmp.append(f)
         
-        self._selecter.options = tmp    
+        self._selecter.options = modelheader.options(self._modelPath.value, tmp)
         self._selecter.disabled = False
 
 
@@ -11,7 +11,7 @@ from pycrop2ml_ui.menus.edition import editmenu
 from pycrop2ml_ui.menus.setsmanagement import manageparamset
 from pycrop2ml_ui.menus.setsmanagement import managetestset
 
-from pycropml import pparse
+from pycrop2ml_ui.core import parsecache
 
 
 class editUnit():
@@ -152,13 +152,7 @@ class editUnit():
         Parses the xml file and calls _buildEdit method to order collected datas
         """
 
-        parse = os.path.split(self._datas['Path'])[0]
-        parsing = pparse.model_parser(parse)
-        
-        for j in parsing:
-            if j.name == self._datas['Model name']:
-                self._xmlfile = j
-                break
+        self._xmlfile = parsecache.parse_model(os.path.split(self._datas['Path'])[0], self._datas['Model name'])
 
         if self._xmlfile is None:
             self._out.clear_output()
@@ -2,16 +2,15 @@ import ipywidgets as wg
 import pandas as pd
 import qgrid
 import os
-from os import walk
 from path import Path
 from IPython.display import display
 from pycrop2ml_ui.browser.TkinterPath import getPath, getFile
 import tkinter as tk
 from tkinter.filedialog import askopenfilename
-from pycropml.topology import Topology
 from ipyfilechooser import FileChooser
 from . import visualization  
 from pycrop2ml_ui.model import MainMenu
+from pycrop2ml_ui.core import catalog, topocache, watcher, modelheader, simulation, ensemble, sweep, datafiles
 
 
 
@@ -58,6 +57,7 @@ class ExecutionMenu():
             self._load_connection = wg.Dropdown(options=['None'],value='None',description='Load file:',disabled=False,layout=wg.Layout(width='400px',height='57px'))
             self._load_params = wg.Dropdown(options=['None'],value='None',description='Load file:',disabled=False,layout=wg.Layout(width='400px',height='57px'))
             self._load_init = wg.Dropdown(options=['None'],value='None',description='Load file:',disabled=False,layout=wg.Layout(width='400px',height='57px'))
+            self._load_ensemble = wg.Dropdown(options=['None'],value='None',description='Run sets:',disabled=False,layout=wg.Layout(width='400px',height='57px'))
             self._modelPath = wg.Dropdown(options=['None'],value='None',description='Model path:',disabled=False,layout=wg.Layout(width='400px',height='57px'))
             self._dataPath = wg.Dropdown(options=['None'],value='None',description='Data path:',disabled=False,layout=wg.Layout(width='400px',height='57px'))
             self._pathing = wg.VBox([self._modelPath,  self._selecter])
@@ -65,16 +65,12 @@ class ExecutionMenu():
             self._pathing_data = wg.VBox([self._import,self._visualization], layout = wg.Layout(width='150',height='57px') )
             self._saveloadpa = self._save_params
             self._saveloadcon = self._save_connection
-            self.tmp = [""]
             self.pkg_directory = "./packages"
-            for f in os.listdir(self.pkg_directory):
-                self.tmp.append(os.path.join(self.pkg_directory,f))
+            self.tmp = [""] + catalog.get_catalog(self.pkg_directory).packages()
             self._modelPath.options = self.tmp 
+            watcher.get_watcher(self.pkg_directory).subscribe(self._on_package_event)
             self._modelPath.disabled = False 
-            datafiles = []
-            for (rep, subrep, files) in walk(os.path.join(self._modelPath.value, "data")):
-                for f in files:
-                    datafiles.append(os.path.join(rep, f))
+            datafiles = catalog.get_catalog().datafiles(self._modelPath.value)
             self._dataPath.options = datafiles    
             self._dataPath.disabled = False
            
@@ -91,6 +87,16 @@ class ExecutionMenu():
         self._disp_init = wg.Button(value=False,description='Initialization values',disabled=False, button_style='primary')
         self._disp_output_generation = wg.Button(value=False,description='Output generation',disabled=False, button_style='primary')
         self._disp_output_plot = wg.Button(value=False,description='Output plot',disabled=False, button_style='primary')        
+        self._disp_ensemble = wg.Button(value=False,description='Ensemble runs',disabled=False, button_style='primary')
+        self._ensemble_workers = wg.BoundedIntText(value=os.cpu_count() or 1, min=1, max=256, description='Workers:', disabled=False, layout=wg.Layout(width='200px'))
+        self._ensemble_progress = wg.IntProgress(value=0, min=0, max=1, description='Runs:', bar_style='info')
+        self._disp_sweep = wg.Button(value=False,description='Sensitivity sweep',disabled=False, button_style='primary')
+        self._run_sweep = wg.Button(value=False,description='Run sweep',disabled=False, button_style='success')
+        self._sweep_method = wg.Dropdown(options=sweep.METHODS, value='Latin hypercube', description='Sampling:', disabled=False, layout=wg.Layout(width='300px'))
+        self._sweep_size = wg.BoundedIntText(value=100, min=1, max=1000000, description='Size:', disabled=False, layout=wg.Layout(width='200px'))
+        self._sweep_seed = wg.IntText(value=0, description='Seed:', disabled=False, layout=wg.Layout(width='200px'))
+        self._sweep_outputs = wg.SelectMultiple(options=[], description='Outputs:', disabled=False, layout=wg.Layout(width='300px'))
+        self._sweep_aggregate = wg.Dropdown(options=sweep.AGGREGATES, value='last', description='Aggregate:', disabled=False, layout=wg.Layout(width='300px'))
         self.variables = []
         self.datacolumns = []
         self.parameters = []
@@ -120,7 +126,8 @@ class ExecutionMenu():
         self._disp_Parameters.disabled=False
         pkgPath = self._modelPath.value
         pkgName = self._modelPath.value.split(os.path.sep)[-1]
-        T = Topology(name=pkgName, pkg=pkgPath)
+        T = topocache.get_topology(pkgPath, pkgName)
+        self._disp_sweep.disabled = False
         self.parameters = []
         self.variables = []
         self.stateInit = []
@@ -133,8 +140,8 @@ class ExecutionMenu():
                 self.stateInit.append({"name":inp.name, "value":''})
         for out in T.model.outputs:
             self.outputs.append(out.name)
-        df = pd.read_csv(self._dataPath.value, delimiter=";")
-        datacolumns = list(df.columns.values)
+        self._sweepBounds = sweep.parameter_bounds(T.model.inputs)
+        datacolumns = datafiles.columns(self._dataPath.value)
 
         self._dfVarData = pd.DataFrame(data={
                 'Variables': self.variables,
@@ -154,10 +161,7 @@ class ExecutionMenu():
         else: self._load_connection.observe(self._on_value_change_con, names='value')
     
     def _on_value_change_con(self, change):
-        datafiles = [""]
-        for (rep, subrep, files) in walk(os.path.join(self._modelPath.value, "data")):
-            for f in files:
-                datafiles.append(os.path.join(rep, f))
+        datafiles = [""] + catalog.get_catalog().datafiles(self._modelPath.value)
         self._load_connection.options = datafiles  
         self._datamodelconnection = pd.read_csv(self._load_connection.value, sep=";")
         for nrow in range(0, self._datamodelconnection.shape[0]):
@@ -165,10 +169,7 @@ class ExecutionMenu():
             self._dfVarDataqgrid.edit_cell(nrow,"Data columns", self._datamodelconnection["Data columns"][nrow])
 
     def _on_value_change_par(self, change):
-        datafiles = [""]
-        for (rep, subrep, files) in walk(os.path.join(self._modelPath.value, "data")):
-            for f in files:
-                datafiles.append(os.path.join(rep, f)) 
+        datafiles = [""] + catalog.get_catalog().datafiles(self._modelPath.value) 
         self._load_params.options = datafiles 
         self.params = pd.read_csv(self._load_params.value, sep=";")
         for nrow in range(0, self.params.shape[0]):
@@ -176,10 +177,7 @@ class ExecutionMenu():
             self._dfParamqgrid.edit_cell(nrow,"value", self.params["value"][nrow])  
               
     def _on_value_change_init(self, change):
-        datafiles = [""]
-        for (rep, subrep, files) in walk(os.path.join(self._modelPath.value, "data")):
-            for f in files:
-                datafiles.append(os.path.join(rep, f)) 
+        datafiles = [""] + catalog.get_catalog().datafiles(self._modelPath.value) 
         self._load_init.options = datafiles 
         self._initvalues = pd.read_csv(self._load_init.value, sep=";")
         for nrow in range(0, self._initvalues.shape[0]):
@@ -212,8 +210,14 @@ class ExecutionMenu():
             z.overflow_x = 'auto'
             display(z)
             display(self._disp_output_generation)
+            if self.local == True: display(wg.HBox([self._disp_ensemble, self._ensemble_workers]))
+            else: display(wg.HBox([self._load_ensemble, self._disp_ensemble, self._ensemble_workers]))
+            display(self._disp_sweep)
             self._disp_init.disabled = True
         self._disp_output_generation.on_click(self._event_simulation)
+        self._disp_ensemble.on_click(self._event_ensemble)
+        self._disp_sweep.on_click(self._event_sweep, remove=True)
+        self._disp_sweep.on_click(self._event_sweep)
         self._save_init.on_click(self._event_save_init)
         if self.local==True: self._load_init.on_click(self._event_load_init)
         else: self._load_init.observe(self._on_value_change_init, names='value')
@@ -221,7 +225,7 @@ class ExecutionMenu():
     def _event_save_init(self, b):
         self._initvalues =  self._dfInitqgrid.get_changed_df()
         self._initvalues.reset_index(inplace=True)
-        self._initvalues.to_csv(os.path.join(os.path.dirname(self._dataPath.value),"initvalues.csv"), sep=";" , index=False)
+        self._initvalues.to_csv(os.path.join(os.path.dirname(self._dataPath.value),simulation.INITVALUES), sep=";" , index=False)
     
     def _event_load_init(self, b):
         self._initfile = getFile()
@@ -239,7 +243,7 @@ class ExecutionMenu():
     def _event_save_connection(self, b):
         self._datamodelconnection = self._dfVarDataqgrid.get_changed_df()
         self._datamodelconnection.reset_index(inplace=True)
-        self._datamodelconnection.to_csv(os.path.join(os.path.dirname(self._dataPath.value),"datamodel.csv"), sep=";", index=False )
+        self._datamodelconnection.to_csv(os.path.join(os.path.dirname(self._dataPath.value),simulation.DATAMODEL), sep=";", index=False )
     
     def _event_load_connection(self, b):
         self._datamodelfile = getFile()
@@ -260,7 +264,7 @@ class ExecutionMenu():
         self._newdfParamqgrid.reset_index(inplace=True)
         self.params = pd.DataFrame({"name": [n for n in self._newdfParamqgrid["name"]],
                                     "value":[v for v in self._newdfParamqgrid["value"]]})
-        self.params.to_csv(os.path.join(os.path.dirname(self._dataPath.value),"parameters.csv"), sep=";", index=False )
+        self.params.to_csv(os.path.join(os.path.dirname(self._dataPath.value),simulation.PARAMETERS), sep=";", index=False )
         
     def _event_load_params(self, b):
         self._paramsfile = getFile()
@@ -276,28 +280,117 @@ class ExecutionMenu():
                 self._dfParamqgrid.edit_cell(nrow,"value", self.params["value"][nrow])
 
     def _event_simulation(self, b):
-        import pip._internal as pip
-        import importlib
-        """def install(package, model):
-            try:
-                return importlib.import_module(".simulation",model)
-            except ImportError:
-                pip.main(['install', package])
-            return importlib.import_module(".simulation",model)"""
-
-        package = self._modelPath.value + os.path.sep + "src" + os.path.sep + "py"
-        model = self._modelPath.value.split(os.path.sep)[-1]
-        import sys
-        sys.path.append(package)
-        module = importlib.import_module(".simulation", model)
-        #module = install(package, model)
-        #module = importlib.import_module(".simulation",model)
-        self.res = module.simulation(self._dataPath.value,self._datamodelconnection,self.params,self._initvalues)
+        self.res = simulation.get_pool().run(self._modelPath.value, self._dataPath.value, self._datamodelconnection, self.params, self._initvalues)
         self._out2.clear_output()
         with self._out:
             display(self._disp_output_plot)
         self._disp_output_plot.on_click(self._event_plot)
 
+    def _baseParameters(self):
+        """
+        Returns the name/value parameter table edited in the parameter grid
+        """
+
+        if '_dfParamqgrid' in dir(self):
+            return self._dfParamqgrid.get_changed_df()[['name', 'value']]
+        return pd.DataFrame(self.parameters, columns=['name', 'value'])
+
+    def _event_ensemble(self, b):
+        """
+        Handles ensemble runs button on_click event.
+
+        The run sets file is a csv file (sep=';') with one row per run and one column per
+        parameter to change, an optional 'run' column giving the run ids. Every other
+        parameter keeps the value of the parameter grid.
+        """
+
+        self._out2.clear_output()
+        runfile = getFile() if self.local == True else self._load_ensemble.value
+        if not runfile or runfile.split(".")[-1] != "csv":
+            with self._out2:
+                print('This data file is not the required data format.')
+            return
+
+        paramsets = pd.read_csv(runfile, sep=";")
+        if 'run' in paramsets.columns:
+            paramsets = paramsets.set_index('run')
+
+        self._ensemble_progress.value = 0
+        self._ensemble_progress.max = max(len(paramsets), 1)
+        with self._out2:
+            display(self._ensemble_progress)
+
+        def progress(run, done, total):
+            self._ensemble_progress.value = done
+
+        try:
+            self.res, errors = ensemble.run_ensemble(self._modelPath.value, self._dataPath.value, paramsets, self._baseParameters(),
+                                                     self._datamodelconnection, self._initvalues, workers=self._ensemble_workers.value, callback=progress)
+        except Exception as e:
+            with self._out2:
+                print(e)
+            return
+
+        with self._out2:
+            print('{} runs done, {} failed.'.format(len(paramsets) - len(errors), len(errors)))
+            for run, error in errors.items():
+                print('\nRun {} failed :\n{}'.format(run, error))
+            display(qgrid.show_grid(self.res.reset_index(), grid_options={'forceFitColumns': False, 'defaultColumnWidth': 100, 'editable':False, 'sortable':True}, show_toolbar=False))
+
+    def _event_sweep(self, b):
+        """
+        Handles sensitivity sweep button on_click event
+        """
+
+        self._sweepqgrid = qgrid.show_grid(self._sweepBounds, grid_options={'forceFitColumns': False, 'defaultColumnWidth': 120, 'editable':True, 'sortable':False}, show_toolbar=False)
+        self._sweep_outputs.options = list(dict.fromkeys(self.outputs))
+        self._disp_sweep.disabled = True
+        with self._out:
+            display(wg.VBox([self._sweepqgrid,
+                             wg.HBox([self._sweep_method, self._sweep_size, self._sweep_seed]),
+                             wg.HBox([self._sweep_outputs, self._sweep_aggregate]),
+                             wg.HBox([self._run_sweep, self._ensemble_workers])]))
+        self._run_sweep.on_click(self._event_run_sweep, remove=True)
+        self._run_sweep.on_click(self._event_run_sweep)
+
+    def _event_run_sweep(self, b):
+        """
+        Handles run sweep button on_click event.
+
+        Samples the parameters checked in the Sweep column between their min and max, runs
+        the simulations in parallel and displays the sensitivity indices of the selected
+        outputs, aggregated over each simulation.
+        """
+
+        self._out2.clear_output()
+        self._sweepBounds = self._sweepqgrid.get_changed_df()
+        bounds = self._sweepBounds[self._sweepBounds['Sweep'].astype(bool)]
+
+        def progress(run, done, total):
+            self._ensemble_progress.max = total
+            self._ensemble_progress.value = done
+
+        self._ensemble_progress.value = 0
+        with self._out2:
+            display(self._ensemble_progress)
+
+        try:
+            self.sweep = sweep.run_sweep(self._modelPath.value, self._dataPath.value, bounds, self._baseParameters(), list(self._sweep_outputs.value),
+                                         method=self._sweep_method.value, size=self._sweep_size.value, how=self._sweep_aggregate.value,
+                                         seed=self._sweep_seed.value, datamodel=self._datamodelconnection, initvalues=self._initvalues,
+                                         workers=self._ensemble_workers.value, callback=progress)
+        except Exception as e:
+            with self._out2:
+                print(e)
+            return
+
+        with self._out2:
+            print('{} runs done, {} failed.'.format(len(self.sweep['Samples']) - len(self.sweep['Errors']), len(self.sweep['Errors'])))
+            if self.sweep['Indices'] is None:
+                print('Not enough successful runs to compute the sensitivity indices.')
+            else:
+                display(qgrid.show_grid(self.sweep['Indices'].reset_index(), grid_options={'forceFitColumns': False, 'defaultColumnWidth': 100, 'editable':False, 'sortable':True}, show_toolbar=False))
+
     def _event_plot(self, b):
         self._out2.clear_output()
         display(self._out2)
@@ -315,6 +408,7 @@ class ExecutionMenu():
             with open(os.path.join(datarep,name), 'wb') as file: 
                 file.write(file_info['content'])
                 tmp.append(os.path.join(datarep,name))
+        catalog.invalidate(datarep)
         self._dataPath.options = tmp 
         self._dataPath.disabled = False 
  
@@ -368,7 +462,7 @@ class ExecutionMenu():
         def displayMenu_vis():
             from copy import copy
             self._out2.clear_output()
-            df = pd.read_csv(self._dataPath.value, delimiter=";", index_col=0)
+            df = datafiles.read(self._dataPath.value, index_col=0)
             self._qgridIn = qgrid.show_grid(df,grid_options={'forceFitColumns': False, 'defaultColumnWidth': 100, 'editable':False, 'sortable':False}, show_toolbar=False)
             tab = wg.Tab()
             tab.children = [self._qgridIn]
@@ -405,31 +499,61 @@ class ExecutionMenu():
         global g, h
         self._paths.clear()
         self.tmp = []
-        for f in os.listdir(self._modelPath.value+os.path.sep+'crop2ml'):
-            split = f.split('.')
-            if all([split[-1] == 'xml', split[0] =='composition']):
-                self._paths[f] = self._modelPath.value+os.path.sep+'crop2ml'+os.path.sep+f
-                self.tmp.append(f)
-        self._selecter.options = self.tmp    
+        for f in catalog.get_catalog().models(self._modelPath.value, types=('composition',)):
+            self._paths[f] = self._modelPath.value+os.path.sep+'crop2ml'+os.path.sep+f
+            self.tmp.append(f)
+        self._selecter.options = modelheader.options(self._modelPath.value, self.tmp)
         self._selecter.disabled = False
         g = self.tmp
         datafiles = [""]
         if self.local == False:
-            for (rep, subrep, files) in walk(os.path.join(self._modelPath.value, "data")):
-                for f in files:
-                    datafiles.append(os.path.join(rep, f))
+            datafiles += catalog.get_catalog().datafiles(self._modelPath.value)
             self._dataPath.options = datafiles 
             self._load_connection.options = datafiles  
             self._load_params.options = datafiles 
             self._load_init.options = datafiles   
+            self._load_ensemble.options = datafiles
             self._dataPath.disabled = False
             h = datafiles
 
+    def _on_package_event(self, event):
+        """
+        Handles package, model and data changes published by the package watcher
+        """
+
+        if event.kind in [watcher.PACKAGE_ADDED, watcher.PACKAGE_REMOVED]:
+            watcher.refresh_options(self._modelPath, [""] + catalog.get_catalog(self.pkg_directory).packages())
+            return
+
+        if not self._modelPath.value or os.path.normpath(event.package) != os.path.normpath(self._modelPath.value):
+            return
+
+        if event.kind == watcher.MODEL_CHANGED:
+            self.tmp = catalog.get_catalog().models(self._modelPath.value, types=('composition',))
+            self._paths.clear()
+            for f in self.tmp:
+                self._paths[f] = self._modelPath.value+os.path.sep+'crop2ml'+os.path.sep+f
+            watcher.refresh_options(self._selecter, modelheader.options(self._modelPath.value, self.tmp))
+
+        elif event.kind == watcher.DATA_CHANGED:
+            datafiles = [""] + catalog.get_catalog().datafiles(self._modelPath.value)
+            for w in [self._dataPath, self._load_connection, self._load_params, self._load_init, self._load_ensemble]:
+                watcher.refresh_options(w, datafiles)
+
+    def _unsubscribe(self):
+        """
+        Stops listening to the package watcher, the menu being closed
+        """
+
+        if not self.local:
+            watcher.get_watcher(self.pkg_directory).unsubscribe(self._on_package_event)
+
     def _eventCancel(self, b):
         """
         Handles cancel button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
         
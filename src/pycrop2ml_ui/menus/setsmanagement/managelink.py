@@ -5,8 +5,7 @@ import pandas
 import qgrid
 from IPython.display import display
 
-from pycropml import pparse
-from pycropml.composition import model_parser
+from pycrop2ml_ui.core import portindex
 from pycrop2ml_ui.menus.writeXML import writecompositionxml
 
 
@@ -69,39 +68,21 @@ class manageLink():
         self._listLinkSource = ['']
         self._listLinkTarget = ['']
       
-        parse = os.path.split(self._datas['Path'])[0]
-        parsing = pparse.model_parser(parse)
-
-        for i in parsing:
-            if 'unit.{}.xml'.format(i.name) in self._listmodel: 
-                for j in i.inputs:
-                    self._listLinkTarget.append('{}.{}'.format(i.name, j.name))
-
-                for k in i.outputs:
-                    self._listLinkSource.append('{}.{}'.format(i.name, k.name))
+        path = os.path.split(self._datas['Path'])[0]
 
         for model in self._listmodel:
             if ':' in model:
-                pkgname, model_attr = model.split(':')
-                model_attr = model_attr.split('.')
-                path, = [i for i in self._listextpkg if pkgname in os.path.split(i)[1]]
-
-                if model_attr[0] == 'composition':
-                    pkg, = model_parser(path+os.path.sep+'crop2ml'+os.path.sep+'composition.{}.xml'.format(model_attr[1]))
-                    for j in pkg.inputs:
-                        self._listLinkTarget.append('{}.{}'.format(model_attr[1], j))
-                    for k in pkg.outputs:
-                        self._listLinkSource.append('{}.{}'.format(model_attr[1], k))
-                
-                else:
-                    pkg = pparse.model_parser(path)
-                    for m in pkg:
-                        if m.name == model_attr[1]:
-                            for y in m.inputs:
-                                self._listLinkTarget.append('{}.{}'.format(model_attr[1], y.name))
-                            for z in m.outputs:
-                                self._listLinkSource.append('{}.{}'.format(model_attr[1], z.name))
-                            break
+                pkgname, filename = model.split(':')
+                pkg, = [i for i in self._listextpkg if pkgname in os.path.split(i)[1]]
+            else:
+                pkg, filename = path, model
+
+            name = filename.split('.')[1]
+            inputs, outputs = portindex.model_ports(pkg, filename)
+            for j in inputs:
+                self._listLinkTarget.append('{}.{}'.format(name, j))
+            for k in outputs:
+                self._listLinkSource.append('{}.{}'.format(name, k))
 
 
         if self._iscreate:
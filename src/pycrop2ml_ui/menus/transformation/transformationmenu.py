@@ -1,10 +1,12 @@
 import os
+import threading
 import ipywidgets as wg
+import qgrid
 from IPython.display import display
 
 from pycrop2ml_ui.model import MainMenu
 from pycrop2ml_ui.browser.TkinterPath import getPath
-from pycropml.cyml import transpile_package
+from pycrop2ml_ui.core import catalog, watcher, transpiler, jobs, timings, store
 
 
 class transformationMenu():
@@ -28,13 +30,14 @@ class transformationMenu():
             self._pathing = wg.HBox([self._path, self._browse])
         else:
             self._path = wg.Dropdown(options=['None'],value='None',description='Path:',disabled=False,layout=wg.Layout(width='400px',height='35px'))
-            self.tmp = []
             self.pkg_directory = "./packages"
-            for f in os.listdir(self.pkg_directory):
-                self.tmp.append(os.path.join(self.pkg_directory,f))
+            self.tmp = catalog.get_catalog(self.pkg_directory).packages()
             self._path.options = self.tmp 
+            watcher.get_watcher(self.pkg_directory).subscribe(self._on_package_event)
             self._path.disabled = False 
-            self._pathing = self._path 
+            self._bulk = wg.Checkbox(value=False, description='Bulk mode', disabled=False)
+            self._selection = wg.SelectMultiple(options=self.tmp, value=(), rows=6, description='Packages:', disabled=True, layout=wg.Layout(width='400px'))
+            self._pathing = wg.VBox([self._path, self._bulk, self._selection])
             
         self._java = wg.Checkbox(value=False, description='Java', disabled=False)
         self._csharp = wg.Checkbox(value=False, description='CSharp', disabled=False)
@@ -50,9 +53,19 @@ class transformationMenu():
         self._stics = wg.Checkbox(value=False, description='Stics', disabled=False)
         self._apsim = wg.Checkbox(value=False, description='Apsim', disabled=False)
 
-        self._displayer = wg.VBox([wg.HTML(value='<font size="5"><b>Model transformation</b></font>'), self._pathing, wg.HBox([wg.VBox([self._java, self._csharp, self._fortran, self._python, self._r, self._cpp]),wg.VBox([self._simplace, self._bioma, self._dssat, self._openalea, self._record, self._stics, self._apsim])]), wg.HBox([self._apply, self._cancel])], layout=wg.Layout(align_items='center'))
+        self._workers = wg.BoundedIntText(value=1, min=1, max=len(transpiler.LANGUAGES), description='Workers:', disabled=False, layout=wg.Layout(width='200px'))
+        self._incremental = wg.Checkbox(value=True, description='Skip unchanged languages', disabled=False)
+        self._profile = wg.Checkbox(value=False, description='Timing report', disabled=False)
+
+        self._displayer = wg.VBox([wg.HTML(value='<font size="5"><b>Model transformation</b></font>'), self._pathing, wg.HBox([wg.VBox([self._java, self._csharp, self._fortran, self._python, self._r, self._cpp]),wg.VBox([self._simplace, self._bioma, self._dssat, self._openalea, self._record, self._stics, self._apsim])]), wg.HBox([self._workers, self._incremental, self._profile]), wg.HBox([self._apply, self._cancel])], layout=wg.Layout(align_items='center'))
 
         self._listlanguage = []
+        self._listpackage = []
+
+        self._job = None
+        self._stop = wg.Button(value=False,description='Cancel',disabled=True,button_style='danger')
+        self._elapsed = wg.Label(value='')
+        self._bars = dict() # {language: (IntProgress, Label)}
 
 
 
@@ -63,7 +76,12 @@ class transformationMenu():
 
         self._out2.clear_output()
 
-        if not self._path.value:
+        if self.local == False and self._bulk.value:
+            self._listpackage = list(self._selection.value) or catalog.get_catalog(self.pkg_directory).packages()
+        else:
+            self._listpackage = [self._path.value] if self._path.value else []
+
+        if not self._listpackage:
             with self._out2:
                 print('You must give a package path.')
         else:
@@ -101,19 +119,94 @@ class transformationMenu():
                     print('You must give at least one target language to transform in.')
             
             else:
-                for lg in self._listlanguage:
-                    try:
-                        transpile_package(self._path.value, lg)
-                    except:
-                        #self._out.clear_output()
-                        with self._out:
-                            raise Exception('Critical error while transpiling the package {} into {}.'.format(self._path.value, lg))
-
-                self._out.clear_output()
-                self._out2.clear_output()
-                
-        with self._out:
-            display(self._displayer)
+                self._startJob()
+
+
+
+    def _startJob(self):
+        """
+        Starts the transpilation of the packages in the background and displays its progress
+        """
+
+        self._job = jobs.TranspileJob(self._listpackage, list(self._listlanguage), workers=self._workers.value, incremental=self._incremental.value, profile=self._profile.value, store=store.get_store())
+        self._job.subscribe(self._on_job_event)
+
+        self._bars = dict()
+        rows = []
+        for lg in self._listlanguage:
+            self._bars[lg] = (wg.IntProgress(value=0, min=0, max=len(self._listpackage), description=lg, bar_style='info'), wg.Label(value=jobs.PENDING))
+            rows.append(wg.HBox(self._bars[lg]))
+
+        self._apply.disabled = True
+        self._stop.disabled = False
+        self._elapsed.value = 'Elapsed : 0.0 s'
+
+        with self._out2:
+            display(wg.VBox(rows + [wg.HBox([self._elapsed, self._stop])]))
+
+        self._job.start()
+        threading.Thread(target=self._tick, args=(self._job,), daemon=True).start()
+
+
+
+    def _tick(self, job):
+        """
+        Updates the elapsed time label while job is running
+        """
+
+        while not job.future.done():
+            self._elapsed.value = 'Elapsed : {:.1f} s'.format(job.elapsed())
+            try:
+                job.wait(0.5)
+            except Exception:
+                pass
+        self._elapsed.value = 'Elapsed : {:.1f} s'.format(job.elapsed())
+
+
+
+    def _on_job_event(self, job, task):
+        """
+        Handles the state changes of the transpilation job
+        """
+
+        if job is not self._job:
+            return
+
+        if task is not None:
+            lg = task[1]
+            bar, label = self._bars[lg]
+            states = [job.states[(path, lg)] for path in job.packages]
+            done = [s for s in states if s not in (jobs.PENDING, jobs.RUNNING)]
+            bar.value = len(done)
+            bar.bar_style = 'danger' if 'failure' in done else 'warning' if 'cancelled' in done else 'success' if len(done) == len(states) else 'info'
+            if len(states) == 1:
+                label.value = states[0] if task not in job.results else '{} ({:.1f} s, {} files changed)'.format(states[0], job.results[task]['Duration'], job.results[task]['Changed'])
+            else:
+                label.value = '{}/{} done, {} running, {} failed'.format(len(done), len(states), states.count(jobs.RUNNING), done.count('failure'))
+            return
+
+        self._apply.disabled = False
+        self._stop.disabled = True
+
+        results = job.wait()
+        if len(job.packages) > 1:
+            self._out2.append_display_data(transpiler.summary(results))
+        if job.profile:
+            self._out2.append_display_data(qgrid.show_grid(timings.table(results), show_toolbar=False))
+        for r in results:
+            if r['Status'] == 'failure':
+                self._out2.append_stdout('\nCritical error while transpiling the package {} into {} :\n{}'.format(r['Package'], r['Language'], r['Error']))
+
+
+
+    def _eventStop(self, b):
+        """
+        Handles cancel button on_click event : cancels the running transpilation
+        """
+
+        if self._job is not None and self._job.running():
+            self._stop.disabled = True
+            self._job.cancel()
 
 
 
@@ -132,11 +225,49 @@ class transformationMenu():
 
 
 
+    def _on_package_event(self, event):
+        """
+        Handles package additions and removals published by the package watcher
+        """
+
+        if event.kind in [watcher.PACKAGE_ADDED, watcher.PACKAGE_REMOVED]:
+            packages = catalog.get_catalog(self.pkg_directory).packages()
+            watcher.refresh_options(self._path, packages)
+            if list(self._selection.options) != packages:
+                selected = tuple(p for p in self._selection.value if p in packages)
+                self._selection.options = packages
+                self._selection.value = selected
+
+
+
+    def _eventBulk(self, change):
+        """
+        Handles bulk mode checkbox on_change event.
+
+        In bulk mode the workers are shared by every (package, language) task, so their
+        limit follows the number of processors instead of the number of languages.
+        """
+
+        self._selection.disabled = not change['new']
+        self._path.disabled = change['new']
+        self._workers.max = 4 * (os.cpu_count() or 1) if change['new'] else len(transpiler.LANGUAGES)
+
+
+
+    def _unsubscribe(self):
+        """
+        Stops listening to the package watcher, the menu being closed
+        """
+
+        if not self.local:
+            watcher.get_watcher(self.pkg_directory).unsubscribe(self._on_package_event)
+
     def _eventCancel(self, b):
         """
         Handles cancel button on_click event
         """
 
+        self._unsubscribe()
         self._out.clear_output()
         self._out2.clear_output()
 
@@ -164,5 +295,7 @@ class transformationMenu():
             display(self._displayer)
 
         self._apply.on_click(self._eventApply)
+        self._stop.on_click(self._eventStop)
         self._cancel.on_click(self._eventCancel)
         if self.local==True: self._browse.on_click(self._eventBrowse)
+        else: self._bulk.observe(self._eventBulk, names='value')
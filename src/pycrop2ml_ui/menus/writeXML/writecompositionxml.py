@@ -1,5 +1,7 @@
 import os
 
+from pycrop2ml_ui.core import catalog
+
 class writecompositionXML():
     """
     Class managing the writing of a composition model xml file with all gathered data with pycrop2ml' user interface.
@@ -72,6 +74,8 @@ class writecompositionXML():
         except IOError as ioerr:
             raise Exception('File {} could not be opened in write mode. {}'.format(self._datas['Path'], ioerr))
 
+        catalog.invalidate(self._datas['Path'])
+
 
         """if all([not self._iscreate, self._datas['Model name'] != self._datas['Old name']]):
             os.remove('{}{}composition.{}.xml'.format(self._datas['Path'], os.path.sep, self._datas['Old name']))"""
\ No newline at end of file
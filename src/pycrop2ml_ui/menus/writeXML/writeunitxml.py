@@ -3,9 +3,10 @@ import os
 import ipywidgets as wg
 from IPython.display import display
 
-from pycropml.pparse import model_parser
 from pycropml.transpiler.generators import docGenerator
 
+from pycrop2ml_ui.core import catalog, parsecache
+
 
 class writeunitXML():
     """
@@ -70,21 +71,14 @@ class writeunitXML():
         Returns the documentation of the current's model xml file
         """
 
-        parse = os.path.split(self._datas['Path'])[0]
-        parsing = model_parser(parse)
-        index = None
-
-        for j in range(0,len(parsing)):
-            if parsing[j].name == self._datas['Model name']:
-                index = j
-                break
+        model = parsecache.parse_model(os.path.split(self._datas['Path'])[0], self._datas['Model name'])
 
-        if index is None:
+        if model is None:
             f.close()
             with self._out:
                 raise Exception('Critical error : model not found.')
         
-        return docGenerator.DocGenerator(parsing[index])
+        return docGenerator.DocGenerator(model)
 
 
 
@@ -242,6 +236,7 @@ class writeunitXML():
             with self._out:
                 raise Exception('File unit.{}.xml could not be opened. {}'.format(self._datas['Model name'], ioerr))
 
+        catalog.invalidate(self._datas['Path'])
 
         if ('init' in dir(self._df) and self._df['init']) or (self._change_init):
             self._createInit()
@@ -13,6 +13,8 @@ from pycrop2ml_ui.menus.transformation import transformationmenu
 from pycrop2ml_ui.menus.display.displaymenu import displayMenu
 from pycrop2ml_ui.menus.execution import executionmenu
 from pycrop2ml_ui.menus.download import downloadmenu
+from pycrop2ml_ui.core import catalog
+from pycrop2ml_ui.core.warmup import start_warmup, get_warmup
 
 
 class mainMenu():
@@ -61,10 +63,19 @@ class mainMenu():
             self._mkdir = wg.Button(value=False,description='Package creation',disabled=False,layout=self._layout_thin)
             self._disabled = [self._create, self._edit, self._transformation, self._execution, self._display, self._download]
             self.pkg_directory = "./packages"
-            if not os.path.isdir(self.pkg_directory) or not os.listdir(self.pkg_directory):
+            if not catalog.get_catalog(self.pkg_directory).packages():
                 for w in self._disabled:
                     w.disabled = True
+            self._progress = wg.IntProgress(value=0, min=0, max=1, description='Loading:', bar_style='info', layout=wg.Layout(width='300px'))
+            warmup = get_warmup()
+            if warmup is not None and warmup.running():
+                self._progress.max = max(warmup.total, 1)
+                self._progress.value = warmup.done
+                warmup.subscribe(self._on_warmup_progress)
+            else:
+                self._progress.layout.display = 'none'
             self._displayer = wg.VBox([wg.HTML(value='<font size="5"><b>Model manager for Pycrop2ml</b></font>'),
+                                       self._progress,
                                        wg.HBox([self._mkdir, self._import]),
                                        self._create,
                                        self._edit,
@@ -91,6 +102,17 @@ class mainMenu():
         self._out = wg.Output()
         self._out2 = wg.Output()
 
+    def _on_warmup_progress(self, done, total, pkg, error):
+        """
+        Updates the package loading progress bar
+        """
+
+        self._progress.max = max(total, 1)
+        self._progress.value = done
+        self._progress.description = '{}/{}'.format(done, total)
+        if done >= total:
+            self._progress.bar_style = 'warning' if get_warmup().errors else 'success'
+
     def _eventMkdir(self, b):
         """
         Displays package creation menu
@@ -117,6 +139,7 @@ class mainMenu():
         v = event.owner.value
         with ZipFile(BytesIO(v[list(v.keys())[0]]['content'])) as zip:
             zip.extractall(self.pkg_directory)
+        catalog.invalidate(self.pkg_directory)
 
         for w in self._disabled:
             w.disabled = False
@@ -262,7 +285,16 @@ class mainMenu():
         self._about.on_click(self._eventAbout)
         
 
-def main(local=True):
+def main(local=True, warmup=False, workers=None):
+    """
+    Displays pycrop2ml's user interface.
+
+    In server mode (local=False), warmup=True parses every package of ./packages in
+    a pool of at most workers processes while the main menu is already usable.
+    """
+
+    if not local and warmup:
+        start_warmup("./packages", workers)
 
     output = mainMenu(local)
     output.displayMenu()
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+
+def _write_files(root, files):
+    """
+    Writes files {relative path: content} under root and returns root
+    """
+
+    root = str(root)
+    for rel, content in files.items():
+        full = os.path.join(root, *rel.split('/'))
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'w', encoding='utf8') as f:
+            f.write(content)
+    return root
+
+
+@pytest.fixture
+def write_files():
+    """
+    Returns the function writing files {relative path: content} under a root directory and
+    returning its path
+    """
+
+    return _write_files
+
+
+@pytest.fixture
+def rendered(tmp_path):
+    """
+    Returns the function writing a rendered copy of the package Pkg, holding src and test
+    trees, under the directory name of tmp_path and returning its path
+    """
+
+    def write(name='shadow', content='a = 1'):
+        return _write_files(tmp_path / name / 'Pkg', {'crop2ml/unit.a.xml': '<a/>', 'src/py/Pkg/a.py': content, 'test/py/test_a.py': ''})
+
+    return write
+
+
+@pytest.fixture
+def write_model():
+    """
+    Returns the function writing the package name under a root directory with a generated
+    simulation module returning factor, imported absolutely or relatively, and returning its
+    path
+    """
+
+    def write(root, name, factor, absolute=False):
+        imported = 'from {}.factor import FACTOR\n'.format(name) if absolute else 'from .factor import FACTOR\n'
+        return _write_files(os.path.join(str(root), name), {
+            'src/py/{}/__init__.py'.format(name): '',
+            'src/py/{}/factor.py'.format(name): 'FACTOR = {}\n'.format(factor),
+            'src/py/{}/simulation.py'.format(name): imported + 'def simulation(datafile, datamodel, params, initvalues):\n    return FACTOR\n'})
+
+    return write
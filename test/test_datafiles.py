@@ -0,0 +1,95 @@
+import os
+import types
+
+import pytest
+
+pytest.importorskip('pycropml')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from pycrop2ml_ui.core import catalog, datafiles
+
+
+@pytest.fixture
+def datafile(tmp_path, write_files):
+    """
+    Returns the path of a data file of a package, with a text column holding a missing value
+    """
+
+    write_files(tmp_path / 'Pkg', {'data/weather.csv': 'day;tmin;site\n1;2.5;a\n2;;\n3;4.0;c\n'})
+    return str(tmp_path / 'Pkg' / 'data' / 'weather.csv')
+
+
+def test_read_matches_read_csv(datafile):
+    df = datafiles.read(datafile)
+    pd.testing.assert_frame_equal(df, pd.read_csv(datafile, sep=';'))
+    assert pd.isna(df['site'][1])
+    assert os.path.isdir(os.path.join(os.path.dirname(os.path.dirname(datafile)), catalog.CACHE_DIRECTORY, 'data'))
+    pd.testing.assert_frame_equal(datafiles.read(datafile, index_col=0), pd.read_csv(datafile, sep=';', index_col=0))
+
+
+def test_bool_column_with_missing_values(tmp_path, write_files):
+    path = os.path.join(write_files(tmp_path, {'flags.csv': 'a;b;c\nTrue;1;x\n;2;\nFalse;3;y\n'}), 'flags.csv')
+    df = datafiles.read(path)
+    pd.testing.assert_frame_equal(df, pd.read_csv(path, sep=';'))
+    assert [type(v) for v in df['a']] == [bool, float, bool]
+
+
+def reader():
+    """
+    Returns a module reading data files the way the generated simulation code does
+    """
+
+    module = types.ModuleType('simulation')
+    exec('import pandas as pd\nfrom pandas import read_csv\n\n'
+         'def simulation(path, **kwargs):\n    return pd.read_csv(path, **kwargs)\n\n'
+         'def direct(path, **kwargs):\n    return read_csv(path, **kwargs)\n', vars(module))
+    return module
+
+
+def test_read_only_package(datafile, monkeypatch):
+    def failing(*args, **kwargs):
+        raise PermissionError('read-only package')
+
+    monkeypatch.setattr(datafiles.tempfile, 'mkdtemp', failing)
+    pd.testing.assert_frame_equal(datafiles.read(datafile), pd.read_csv(datafile, sep=';'))
+    module = reader()
+    with datafiles.cached_reads(datafile, module):
+        assert module.pd is pd
+
+
+def test_cached_reads(datafile, tmp_path, monkeypatch, write_files):
+    other = os.path.join(write_files(tmp_path, {'other.csv': 'a,b\n1,2\n'}), 'other.csv')
+    read_csv = pd.read_csv
+    parsed = []
+
+    def parse(*args, **kwargs):
+        parsed.append(args[0])
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_csv', parse)
+    module = reader()
+    module.read_csv = parse
+    with datafiles.cached_reads(datafile, module):
+        with datafiles.cached_reads(datafile, module):
+            df = module.simulation(datafile, sep=';', index_col=0)
+        pd.testing.assert_frame_equal(module.direct(datafile, sep=';'), read_csv(datafile, sep=';'))
+        assert list(module.simulation(other).columns) == ['a', 'b']
+        module.simulation(datafile, sep=';', usecols=['day'])
+        assert pd.read_csv is parse
+        pd.read_csv(datafile, sep=';')
+    assert module.pd is pd and module.read_csv is parse
+    assert parsed == [datafile, other, datafile, datafile]
+    assert list(df.index) == [1, 2, 3]
+
+
+def test_subfolder_cache_in_package_cache(datafile, write_files):
+    package = os.path.dirname(os.path.dirname(datafile))
+    sub = os.path.join(write_files(package, {'data/sub/weather.csv': 'a;b\n1;2\n'}), 'data', 'sub', 'weather.csv')
+    assert os.path.dirname(datafiles.cache(sub)) == os.path.join(package, catalog.CACHE_DIRECTORY, 'data')
+    assert os.path.isdir(datafiles.cache(datafile))
+    assert os.path.isdir(datafiles.cache(sub))
+    assert not os.path.exists(os.path.join(os.path.dirname(sub), catalog.CACHE_DIRECTORY))
+
+    files = catalog.PackageCatalog(os.path.dirname(package)).datafiles(package)
+    assert sorted(files) == sorted([datafile, sub])
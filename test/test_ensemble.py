@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip('pycropml')
+pd = pytest.importorskip('pandas')
+
+from pycrop2ml_ui.core import ensemble
+
+
+def test_parameter_table():
+    base = pd.DataFrame({'name': ['a', 'b'], 'value': [1.0, 2.0]})
+    table = ensemble.parameter_table(base, {'b': 3.0})
+    assert list(table['name']) == ['a', 'b'] and list(table['value']) == [1.0, 3.0]
+
+
+def test_unknown_parameters():
+    base = pd.DataFrame({'name': ['a'], 'value': [1.0]})
+    with pytest.raises(Exception, match='Unknown parameters : c'):
+        ensemble.run_ensemble('Pkg', 'data.csv', pd.DataFrame({'c': [1.0]}), base)
+
+
+def test_duplicate_run_ids():
+    base = pd.DataFrame({'name': ['a'], 'value': [1.0]})
+    paramsets = pd.DataFrame({'a': [1.0, 2.0, 3.0]}, index=pd.Index(['r1', 'r2', 'r1'], name='run'))
+    with pytest.raises(Exception, match='Duplicate run ids : r1'):
+        ensemble.run_ensemble('Pkg', 'data.csv', paramsets, base)
@@ -0,0 +1,20 @@
+import logging
+
+from pycrop2ml_ui.core import jobs
+
+
+def test_subscriber_errors_are_logged(caplog):
+    job = jobs.TranspileJob('Pkg', ['py'])
+    calls = []
+
+    def failing(job, task):
+        raise ValueError('broken progress widget')
+
+    job.subscribe(failing)
+    job.subscribe(lambda job, task: calls.append(task))
+    with caplog.at_level(logging.ERROR, logger=jobs.__name__):
+        job._on_start('Pkg', 'py')
+
+    assert job.states[('Pkg', 'py')] == jobs.RUNNING
+    assert calls == [('Pkg', 'py')]
+    assert 'broken progress widget' in caplog.text
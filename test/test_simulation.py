@@ -0,0 +1,40 @@
+import os
+import sys
+import types
+
+import pytest
+
+pytest.importorskip('pycropml')
+
+from pycrop2ml_ui.core import simulation
+
+
+def test_same_name_packages(tmp_path, write_model):
+    first = write_model(tmp_path / 'a', 'Model', 1)
+    second = write_model(tmp_path / 'b', 'Model', 2, absolute=True)
+
+    assert simulation.run_simulation(first, 'data.csv', [], [], []) == 1
+    assert simulation.run_simulation(second, 'data.csv', [], [], []) == 2
+    assert simulation.simulation_module(first).__name__ == simulation.namespace(first) + '.simulation'
+    assert simulation.namespace(first) != simulation.namespace(second)
+    assert 'Model' not in sys.modules and 'Model.factor' not in sys.modules
+    assert not any(p.startswith(str(tmp_path)) for p in sys.path)
+
+
+def test_kernel_module_of_the_same_name(tmp_path, monkeypatch, write_model):
+    pkg = write_model(tmp_path, 'Kernel', 3, absolute=True)
+    kernel = types.ModuleType('Kernel')
+    monkeypatch.setitem(sys.modules, 'Kernel', kernel)
+
+    assert simulation.run_simulation(pkg, 'data.csv', [], [], []) == 3
+    assert sys.modules['Kernel'] is kernel
+
+
+def test_reload_on_source_change(tmp_path, write_model):
+    pkg = write_model(tmp_path, 'Reloaded', 4)
+    module = simulation.simulation_module(pkg)
+    assert simulation.simulation_module(pkg) is module
+
+    write_model(tmp_path, 'Reloaded', 40)
+    assert simulation.simulation_module(pkg) is not module
+    assert simulation.run_simulation(pkg, 'data.csv', [], [], []) == 40
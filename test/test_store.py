@@ -0,0 +1,179 @@
+import os
+import shutil
+
+from pycrop2ml_ui.core import store, transpiler
+
+
+def test_put_get(tmp_path, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    shadow = rendered()
+
+    assert s.get('ab12') is None
+    entry = s.put('ab12', shadow)
+
+    assert entry == s.get('ab12')
+    assert sorted(s.outputs('ab12')) == ['src/py/Pkg/a.py', 'test/py/test_a.py']
+    assert sorted(transpiler.output_files(shadow)) == ['src/py/Pkg/a.py', 'test/py/test_a.py']
+    assert os.stat(entry).st_mode & 0o055 == 0o055
+    assert os.stat(os.path.join(entry, 'src', 'py', 'Pkg', 'a.py')).st_mode & 0o044 == 0o044
+
+
+def test_put_existing_entry_is_a_hit(tmp_path, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    entry = s.put('ab12', rendered('first', 'a = 1'))
+
+    assert s.put('ab12', rendered('second', 'a = 2')) == entry
+    with open(os.path.join(entry, 'src', 'py', 'Pkg', 'a.py'), encoding='utf8') as f:
+        assert f.read() == 'a = 1'
+
+
+def test_put_concurrent_entry(tmp_path, monkeypatch, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    other = rendered('other')
+    shadow = rendered()
+    rename = os.rename
+
+    def concurrent(source, target):
+        monkeypatch.setattr(store.os, 'rename', rename)
+        store.TranspileStore(s.directory).put('ab12', other)
+        rename(source, target)
+
+    monkeypatch.setattr(store.os, 'rename', concurrent)
+    assert s.put('ab12', shadow) == s._entry('ab12')
+    assert sorted(transpiler.output_files(shadow)) == ['src/py/Pkg/a.py', 'test/py/test_a.py']
+    assert os.listdir(os.path.dirname(s._entry('ab12'))) == ['ab12']
+
+
+def test_put_failure_keeps_the_tree(tmp_path, monkeypatch, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    shadow = rendered()
+
+    def failing(source, target):
+        raise OSError('read-only store')
+
+    monkeypatch.setattr(store.os, 'rename', failing)
+    assert s.put('ab12', shadow) is None
+    assert s.get('ab12') is None
+    assert sorted(transpiler.output_files(shadow)) == ['src/py/Pkg/a.py', 'test/py/test_a.py']
+    assert os.listdir(os.path.dirname(s._entry('ab12'))) == []
+
+
+def test_get_entry_of_another_user(tmp_path, monkeypatch, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    entry = s.put('ab12', rendered())
+
+    def forbidden(path, *args, **kwargs):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(store.os, 'utime', forbidden)
+    assert s.get('ab12') == entry
+
+
+def test_restore_copies(tmp_path, write_files, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    entry = s.put('ab12', rendered())
+    pkg = write_files(tmp_path / 'Pkg', {'src/py/Pkg/old.py': '', 'src/py/Pkg/handwritten.py': ''})
+
+    written, removed = s.restore('ab12', pkg, previous=['src/py/Pkg/old.py'])
+
+    target = os.path.join(pkg, 'src', 'py', 'Pkg', 'a.py')
+    assert written == ['src/py/Pkg/a.py', 'test/py/test_a.py'] and removed == ['src/py/Pkg/old.py']
+    assert not os.path.samefile(target, os.path.join(entry, 'src', 'py', 'Pkg', 'a.py'))
+    assert os.access(target, os.W_OK)
+    assert os.path.isfile(os.path.join(pkg, 'src', 'py', 'Pkg', 'handwritten.py'))
+    assert s.restore('cd34', pkg) is None
+
+
+def test_restore_link(tmp_path, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'), link=True)
+    entry = s.put('ab12', rendered())
+    pkg = str(tmp_path / 'Pkg')
+
+    s.restore('ab12', pkg)
+    assert os.path.samefile(os.path.join(pkg, 'src', 'py', 'Pkg', 'a.py'), os.path.join(entry, 'src', 'py', 'Pkg', 'a.py'))
+
+
+def test_restore_modified_entry(tmp_path, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    entry = s.put('ab12', rendered())
+    target = os.path.join(entry, 'src', 'py', 'Pkg', 'a.py')
+    os.chmod(target, 0o644)
+    with open(target, 'w', encoding='utf8') as f:
+        f.write('import os; os.system("exit")')
+
+    assert not s.verify('ab12')
+    assert s.restore('ab12', str(tmp_path / 'Pkg')) is None
+    assert not os.path.exists(str(tmp_path / 'Pkg'))
+
+
+def test_restore_added_file(tmp_path, write_files, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    entry = s.put('ab12', rendered())
+    os.chmod(os.path.join(entry, 'src', 'py', 'Pkg'), 0o755)
+    write_files(entry, {'src/py/Pkg/extra.py': ''})
+
+    assert s.restore('ab12', str(tmp_path / 'Pkg')) is None
+
+
+def test_restore_writable_entry(tmp_path, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    entry = s.put('ab12', rendered())
+    os.chmod(os.path.join(entry, 'src'), 0o777)
+
+    assert s.restore('ab12', str(tmp_path / 'Pkg')) is None
+
+
+def test_restore_untrusted_owner(tmp_path, monkeypatch, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    s.put('ab12', rendered())
+    assert s.verify('ab12')
+
+    monkeypatch.setattr(s, 'trusted_uids', lambda: {os.getuid() + 1})
+    assert s.restore('ab12', str(tmp_path / 'Pkg')) is None
+
+
+def test_evict_least_recently_used(tmp_path, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    for key in ['aa01', 'bb02', 'cc03']:
+        entry = s.put(key, rendered(key))
+        os.utime(os.path.join(entry, store.ENTRY), ns=(0, {'aa01': 3, 'bb02': 1, 'cc03': 2}[key] * 10**9))
+    s.max_bytes = 2 * len('a = 1')
+
+    assert s.evict() == 1
+    assert s.get('bb02') is None and s.get('aa01') is not None and s.get('cc03') is not None
+    assert s.stats()['Entries'] == 2
+
+
+def test_evict_entry_removed_meanwhile(tmp_path, monkeypatch, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'), max_bytes=0)
+    for key in ['aa01', 'bb02']:
+        s.put(key, rendered(key))
+    entries = s._entries()
+    shutil.rmtree(s._entry('aa01'))
+    monkeypatch.setattr(s, '_entries', lambda: entries)
+
+    assert s.evict() == 1
+    assert s.get('bb02') is None
+
+
+def test_evict_failure_keeps_counting(tmp_path, monkeypatch, rendered):
+    s = store.TranspileStore(str(tmp_path / 'store'))
+    for key in ['aa01', 'bb02', 'cc03']:
+        entry = s.put(key, rendered(key))
+        os.utime(os.path.join(entry, store.ENTRY), ns=(0, {'aa01': 1, 'bb02': 2, 'cc03': 3}[key] * 10**9))
+    s.max_bytes = 2 * len('a = 1')
+    rmtree = store._rmtree
+
+    def forbidden(path):
+        if path == s._entry('aa01'):
+            raise PermissionError(path)
+        rmtree(path)
+
+    monkeypatch.setattr(store, '_rmtree', forbidden)
+    assert s.evict() == 1
+    assert s.get('aa01') is not None and s.get('bb02') is None and s.get('cc03') is not None
+
+
+def test_get_store_disabled():
+    assert store.get_store('') is None
+    assert store.get_store('0') is None
@@ -0,0 +1,121 @@
+import pytest
+
+pytest.importorskip('pycropml')
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from pycrop2ml_ui.core import sweep
+
+
+class Input():
+
+    def __init__(self, name, default, parametercategory=None, **bounds):
+        self.name = name
+        self.default = default
+        if parametercategory is not None:
+            self.parametercategory = parametercategory
+        for key, value in bounds.items():
+            setattr(self, key, value)
+
+
+def test_parameter_bounds():
+    inputs = [Input('a', '2', 'constant', min='0', max='10'), Input('b', '4', 'species'), Input('c', '', 'soil'), Input('x', '1')]
+    bounds = sweep.parameter_bounds(inputs)
+    assert list(bounds['name']) == ['a', 'b', 'c']
+    assert list(bounds['min']) == [0.0, 2.0, 0.0] and list(bounds['max']) == [10.0, 8.0, 1.0]
+    assert not bounds['Sweep'].any()
+
+
+def test_grid():
+    unit = sweep.grid(2, 3)
+    assert unit.shape == (9, 2)
+    assert sorted(set(map(tuple, unit.tolist()))) == [(a, b) for a in (0.0, 0.5, 1.0) for b in (0.0, 0.5, 1.0)]
+    assert sweep.grid(3, 1).tolist() == [[0.5, 0.5, 0.5]]
+
+
+def test_grid_too_large():
+    with pytest.raises(Exception, match='more than the maximum'):
+        sweep.sample('Grid', 20, 10)
+    assert sweep.runs('Grid', 20, 10) == 10 ** 20
+    assert sweep.sample('Grid', 2, 3, max_runs=9).shape == (9, 2)
+    with pytest.raises(Exception, match='more than the maximum'):
+        sweep.sample('Morris', 4, 10, max_runs=49)
+
+
+def test_sample_checks():
+    with pytest.raises(Exception, match='Unknown sampling method'):
+        sweep.sample('Sobol', 2, 10)
+    with pytest.raises(Exception, match='at least 1'):
+        sweep.sample('Latin hypercube', 2, 0)
+
+
+def test_latin_hypercube_strata():
+    unit = sweep.latin_hypercube(3, 50, seed=1)
+    assert unit.shape == (50, 3)
+    for column in unit.T:
+        assert sorted(np.floor(column * 50).astype(int).tolist()) == list(range(50))
+    assert np.array_equal(unit, sweep.latin_hypercube(3, 50, seed=1))
+
+
+def test_morris_design():
+    k, r = 4, 6
+    unit = sweep.morris(k, r, seed=0)
+    assert unit.shape == (r * (k + 1), k)
+    assert unit.min() >= 0.0 and unit.max() <= 1.0
+    steps = np.diff(unit.reshape(r, k + 1, k), axis=1)
+    moved = np.abs(steps) > 1e-12
+    assert (moved.sum(axis=2) == 1).all()
+    assert (moved.sum(axis=1) == 1).all()
+    assert np.allclose(np.abs(steps[moved]), 4 / 6.0)
+
+
+def test_morris_indices_linear_model():
+    names = ['a', 'b', 'c']
+    unit = sweep.morris(3, 10, seed=2)
+    y = pd.DataFrame({'out': 2.0 * unit[:, 0] - 1.0 * unit[:, 1]})
+    table = sweep.morris_indices(unit, y, names)
+    assert list(table.index) == [('out', n) for n in names]
+    assert np.allclose(table['mu'], [2.0, -1.0, 0.0])
+    assert np.allclose(table['mu_star'], [2.0, 1.0, 0.0])
+    assert np.allclose(table['sigma'], 0.0)
+
+
+def test_regression_indices_linear_model():
+    names = ['a', 'b']
+    x = sweep.latin_hypercube(2, 200, seed=3)
+    y = pd.DataFrame({'out': 3.0 * x[:, 0] + 0.0 * x[:, 1], 'other': -x[:, 1]})
+    table = sweep.regression_indices(x, y, names)
+    assert table.loc[('out', 'a'), 'SRC'] == pytest.approx(1.0)
+    assert table.loc[('out', 'b'), 'SRC'] == pytest.approx(0.0, abs=1e-9)
+    assert table.loc[('other', 'b'), 'Spearman'] == pytest.approx(-1.0)
+    assert table['R2'].to_numpy() == pytest.approx(1.0)
+
+
+def test_ranks_of_ties():
+    a = np.array([[3.0, 1.0], [1.0, 1.0], [3.0, 1.0], [2.0, 0.0]])
+    assert sweep._ranks(a).tolist() == [[2.5, 2.0], [0.0, 2.0], [2.5, 2.0], [1.0, 0.0]]
+
+
+def test_grid_parameter_without_effect():
+    names = ['a', 'b']
+    x = sweep.grid(2, 3)
+    y = pd.DataFrame({'out': x[:, 0] ** 3})
+    table = sweep.regression_indices(x, y, names)
+    assert table.loc[('out', 'a'), 'Spearman'] == pytest.approx(1.0)
+    assert table.loc[('out', 'b'), 'Spearman'] == pytest.approx(0.0, abs=1e-12)
+    assert table.loc[('out', 'b'), 'Pearson'] == pytest.approx(0.0, abs=1e-12)
+
+
+def test_regression_indices_skip_failed_runs():
+    x = sweep.latin_hypercube(1, 20, seed=4)
+    values = 2.0 * x[:, 0]
+    values[3] = np.nan
+    table = sweep.regression_indices(x, pd.DataFrame({'out': values}), ['a'])
+    assert table.loc[('out', 'a'), 'Pearson'] == pytest.approx(1.0)
+
+
+def test_scale():
+    bounds = pd.DataFrame({'name': ['a', 'b'], 'min': [0.0, 10.0], 'max': [2.0, 20.0]})
+    samples = sweep.scale(np.array([[0.0, 1.0], [0.5, 0.5]]), bounds)
+    assert samples.index.name == 'Run'
+    assert samples.to_dict('list') == {'a': [0.0, 1.0], 'b': [20.0, 15.0]}
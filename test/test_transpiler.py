@@ -0,0 +1,170 @@
+import os
+import pathlib
+
+import pytest
+
+from pycrop2ml_ui.core import transpiler
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch, write_files):
+    """
+    Returns the (package, external package, manifest) of a package built into py, the
+    package compositions referring to the external package
+    """
+
+    parsecache = pytest.importorskip('pycrop2ml_ui.core.parsecache')
+
+    pkg = write_files(tmp_path / 'Pkg', {'crop2ml/unit.a.xml': '<a/>', 'crop2ml/algo/pyx/a.pyx': 'a = 1',
+                                          'src/py/Pkg/a.py': 'a = 1', 'test/py/test_a.py': ''})
+    ext = write_files(tmp_path / 'Ext', {'crop2ml/unit.b.xml': '<b/>'})
+    monkeypatch.setattr(transpiler, '_external_packages', lambda path: [ext] if os.path.basename(path) == 'Pkg' else [])
+
+    hashes = transpiler.build_hashes(pkg)
+    manifest = {'languages': {'py': {'pycropml': parsecache.pycropml_version(), 'sources': hashes['sources'],
+                                     'externals': hashes['externals'], 'outputs': ['src/py/Pkg/a.py', 'test/py/test_a.py']}}}
+    return pkg, ext, manifest
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = {'languages': {'py': {'pycropml': '1.0', 'sources': {'crop2ml/unit.a.xml': 'h'}, 'externals': {}, 'outputs': []}}}
+    transpiler.write_manifest(str(tmp_path), manifest)
+    assert transpiler.read_manifest(str(tmp_path)) == manifest
+    assert transpiler.read_manifest(str(tmp_path / 'missing')) == {'languages': {}}
+
+
+def test_up_to_date(build):
+    pkg, ext, manifest = build
+    assert transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+    assert not transpiler.is_up_to_date(pkg, 'java', transpiler.build_hashes(pkg), manifest)
+
+
+def test_source_change(build, write_files):
+    pkg, ext, manifest = build
+    write_files(pkg, {'crop2ml/algo/pyx/a.pyx': 'a = 2'})
+    assert not transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+
+
+def test_external_package_change(build, write_files):
+    pkg, ext, manifest = build
+    write_files(ext, {'crop2ml/unit.b.xml': '<b name="changed"/>'})
+    assert not transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+
+
+def test_manifest_without_externals(build):
+    pkg, ext, manifest = build
+    del manifest['languages']['py']['externals']
+    assert not transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+
+
+def test_unparsable_compositions(build, monkeypatch):
+    pkg, ext, manifest = build
+
+    def broken(path):
+        raise ValueError('broken composition')
+
+    monkeypatch.setattr(transpiler, '_external_packages', broken)
+    assert transpiler.build_hashes(pkg)['externals'] is None
+    assert not transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+
+
+def test_missing_output(build):
+    pkg, ext, manifest = build
+    os.remove(os.path.join(pkg, 'test', 'py', 'test_a.py'))
+    assert not transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+
+
+def test_pycropml_upgrade(build):
+    pkg, ext, manifest = build
+    manifest['languages']['py']['pycropml'] = 'older'
+    assert not transpiler.is_up_to_date(pkg, 'py', transpiler.build_hashes(pkg), manifest)
+
+
+def test_sync_outputs_writes_changed_files_only(tmp_path, write_files):
+    shadow = write_files(tmp_path / 'shadow' / 'Pkg', {'src/py/Pkg/a.py': 'a = 2', 'src/py/Pkg/b.py': 'b = 1'})
+    pkg = write_files(tmp_path / 'Pkg', {'src/py/Pkg/a.py': 'a = 1', 'src/py/Pkg/b.py': 'b = 1'})
+    mtime = os.stat(os.path.join(pkg, 'src', 'py', 'Pkg', 'b.py')).st_mtime_ns
+
+    written, removed = transpiler.sync_outputs(shadow, pkg)
+
+    assert written == ['src/py/Pkg/a.py'] and removed == []
+    with open(os.path.join(pkg, 'src', 'py', 'Pkg', 'a.py'), encoding='utf8') as f:
+        assert f.read() == 'a = 2'
+    assert os.stat(os.path.join(pkg, 'src', 'py', 'Pkg', 'b.py')).st_mtime_ns == mtime
+
+
+def test_sync_outputs_removes_previous_outputs_only(tmp_path, write_files):
+    shadow = write_files(tmp_path / 'shadow' / 'Pkg', {'src/py/Pkg/a.py': 'a = 1'})
+    pkg = write_files(tmp_path / 'Pkg', {'src/py/Pkg/a.py': 'a = 1', 'src/py/Pkg/deleted.py': '',
+                                          'src/py/Pkg/handwritten.py': '', 'test/py/test_deleted.py': ''})
+
+    written, removed = transpiler.sync_outputs(shadow, pkg, previous=['src/py/Pkg/a.py', 'src/py/Pkg/deleted.py',
+                                                                      'test/py/test_deleted.py', 'crop2ml/unit.a.xml'])
+
+    assert written == []
+    assert removed == ['src/py/Pkg/deleted.py', 'test/py/test_deleted.py']
+    assert os.path.isfile(os.path.join(pkg, 'src', 'py', 'Pkg', 'handwritten.py'))
+    assert sorted(transpiler.output_files(pkg)) == ['src/py/Pkg/a.py', 'src/py/Pkg/handwritten.py']
+
+
+def test_sync_outputs_without_previous_build(tmp_path, write_files):
+    shadow = write_files(tmp_path / 'shadow' / 'Pkg', {'src/py/Pkg/a.py': 'a = 1'})
+    pkg = write_files(tmp_path / 'Pkg', {'src/py/Pkg/handwritten.py': ''})
+
+    assert transpiler.sync_outputs(shadow, pkg) == (['src/py/Pkg/a.py'], [])
+    assert os.path.isfile(os.path.join(pkg, 'src', 'py', 'Pkg', 'handwritten.py'))
+
+
+def test_sync_outputs_link(tmp_path, write_files):
+    shadow = write_files(tmp_path / 'shadow' / 'Pkg', {'src/py/Pkg/a.py': 'a = 1'})
+    pkg = os.path.join(str(tmp_path), 'Pkg')
+
+    transpiler.sync_outputs(shadow, pkg, link=True)
+
+    assert os.path.samefile(os.path.join(shadow, 'src', 'py', 'Pkg', 'a.py'), os.path.join(pkg, 'src', 'py', 'Pkg', 'a.py'))
+
+
+class Node():
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def test_relocate_nested_paths(tmp_path):
+    source, target = os.path.join(str(tmp_path), 'Pkg'), os.path.join(str(tmp_path), 'shadow', 'Pkg')
+    algo = Node(filename=os.path.join(source, 'crop2ml', 'algo', 'pyx', 'a.pyx'))
+    model = Node(path=source, name='Pkg', algorithms=[algo], functions={'f': Node(filename=pathlib.Path(source, 'f.pyx'))},
+                 inputs=(Node(file=os.path.join(source + 'Other', 'x')),))
+    model.parent = model
+
+    relocated = transpiler._relocate([model], source, target)
+
+    assert relocated[0] is model and model.parent is model
+    assert model.path == target and model.name == 'Pkg'
+    assert algo.filename == os.path.join(target, 'crop2ml', 'algo', 'pyx', 'a.pyx')
+    assert model.functions['f'].filename == pathlib.Path(target, 'f.pyx')
+    assert model.inputs[0].file == os.path.join(source + 'Other', 'x')
+
+
+def test_shared_models(tmp_path, monkeypatch):
+    cyml = pytest.importorskip('pycropml.cyml')
+    source, target = os.path.join(str(tmp_path), 'Pkg'), os.path.join(str(tmp_path), 'shadow', 'Pkg')
+    other = os.path.join(str(tmp_path), 'other', 'Pkg')
+    parsed = []
+
+    def model_parser(pkg):
+        parsed.append(pkg)
+        return []
+
+    monkeypatch.setattr(cyml, 'model_parser', model_parser, raising=False)
+    models = [Node(path=source)]
+
+    with transpiler.shared_models(source, target, models):
+        assert cyml.model_parser is model_parser
+
+    monkeypatch.setattr(transpiler.multiprocessing, 'parent_process', lambda: object())
+    with transpiler.shared_models(source, target, models):
+        assert cyml.model_parser(target)[0].path == target
+        assert cyml.model_parser(other) == []
+    assert cyml.model_parser is model_parser
+    assert parsed == [other] and models[0].path == source
@@ -0,0 +1,75 @@
+import os
+import asyncio
+
+import pytest
+
+from pycrop2ml_ui.core import catalog, watcher
+
+
+def test_refresh_options_keeps_the_value():
+    wg = pytest.importorskip('ipywidgets')
+    widget = wg.Dropdown(options=['', 'a', 'b'], value='b')
+    changes = []
+    widget.observe(lambda change: changes.append((change['old'], change['new'])), names='value')
+
+    watcher.refresh_options(widget, ['', 'b', 'c'])
+    assert widget.value == 'b' and widget.index == 1 and changes == []
+
+    watcher.refresh_options(widget, [('none', ''), ('B', 'b')])
+    assert widget.value == 'b' and widget.label == 'B' and changes == []
+
+    watcher.refresh_options(widget, ['', 'c'])
+    assert widget.value == '' and changes == [('b', '')]
+
+
+def test_cache_directory_is_not_watched(tmp_path):
+    pkg = str(tmp_path / 'Pkg')
+    os.makedirs(os.path.join(pkg, 'data', catalog.CACHE_DIRECTORY))
+    with open(os.path.join(pkg, 'data', 'w.csv'), 'w') as f:
+        f.write('a;b\n')
+    with open(os.path.join(pkg, 'data', catalog.CACHE_DIRECTORY, 'columns.json'), 'w') as f:
+        f.write('{}')
+
+    models, datas = watcher._snapshot_package(pkg)
+    assert list(datas) == [os.path.join(pkg, 'data', 'w.csv')]
+
+
+def test_subscribers_run_on_their_loop(tmp_path):
+    w = watcher.PackageWatcher(str(tmp_path), interval=60)
+    w.start = lambda: None
+    calls = []
+
+    def callback(event):
+        calls.append((event, asyncio.get_running_loop()))
+
+    async def subscribe():
+        w.subscribe(callback)
+        return asyncio.get_running_loop()
+
+    loop = asyncio.new_event_loop()
+    try:
+        expected = loop.run_until_complete(subscribe())
+        event = watcher.Event(watcher.PACKAGE_ADDED, 'Pkg', 'Pkg')
+        w._publish([event])
+        assert calls == []
+        loop.run_until_complete(asyncio.sleep(0))
+        assert calls == [(event, expected)]
+    finally:
+        loop.close()
+
+
+def test_unsubscribe(tmp_path):
+    w = watcher.PackageWatcher(str(tmp_path), interval=60)
+    w.start = lambda: None
+    calls = []
+
+    class Menu():
+        def _on_package_event(self, event):
+            calls.append(event)
+
+    menu = Menu()
+    w.subscribe(menu._on_package_event)
+    w._publish([watcher.Event(watcher.PACKAGE_ADDED, 'a', 'a')])
+    w.unsubscribe(menu._on_package_event)
+    w._publish([watcher.Event(watcher.PACKAGE_ADDED, 'b', 'b')])
+    assert [e.package for e in calls] == ['a']